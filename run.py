@@ -10,7 +10,32 @@ Parameters include:
 --agent: Execution agent, base, base_tool_rag, base_multi-agent, default is base
 --mcp_config: MCP configuration file path, default is mcp_marketplace/mcp_config.json
 --data_version: Data version, such as v0, v1, default is v0
+--dataset_format: Layout of the generated dataset, normalized (tool catalog stored once, items reference it) or legacy (tools embedded in every item), default is normalized. The tool_call stage reads both.
 --log_file: Log file name for resume functionality, optional. If not provided, auto-generates based on input file and timestamp.
+--log_format: Run log format of the tool_call stage, json (whole log rewritten after each task) or jsonl (one record appended per task), default is json
+--concurrency: Number of trials running in parallel in the tool_call stage, default is 1 (sequential)
+--judge_concurrency: Number of trials judged in parallel (correctness check and LLM as a judge), default is concurrency
+--judge_queue_size: Number of executed trials waiting for a judge before the executors block, default is 2 * judge_concurrency
+--async_loop: Run the trials as coroutines on one asyncio event loop instead of threads, up to --concurrency in flight
+--mcp_base_url: Base URL of the MCP tool client REST API, default is MCP_TOOL_BASE_URL in .env or http://127.0.0.1:5000
+--mcp_pool_size: Number of keep-alive connections to the MCP tool client, default is max(32, concurrency)
+--judge_cache_path: Sqlite file caching LLM-as-judge verdicts across runs, default is logs/cache/judge_cache.sqlite
+--no_judge_cache: Disable the LLM-as-judge verdict cache, every AST check calls the judge model
+--cassette_mode: Record or replay the model provider calls, off, record (save every call), replay (answer from the cassette, no network) or auto (replay, record misses), default is off
+--cassette_path: Sqlite file of the recorded model provider calls, default is logs/cache/cassette.sqlite
+--tool_cache_mode: Cache of the MCP tool outputs, off, cache (reuse successful outputs within the per server ttl), record (save every output) or replay (strict, answer from the cache only), default is off
+--tool_cache_path: Sqlite file of the cached MCP tool outputs, default is logs/cache/tool_cache.sqlite
+--tool_cache_rules: Json file of the per server ttl and excluded tools of the cache mode, default rules are in tool_result_cache.py
+--token_price_file: Json file of USD per 1M tokens by model, adds the cost to the token usage of the run
+--rate_limits: Json file of the client side rpm/tpm limits and retries by model provider, default is no rpm/tpm limit and 4 retries
+--max_retries: Retries of the transient model provider errors (timeouts, 429, 5xx), overrides the default of --rate_limits
+--max_iterations: LLM rounds of the agent loop for multi-step tasks, the tool calls of a round run in parallel, default is 1
+--ci_method: Confidence interval of each pass@k in the metrics, bootstrap (resampling the tasks), analytic (normal approximation) or none, default is bootstrap
+--ci_level: Confidence level of the intervals, default is 0.95
+--bootstrap_samples: Resamples of the bootstrap intervals, default is 1000
+--adaptive_trials: Stop the trials of a task early, off, exact (only once its pass@k can't change, unbiased) or confidence (once the interval is tight, approximate), default is off
+--adaptive_min_trials: Trials of a task before the confidence mode can stop it, at least the largest k, default is 3
+--adaptive_tolerance: Largest half width of the pass@k interval of a task stopped by the confidence mode, default is 0.1
 
 stage:
 1. If stage is generation, call run_data_generator.py, generate data according to specified category and data_version.
@@ -25,6 +50,7 @@ Notes:
 4. When stage is all, category, data_version, model must be filled, input_file is the data generated in the generation stage.
 5. Print all parameters to remind users when running.
 6. The tool_call stage now supports incremental logging and resume functionality. Logs are saved after each task completion, and the system can resume from where it left off if interrupted.
+7. Log writes are crash safe (temp file, fsync, rename), finished trials of unlogged tasks are kept in <log_file>.trials, so a resumed run only re-runs the trials that were in flight. An unreadable log file is moved to <log_file>.corrupt_<time> instead of being overwritten.
 '''
 
 import argparse
@@ -33,8 +59,8 @@ from pathlib import Path
 
 
 from src.mcp_tool_bench import *
-from src.mcp_tool_bench.agents.data_generator_agent.run_data_generator import run_data_generation
-from src.mcp_tool_bench.agents.base_tool_call_agent.run_tool_call import run_benchmark
+# The stage modules (model SDKs, numpy, bs4) are imported in main() by the stage which runs them,
+# so --help and the argument checks start fast
 
 # Default parameter values
 DEFAULT_ARGS = {
@@ -47,9 +73,34 @@ DEFAULT_ARGS = {
     'agent': 'base',
     'mcp_config': 'mcp_marketplace/mcp_config.json',
     'data_version': 'v0',
+    'dataset_format': 'normalized',
     'log_file': None,
+    'log_format': 'json',
     'evaluation_trial_per_task': 5,
-    'llm_as_judge_model': "gpt-4o"
+    'llm_as_judge_model': "gpt-4o",
+    'concurrency': 1,
+    'async_loop': False,
+    'judge_concurrency': None,
+    'judge_queue_size': None,
+    'mcp_base_url': None,
+    'mcp_pool_size': None,
+    'judge_cache_path': 'logs/cache/judge_cache.sqlite',
+    'no_judge_cache': False,
+    'cassette_mode': 'off',
+    'cassette_path': 'logs/cache/cassette.sqlite',
+    'tool_cache_mode': 'off',
+    'tool_cache_path': 'logs/cache/tool_cache.sqlite',
+    'tool_cache_rules': None,
+    'token_price_file': None,
+    'rate_limits': None,
+    'max_retries': None,
+    'max_iterations': 1,
+    'ci_method': 'bootstrap',
+    'ci_level': 0.95,
+    'bootstrap_samples': 1000,
+    'adaptive_trials': 'off',
+    'adaptive_min_trials': 3,
+    'adaptive_tolerance': 0.1
 }
 
 def parse_arguments():
@@ -64,9 +115,34 @@ def parse_arguments():
     parser.add_argument('--agent', default=DEFAULT_ARGS['agent'], help='Execution agent, such as base, base_tool_rag, base_multi-agent, default is {}'.format(DEFAULT_ARGS['agent']))
     parser.add_argument('--mcp_config', default=DEFAULT_ARGS['mcp_config'], help='MCP configuration file path, default is {}'.format(DEFAULT_ARGS['mcp_config']))
     parser.add_argument('--data_version', default=DEFAULT_ARGS['data_version'], help='Data version, such as v0, v1, default is {}'.format(DEFAULT_ARGS['data_version']))
+    parser.add_argument('--dataset_format', default=DEFAULT_ARGS['dataset_format'], choices=['normalized', 'legacy'], help='Layout of the generated dataset, normalized stores the tool catalog once, legacy embeds tools in every item, default is {}'.format(DEFAULT_ARGS['dataset_format']))
     parser.add_argument('--log_file', default=DEFAULT_ARGS['log_file'], help='Specify log file name for resume functionality. If not provided, will auto-generate based on input file and timestamp.')
+    parser.add_argument('--log_format', default=DEFAULT_ARGS['log_format'], choices=['json', 'jsonl'], help='Run log format, json rewrites the whole log after each task, jsonl appends one record per task (convert with python -m src.mcp_tool_bench.utils.run_log), default is {}'.format(DEFAULT_ARGS['log_format']))
     parser.add_argument('--evaluation_trial_per_task', type=int, default=DEFAULT_ARGS['evaluation_trial_per_task'], help='Calculation Pass@K Number of Trials...')
     parser.add_argument('--llm_as_judge_model', type=str, default=DEFAULT_ARGS['llm_as_judge_model'], help='LLM Model Used to determine the parameters are correctly aligned with ground-truth, especial in search tool that query is rewritten')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_ARGS['concurrency'], help='Number of trials (LLM and MCP tool calls) running in parallel on a bounded worker pool, default is {} (sequential)'.format(DEFAULT_ARGS['concurrency']))
+    parser.add_argument('--judge_concurrency', type=int, default=DEFAULT_ARGS['judge_concurrency'], help='Number of trials judged in parallel by a separate worker pool fed from the executors, default is concurrency')
+    parser.add_argument('--judge_queue_size', type=int, default=DEFAULT_ARGS['judge_queue_size'], help='Max number of executed trials waiting for a judge, executors block when it is full, default is 2 * judge_concurrency')
+    parser.add_argument('--mcp_base_url', type=str, default=DEFAULT_ARGS['mcp_base_url'], help='Base URL of the MCP tool client REST API (/api/query), default is MCP_TOOL_BASE_URL in .env or http://127.0.0.1:5000')
+    parser.add_argument('--mcp_pool_size', type=int, default=DEFAULT_ARGS['mcp_pool_size'], help='Number of keep-alive connections to the MCP tool client, default is max(32, concurrency)')
+    parser.add_argument('--judge_cache_path', type=str, default=DEFAULT_ARGS['judge_cache_path'], help='Sqlite file caching LLM-as-judge verdicts across runs, default is {}'.format(DEFAULT_ARGS['judge_cache_path']))
+    parser.add_argument('--no_judge_cache', action='store_true', default=DEFAULT_ARGS['no_judge_cache'], help='Disable the LLM-as-judge verdict cache')
+    parser.add_argument('--cassette_mode', type=str, default=DEFAULT_ARGS['cassette_mode'], choices=['off', 'record', 'replay', 'auto'], help='Record the model provider calls (tool calls and LLM-as-judge) or replay them without network I/O, e.g. to re-run the evaluation after a change of the checks, auto replays and records the misses, default is {}'.format(DEFAULT_ARGS['cassette_mode']))
+    parser.add_argument('--cassette_path', type=str, default=DEFAULT_ARGS['cassette_path'], help='Sqlite file of the recorded model provider calls, default is {}'.format(DEFAULT_ARGS['cassette_path']))
+    parser.add_argument('--tool_cache_mode', type=str, default=DEFAULT_ARGS['tool_cache_mode'], choices=['off', 'cache', 'record', 'replay'], help='Cache of the MCP tool outputs keyed by server, tool and arguments: cache reuses successful outputs within the per server ttl, record saves every output, replay answers from the cache only (hermetic re-runs), default is {}'.format(DEFAULT_ARGS['tool_cache_mode']))
+    parser.add_argument('--tool_cache_path', type=str, default=DEFAULT_ARGS['tool_cache_path'], help='Sqlite file of the cached MCP tool outputs, default is {}'.format(DEFAULT_ARGS['tool_cache_path']))
+    parser.add_argument('--tool_cache_rules', type=str, default=DEFAULT_ARGS['tool_cache_rules'], help='Json file {"default_ttl": 3600, "servers": {"<server_id>": {"ttl": 86400, "exclude_tools": []}}} of the cache mode, ttl null never expires, 0 never cached')
+    parser.add_argument('--token_price_file', type=str, default=DEFAULT_ARGS['token_price_file'], help='Json file {"<model>": {"prompt": 1.0, "completion": 5.0, "cached_prompt": 0.2}} of USD per 1M tokens, adds the cost to the token usage')
+    parser.add_argument('--rate_limits', type=str, default=DEFAULT_ARGS['rate_limits'], help='Json file {"default": {"max_retries": 4}, "providers": {"<provider>": {"rpm": 600, "tpm": 1000000}}} of client side limits, providers: openai, claude, qwen, kimi, custom_openai')
+    parser.add_argument('--max_retries', type=int, default=DEFAULT_ARGS['max_retries'], help='Retries of the transient model provider errors with exponential backoff and jitter, honoring Retry-After, default is 4')
+    parser.add_argument('--max_iterations', type=int, default=DEFAULT_ARGS['max_iterations'], help='LLM rounds of the agent loop, each round runs all the tool calls of the response in parallel as one step, the loop ends earlier when the model calls no tool, default is {}'.format(DEFAULT_ARGS['max_iterations']))
+    parser.add_argument('--ci_method', type=str, default=DEFAULT_ARGS['ci_method'], choices=['bootstrap', 'analytic', 'none'], help='Confidence interval of each pass@k, tool pass@k and parameter pass@k over the tasks, saved next to the value in metrics (pass@1_ci), default is {}'.format(DEFAULT_ARGS['ci_method']))
+    parser.add_argument('--ci_level', type=float, default=DEFAULT_ARGS['ci_level'], help='Confidence level of the intervals, default is {}'.format(DEFAULT_ARGS['ci_level']))
+    parser.add_argument('--bootstrap_samples', type=int, default=DEFAULT_ARGS['bootstrap_samples'], help='Resamples of the tasks of the bootstrap intervals, default is {}'.format(DEFAULT_ARGS['bootstrap_samples']))
+    parser.add_argument('--adaptive_trials', type=str, default=DEFAULT_ARGS['adaptive_trials'], choices=['off', 'exact', 'confidence'], help='Run the trials of a task in batches and stop early: exact once the pass@k of all the k values is settled (same metrics as off), confidence also once the --ci_level Wilson interval of its pass@k is within --adaptive_tolerance (approximate), the saved trials are in run_info, default is {}'.format(DEFAULT_ARGS['adaptive_trials']))
+    parser.add_argument('--adaptive_min_trials', type=int, default=DEFAULT_ARGS['adaptive_min_trials'], help='Trials of a task before --adaptive_trials confidence can stop it, at least the largest k of --pass_k, default is {}'.format(DEFAULT_ARGS['adaptive_min_trials']))
+    parser.add_argument('--adaptive_tolerance', type=float, default=DEFAULT_ARGS['adaptive_tolerance'], help='Largest half width of the pass@k interval of a task stopped by --adaptive_trials confidence, default is {}'.format(DEFAULT_ARGS['adaptive_tolerance']))
+    parser.add_argument('--async_loop', action='store_true', default=DEFAULT_ARGS['async_loop'], help='Run trials as coroutines on one asyncio event loop (async model provider clients), scales to thousands of in-flight trials set by --concurrency')
 
     return parser.parse_args()
 
@@ -136,7 +212,8 @@ def main():
         
         print("\n【Step 1】Data Generation")
         print("-" * 30)
-        run_data_generation(args.category, args.data_version, args.mcp_config)
+        from src.mcp_tool_bench.agents.data_generator_agent.run_data_generator import run_data_generation
+        run_data_generation(args.category, args.data_version, args.mcp_config, dataset_format=args.dataset_format)
         
     elif args.stage == 'generation':
         # generation stage: generate data
@@ -146,7 +223,8 @@ def main():
         
         print("\n【Step 1】Data Generation")
         print("-" * 30)
-        run_data_generation(args.category, args.data_version, args.mcp_config)
+        from src.mcp_tool_bench.agents.data_generator_agent.run_data_generator import run_data_generation
+        run_data_generation(args.category, args.data_version, args.mcp_config, dataset_format=args.dataset_format)
         
         print("\n" + "=" * 50)
         print("generation stage execution completed")
@@ -160,6 +238,7 @@ def main():
         
         print("\n【Step 1】Tool Calling and Evaluation")
         print("-" * 30)
+        from src.mcp_tool_bench.agents.base_tool_call_agent.run_tool_call import run_benchmark
         run_benchmark(args)
         
         print("\n" + "=" * 50)
@@ -174,12 +253,14 @@ def main():
         
         print("\n【Step 1】Data Generation")
         print("-" * 30)
-        run_data_generation(args.category, args.data_version, args.mcp_config)
+        from src.mcp_tool_bench.agents.data_generator_agent.run_data_generator import run_data_generation
+        run_data_generation(args.category, args.data_version, args.mcp_config, dataset_format=args.dataset_format)
         
         print("\n【Step 2】Tool Calling and Evaluation")
         print("-" * 30)
         # Set input_file to the generated data file
         args.input_file = f"data/{args.category}/{args.category}_{args.data_version}.json"
+        from src.mcp_tool_bench.agents.base_tool_call_agent.run_tool_call import run_benchmark
         run_benchmark(args)
         
         print("\n" + "=" * 50)
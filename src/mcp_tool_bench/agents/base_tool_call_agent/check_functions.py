@@ -11,22 +11,30 @@ from src.mcp_tool_bench.agents.base_tool_call_agent.prompt import *
 from src.mcp_tool_bench.evaluation.evaluation_utils import estimate_pass_at_k, base_error_analysis
 import html
 import re
-from bs4 import BeautifulSoup
+from decimal import Decimal, ROUND_DOWN
 from src.mcp_tool_bench.global_variables import *
 from src.mcp_tool_bench.model_utils.model_provider import get_model_provider
 from src.mcp_tool_bench.model_utils.base_api import *
+from src.mcp_tool_bench.evaluation.judge_cache import get_judge_cache
+from src.mcp_tool_bench.common_utils import get_conflict_toolname_original
+from src.mcp_tool_bench.utils.run_log import load_run_log, save_run_log
 import json
 import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple
 from tqdm import tqdm
 
+DEFAULT_JUDGE_BATCH_SIZE = 10
+
 def decode_html_entities(s):
     """Decode HTML entities"""
     # Try using html.unescape
     first_decode = html.unescape(s)
     # Check if still contains undecoded entities
     if "&" in first_decode and ";" in first_decode:
-        # Use BeautifulSoup for further decoding
+        # Use BeautifulSoup for further decoding, imported here as the judge path rarely needs it
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(first_decode, "html.parser")
         second_decode = soup.get_text()
         return second_decode
@@ -61,21 +69,118 @@ def process_response(response_text):
     decoded_json_str = decoded_json_str.replace("```json\n", "").replace("```", "").replace("\n", "")
     return decoded_json_str
 
+## parameters compared as coordinates, equal if consistent before one decimal place (truncated, not rounded)
+COORDINATE_PARAM_KEYS = {"lat", "lng", "lon", "latitude", "longitude", "location", "origin", "destination", "coordinate", "coordinates"}
+COORDINATE_DECIMALS = 1
+COORDINATE_PAIR_PATTERN = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+## free text parameters compared case insensitive with whitespace collapsed, strings of the other
+## parameters (paths, urls, ids, ...) are compared exactly
+FREE_TEXT_PARAM_KEYS = {"query", "q", "keyword", "keywords", "text", "content", "message", "prompt", "question", "search",
+                        "search_query", "city", "address", "title", "description", "comment", "body", "topic"}
+
+def truncate_coordinate(value) -> float:
+    """
+        Coordinate truncated to COORDINATE_DECIMALS, 116.489 -> 116.4, decimal arithmetic so 12.3 stays 12.3
+    """
+    return float(Decimal(str(value)).quantize(Decimal(1).scaleb(-COORDINATE_DECIMALS), rounding=ROUND_DOWN))
+
+def normalize_param_value(value, key: str = ""):
+    """
+        Normalized form of the value of parameter key for rule based comparison:
+        strings of FREE_TEXT_PARAM_KEYS are case folded with whitespace collapsed, other strings are kept,
+        numeric strings become numbers, coordinates ("116.48,39.99" or numbers of COORDINATE_PARAM_KEYS)
+        are truncated to COORDINATE_DECIMALS
+    """
+    is_coordinate = key.lower() in COORDINATE_PARAM_KEYS
+    if isinstance(value, dict):
+        return {k: normalize_param_value(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_param_value(v, key) for v in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return truncate_coordinate(value) if is_coordinate else float(value)
+    if isinstance(value, str):
+        coordinate_pair = COORDINATE_PAIR_PATTERN.match(value) if is_coordinate else None
+        if coordinate_pair:
+            return [truncate_coordinate(v) for v in coordinate_pair.groups()]
+        try:
+            return normalize_param_value(float(value.strip()), key)
+        except ValueError:
+            pass
+        if key.lower() in FREE_TEXT_PARAM_KEYS:
+            return " ".join(value.split()).casefold()
+        return value
+    return value
+
+def rule_based_check_ast(pred_tool_result_list: List[Dict], label_result_list: List[Dict]):
+    """
+        Deterministic AST check following the rubric of system_prompt_template_ast_single, only the last tool call is compared.
+        Return:
+            (tool_correctness, parameter_correctness) if the case can be decided locally, None if the parameters
+            need the LLM as a judge, e.g. a rewritten search query or a similar tool with different parameter names.
+    """
+    if not label_result_list or not isinstance(label_result_list[-1], dict):
+        return None
+    if not pred_tool_result_list:
+        return 0, 0
+    pred_tool_result = pred_tool_result_list[-1]
+    label_result = label_result_list[-1]
+    pred_tool_name = pred_tool_result.get("name", "") if isinstance(pred_tool_result, dict) else ""
+    label_tool_name = label_result.get("name", "")
+    similar_tool_names = [similar_tool.get("name", "") for similar_tool in label_result.get("similar_tools", []) or [] if isinstance(similar_tool, dict)]
+
+    pred_tool_name_original = get_conflict_toolname_original(pred_tool_name, pred_tool_result.get("server_name", "") or "") if pred_tool_name else ""
+    is_label_tool = pred_tool_name != "" and pred_tool_name in (label_tool_name, get_conflict_toolname_original(label_tool_name, label_result.get("mcp_server", "") or ""))
+    is_label_tool = is_label_tool or (pred_tool_name_original != "" and pred_tool_name_original == label_tool_name)
+    is_similar_tool = pred_tool_name != "" and pred_tool_name in similar_tool_names
+    if not is_label_tool and not is_similar_tool:
+        ## tool accuracy 0, parameter accuracy is directly 0
+        return 0, 0
+
+    pred_params = pred_tool_result.get("input", {})
+    label_params = label_result.get("input", {})
+    if not isinstance(pred_params, dict) or not isinstance(label_params, dict):
+        return None
+    for key, pred_value in pred_params.items():
+        if key not in label_params or label_params[key] is None:
+            if is_similar_tool and not is_label_tool:
+                ## similar tool may name the same parameter differently
+                return None
+            ## standard parameter value not provided, skipped and considered consistent
+            continue
+        if pred_value == label_params[key]:
+            continue
+        if normalize_param_value(pred_value, key) != normalize_param_value(label_params[key], key):
+            return None
+    return 1, 1
+
 def check_ast(pred_tool_result_list: List[Dict], label_result_list: List[Dict], query: str, model_name: str = MODEL_SELECTION_GPT4O) -> Tuple[bool, bool]:
     """
         Check the AST of tool calls
         model_name: required, the LLM as a judge can verify the parameters are aligned. For example, the "query" used in search tools may be 
         rewrited by Function Call models. And LLM as a judge need to determine if the query is correctedly rewritten that match the original query.
         Default: Using GPT4o
+        Tool mismatch and exact or normalized equal parameters are decided by rule_based_check_ast, only the ambiguous
+        parameter comparisons are sent to the LLM as a judge.
     """
     try:
         if pred_tool_result_list == label_result_list:
             return True, True
+        rule_based_result = rule_based_check_ast(pred_tool_result_list, label_result_list)
+        if rule_based_result is not None:
+            return rule_based_result
         label_step = 1
         predict_step = 1
         if (label_step == 1 and predict_step == 1):
             user_prompt = user_prompt_template_ast.format(pred_tool_result_list=pred_tool_result_list, label_result_list=label_result_list, query=query)
             system_prompt = system_prompt_template_ast_single.format()
+            judge_cache = get_judge_cache()
+            cache_key = judge_cache.make_key(pred_tool_result_list, label_result_list, query, model_name, system_prompt) if judge_cache is not None else None
+            if cache_key is not None:
+                cached_verdict = judge_cache.get(cache_key)
+                if cached_verdict is not None:
+                    return cached_verdict
             messages = [
                 {
                     "role": "system",
@@ -101,7 +206,8 @@ def check_ast(pred_tool_result_list: List[Dict], label_result_list: List[Dict],
             # print("[debug]  check_ast result: ", result)
             tool_correctness = result["tool_correctness"] if "tool_correctness" in result else 0
             parameter_correctness = result["parameter_correctness"] if "parameter_correctness" in result else 0
-            
+            if cache_key is not None:
+                judge_cache.put(cache_key, tool_correctness, parameter_correctness)
         else:
             ## multiple
             return False, False
@@ -111,6 +217,106 @@ def check_ast(pred_tool_result_list: List[Dict], label_result_list: List[Dict],
         print (f"check_ast failed with error {e}")
         return 0, 0
 
+def batch_check_ast(items: List[Dict], model_name: str = MODEL_SELECTION_GPT4O, batch_size: int = DEFAULT_JUDGE_BATCH_SIZE, concurrency: int = 1) -> List[Tuple[int, int]]:
+    """
+        Batch version of check_ast, packs up to batch_size (prediction, label, query) items into one judge prompt.
+        Exact matches, rule_based_check_ast and the judge cache are consulted first, so only the ambiguous items are sent.
+        Items missing or malformed in the judge output fall back to check_ast one by one.
+
+        Args:
+            items: list of dict with keys pred_tool_result_list, label_result_list, query
+            batch_size: number of items per judge prompt
+            concurrency: number of judge prompts in flight
+        Return:
+            List[Tuple[int, int]]: (tool_correctness, parameter_correctness) of each item, in the order of items
+    """
+    results = [None] * len(items)
+    judge_cache = get_judge_cache()
+    ## verdicts share the cache with check_ast, the batch prompt applies the same rubric as the single prompt
+    system_prompt_single = system_prompt_template_ast_single.format()
+    cache_keys = [None] * len(items)
+    pending_index_list = []
+    for i, item in enumerate(items):
+        pred_tool_result_list = item.get("pred_tool_result_list", [])
+        label_result_list = item.get("label_result_list", [])
+        if pred_tool_result_list == label_result_list:
+            results[i] = (True, True)
+            continue
+        rule_based_result = rule_based_check_ast(pred_tool_result_list, label_result_list)
+        if rule_based_result is not None:
+            results[i] = rule_based_result
+            continue
+        if judge_cache is not None:
+            cache_keys[i] = judge_cache.make_key(pred_tool_result_list, label_result_list, item.get("query", ""), model_name, system_prompt_single)
+            cached_verdict = judge_cache.get(cache_keys[i])
+            if cached_verdict is not None:
+                results[i] = cached_verdict
+                continue
+        pending_index_list.append(i)
+
+    batch_size = max(1, batch_size)
+    batch_index_lists = [pending_index_list[start:start + batch_size] for start in range(0, len(pending_index_list), batch_size)]
+
+    def judge_batch(batch_index_list):
+        verdicts = call_batch_judge([items[i] for i in batch_index_list], model_name)
+        for item_id, i in enumerate(batch_index_list):
+            if item_id in verdicts:
+                results[i] = verdicts[item_id]
+                if cache_keys[i] is not None:
+                    judge_cache.put(cache_keys[i], verdicts[item_id][0], verdicts[item_id][1])
+            else:
+                item = items[i]
+                results[i] = check_ast(item.get("pred_tool_result_list", []), item.get("label_result_list", []), item.get("query", ""), model_name)
+
+    if concurrency > 1 and len(batch_index_lists) > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(tqdm(executor.map(judge_batch, batch_index_lists), total=len(batch_index_lists), desc="Judging batches"))
+    else:
+        for batch_index_list in tqdm(batch_index_lists, desc="Judging batches"):
+            judge_batch(batch_index_list)
+    return results
+
+def call_batch_judge(batch_items: List[Dict], model_name: str) -> Dict[int, Tuple[int, int]]:
+    """
+        Send one batch judge prompt, item_id is the position of the item in batch_items
+        Return:
+            Dict: item_id -> (tool_correctness, parameter_correctness), items failed to parse are missing
+    """
+    verdicts = {}
+    try:
+        user_prompt = "".join([
+            user_prompt_template_ast_batch_item.format(item_id=item_id, pred_tool_result_list=item.get("pred_tool_result_list", []), label_result_list=item.get("label_result_list", []), query=item.get("query", ""))
+            for item_id, item in enumerate(batch_items)
+        ])
+        messages = [
+            {
+                "role": "system",
+                "content": system_prompt_template_ast_batch.format()
+            },
+            {
+                "role": "user",
+                "content": user_prompt
+            }
+        ]
+        model_provider = get_model_provider(model_name)
+        output = model_provider.api_chat(messages, wait_time=5) if model_provider is not None else {}
+        raw_response = output[KEY_COMPLETION] if KEY_COMPLETION in output else ""
+        result = json.loads(process_response(raw_response)) if isinstance(raw_response, str) else raw_response
+        if isinstance(result, dict):
+            result = result.get("results", [result])
+        for verdict in result if isinstance(result, list) else []:
+            if not isinstance(verdict, dict) or "item_id" not in verdict:
+                continue
+            try:
+                item_id = int(verdict["item_id"])
+            except (TypeError, ValueError):
+                continue
+            if 0 <= item_id < len(batch_items):
+                verdicts[item_id] = (verdict.get("tool_correctness", 0), verdict.get("parameter_correctness", 0))
+    except Exception as e:
+        logging.error(f"call_batch_judge failed with error {e}")
+    return verdicts
+
 def check_single_tool_call_dag(pred_tool_result: Dict, label_result: Dict) -> Tuple[bool, bool]:
     # implementation
     # print("[debug] pred_tool_result:", pred_tool_result)
@@ -187,57 +393,61 @@ def check_multi_tool_call_dag(pred_tool_result_list: List[Dict], label_result_li
     
     return check_single_tool_call_dag(pred_leaf_nodes, label_leaf_nodes)
 
-if __name__ == "__main__":
-    # Read the input JSON file
-    input_file_path = "logs/browser/browser_0711_single_500_20250713_080044.json"
-    output_file_path = "logs/browser/browser_0711_single_500_20250713_080044_ast.json"
-    # input_file_path = "logs/browser/test_log.json"
-    # output_file_path = "logs/browser/test_log_ast.json"
-    
+def rescore_log_file(input_file_path: str, output_file_path: str, model_name: str = MODEL_SELECTION_GPT4O, batch_size: int = DEFAULT_JUDGE_BATCH_SIZE, concurrency: int = 1) -> Dict:
+    """
+        Re-run the AST check of every trial in an existing run log as a separate scoring pass,
+        batch_size > 1 uses batch_check_ast, batch_size 1 calls check_ast per trial.
+        The tool_correctness and parameter_correctness of the trials are overwritten and written to output_file_path.
+    """
+    data = load_run_log(input_file_path)
+
+    items = []
+    trial_list = []
+    for run_detail in data.get("run_details", []):
+        function_call_label = run_detail.get("function_call_label", [])
+        query = run_detail.get("query", "")
+        for trial in run_detail.get("trials", []):
+            items.append({
+                "pred_tool_result_list": trial.get("function_call_result", []),
+                "label_result_list": function_call_label,
+                "query": query
+            })
+            trial_list.append(trial)
+    print(f"Total trials to process: {len(items)}")
+
+    if batch_size > 1:
+        verdict_list = batch_check_ast(items, model_name=model_name, batch_size=batch_size, concurrency=concurrency)
+    else:
+        verdict_list = [check_ast(item["pred_tool_result_list"], item["label_result_list"], item["query"], model_name) for item in tqdm(items, desc="Judging trials")]
+
+    for trial, (tool_correctness, parameter_correctness) in zip(trial_list, verdict_list):
+        trial["tool_correctness"] = True if tool_correctness == 1 else False
+        trial["parameter_correctness"] = True if parameter_correctness == 1 else False
+
+    output_dir = os.path.dirname(output_file_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    save_run_log(data, output_file_path)
+    print(f"Processing completed. Output written to {output_file_path}")
+    return data
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-score tool_correctness and parameter_correctness of a run log with LLM as a judge')
+    parser.add_argument('--input_file', required=True, help='Run log file of the tool_call stage, .json or .jsonl')
+    parser.add_argument('--output_file', default=None, help='Output log file, default is <input_file>_ast with the input extension')
+    parser.add_argument('--llm_as_judge_model', default=MODEL_SELECTION_GPT4O, help='LLM Model used as a judge, default is {}'.format(MODEL_SELECTION_GPT4O))
+    parser.add_argument('--batch_size', type=int, default=DEFAULT_JUDGE_BATCH_SIZE, help='Number of trials packed in one judge prompt, 1 sends one prompt per trial, default is {}'.format(DEFAULT_JUDGE_BATCH_SIZE))
+    parser.add_argument('--concurrency', type=int, default=1, help='Number of judge prompts in flight, default is 1')
+    args = parser.parse_args()
+
+    input_name, input_ext = os.path.splitext(args.input_file)
+    output_file_path = args.output_file or input_name + "_ast" + input_ext
     try:
-        with open(input_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Calculate total number of function calls to process
-        total_function_calls = 0
-        for run_detail in data.get("run_details", []):
-            for trial in run_detail.get("trials", []):
-                total_function_calls += len(trial.get("function_call_result", []))
-        
-        print(f"Total function calls to process: {total_function_calls}")
-        
-        # Process each run_detail with progress bar
-        processed_calls = 0
-        for run_detail in tqdm(data.get("run_details", []), desc="Processing run_details"):
-            function_call_label = run_detail.get("function_call_label", [])
-            query = run_detail.get("query", [])
-            
-            # Process each trial
-            for trial in run_detail.get("trials", []):
-                function_call_results = trial.get("function_call_result", [])
-                
-                # Call check_ast with function_call_label and function_call_result
-                tool_correctness, parameter_correctness = check_ast(
-                    function_call_results, 
-                    function_call_label,
-                    query
-                )
-                
-                # Add the new fields to function_call_result
-                trial["tool_correctness"] = True if tool_correctness == 1 else False
-                trial["parameter_correctness"] = True if parameter_correctness == 1 else False
-                
-                processed_calls += 1
-        
-        # Write the output file
-        with open(output_file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        
-        print(f"Processing completed. Output written to {output_file_path}")
-        
+        rescore_log_file(args.input_file, output_file_path, model_name=args.llm_as_judge_model, batch_size=args.batch_size, concurrency=args.concurrency)
     except FileNotFoundError:
-        print(f"Error: Input file {input_file_path} not found")
+        print(f"Error: Input file {args.input_file} not found")
     except json.JSONDecodeError as e:
         print(f"Error: Invalid JSON in input file: {e}")
-    except Exception as e:
-        print(f"Error: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,39 @@
 import uuid
 import json
 import logging
-import requests
+import asyncio
+import threading
 import os
 import datetime
-from typing import List, Dict, Any, Tuple
-from concurrent.futures import ProcessPoolExecutor
+import math
+import queue
+import itertools
+import time
+from collections import deque
+from typing import List, Dict, Any, Tuple, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor, Future
 from tqdm import tqdm
-import requests
 
 from src.mcp_tool_bench.global_variables import *
 from src.mcp_tool_bench.model_utils.model_provider import get_model_provider
 from src.mcp_tool_bench.evaluation.evaluation_utils import _global_tool_result_check_func_provider, base_compare_result, estimate_pass_at_k
+from src.mcp_tool_bench.evaluation.pass_at_k import PassAtKCounts, summarize_pass_at_k, format_pass_at_k_metric
+from src.mcp_tool_bench.evaluation.confidence import get_interval_estimator, DEFAULT_CI_METHOD, DEFAULT_CI_LEVEL
+from src.mcp_tool_bench.evaluation.adaptive_sampling import AdaptiveTrialAllocator, format_adaptive_summary, ADAPTIVE_MODE_OFF, DEFAULT_ADAPTIVE_TOLERANCE, KEY_ADAPTIVE_TRIALS
 from src.mcp_tool_bench.common_utils import *
+from src.mcp_tool_bench.http_utils import DEFAULT_POOL_SIZE
 from src.mcp_tool_bench.model_utils.base_api import *
 from src.mcp_tool_bench.agents.base_tool_call_agent.check_functions import check_ast, check_multi_tool_call_dag, check_single_tool_call_dag
-
-def tools_openai_wrapper(tools):
-    tools_wrapped = [{
-        "type": "function",
-        "function":{
-            "name": tool["name"] if "name" in tool else "", 
-            "description": tool["description"] if "description" in tool else "",
-            "parameters": tool["input_schema"] if "input_schema" in tool else {}
-        }
-    } for tool in tools]
-    return tools_wrapped
-
-def rev_tool_servername_dict(mcp_server_tools):
-    """
-        Args:
-            mcp_server_tools: 
-            key: server_name, value, list of tool_name
-        
-        Return:
-            Dict, key: tool_name, value: server_name
-            if tool_name conflicts, add {server_name}_{tool_name} as tool_name
-    """
-    tool_to_servername_dict = {}
-    for key, value in mcp_server_tools.items():
-        for tool_name in value:
-            if tool_name in tool_to_servername_dict:
-                tool_to_servername_dict[key + "_" + tool_name] = key
-            else:
-                tool_to_servername_dict[tool_name] = key
-    return tool_to_servername_dict
+from src.mcp_tool_bench.utils.dataset import iter_dataset, count_dataset_items
+from src.mcp_tool_bench.utils.run_log import is_jsonl_log_path, load_run_log, iter_run_log, atomic_write_json, RECORD_TYPE_HEADER, RECORD_TYPE_TASK, RECORD_TYPE_FOOTER, JsonlRunLogWriter, TrialCheckpoint, RUN_LOG_FORMAT_JSON, RUN_LOG_FORMAT_JSONL, TRIAL_CHECKPOINT_SUFFIX
+from src.mcp_tool_bench.evaluation.judge_cache import configure_judge_cache, DEFAULT_JUDGE_CACHE_PATH
+from src.mcp_tool_bench.utils.timing import PhaseTimer, LatencyStats, optional_phase, format_latency_summary, PHASE_LLM_FUNCTION_CALL, PHASE_TOOL_EXECUTION, PHASE_JSON_PARSE, PHASE_JUDGE, PHASE_LOG_WRITE, KEY_LATENCY_MS, KEY_LATENCY
+from src.mcp_tool_bench.utils.token_usage import TokenUsage, TokenUsageStats, load_token_prices, format_token_usage_summary, KEY_TOKEN_USAGE
+from src.mcp_tool_bench.model_utils.cassette import configure_cassette, CASSETTE_MODE_OFF, DEFAULT_CASSETTE_PATH
+from src.mcp_tool_bench.model_utils.rate_limiter import configure_rate_limiter, load_rate_limit_rules, get_rate_limiter_stats
+from src.mcp_tool_bench.agents.base_tool_call_agent.tool_executor import get_tool_executor, configure_tool_executor
+from src.mcp_tool_bench.agents.base_tool_call_agent.tool_result_cache import ToolResultCache, load_tool_cache_rules, TOOL_CACHE_MODE_OFF, DEFAULT_TOOL_CACHE_PATH
+from src.mcp_tool_bench.agents.base_tool_call_agent.tool_set import ToolSet, get_tool_set_registry, rev_tool_servername_dict
 
 def fill_default_tool_arguments(server_name, tool_name, tool_arguments):
     # Provide default values for common variables
@@ -71,6 +60,20 @@ def fill_default_tool_arguments(server_name, tool_name, tool_arguments):
     return filled_tool_arguments
 
 
+def get_loop_tool_set(tools: List[Dict], **kwargs) -> ToolSet:
+    """
+        ToolSet of the task, passed in by the caller (tool_set=) or looked up in the registry from tools and mcp_tools_dict
+    """
+    tool_set = kwargs[KEY_TOOL_SET] if KEY_TOOL_SET in kwargs else None
+    if tool_set is None:
+        mcp_tools_dict = kwargs[KEY_MCP_TOOLS_DICT] if KEY_MCP_TOOLS_DICT in kwargs else {}
+        tool_set = get_tool_set_registry().get_tool_set(tools, mcp_tools_dict)
+    return tool_set
+
+# LLM rounds of the agent loop, each round dispatches all the tool calls of the response as one step,
+# 1 keeps the single step evaluation, raise it (--max_iterations) for multi-step tasks
+DEFAULT_MAX_ITERATIONS = 1
+
 def agent_loop(query: str, tools: List[Dict], model: str, **kwargs) -> List[Dict]:
     """
     Agent loop for executing tool calls
@@ -79,31 +82,31 @@ def agent_loop(query: str, tools: List[Dict], model: str, **kwargs) -> List[Dict
         query: User query
         tools: Available tools list
         model: Model name
-        **kwargs: Other parameters
+        **kwargs: Other parameters, timer: optional PhaseTimer of the trial, adds the LLM, tool and parse time,
+            token_usage: optional TokenUsage of the trial, adds the usage of the LLM calls,
+            max_iterations: LLM rounds, default DEFAULT_MAX_ITERATIONS, the loop ends earlier when the model calls no tool
         
     Returns:
-        List[Dict]: Tool Call Result Node, 
+        List[Dict]: Tool Call Result Node, the tool calls of a round share the same step
         function_call_result.append({
             "id": tool_id,
             "name": tool_name,
             "input": tool_arguments,
             "output": tool_result,
-            "status_code": status_code
+            "status_code": status_code,
+            "step": "1"
         })
     """
-
-    tool_result_list = []
-    
-    mcp_tools_dict = kwargs[KEY_MCP_TOOLS_DICT] if KEY_MCP_TOOLS_DICT in kwargs else {}
-    mcp_tools_dict = rev_tool_servername_dict(mcp_tools_dict)
-
-    ## claude format to OpenAI format
-
-    # print (f"tools type {type(tools)} and result {tools}")
-
+    tool_set = get_loop_tool_set(tools, **kwargs)
     # toolname to servername dict
+    mcp_tools_dict = tool_set.tool_to_server_dict
+    # tools in the provider format, rendered once per tool set
+    tools_mapped = tool_set.render(get_tool_format(model))
+    timer = kwargs.get("timer")
+    token_usage = kwargs.get("token_usage")
+
     iterations = 0
-    max_iterations = 1
+    max_iterations = kwargs.get("max_iterations") or DEFAULT_MAX_ITERATIONS
 
     call_messages = [
         {"role": "user", "content": query}
@@ -114,77 +117,155 @@ def agent_loop(query: str, tools: List[Dict], model: str, **kwargs) -> List[Dict
     while ((not loop_end) and iterations < max_iterations):
         iterations += 1
         # print (f"Running Iterations {iterations}")
-        tools_mapped = tools_openai_wrapper(tools)
-        # print (f"agent_loop tools type {type(tools)} and result {tools}")
-        tool_call = call_llm_tools_function_call_wrapper(model, {"messages": call_messages, "tools": tools_mapped})
-        print (f"Iteration {iterations} agent_loop tool_call result {tool_call}")
-
-        if tool_call is None or len(tool_call) == 0:
-            # no tools selected, end of function call
-            # logging.info(f"Iteration {iterations} No Tools Chosen by LLM tool_call")
-            loop_end = True 
+        with optional_phase(timer, PHASE_LLM_FUNCTION_CALL):
+            tool_calls = call_llm_tools_function_call_list_wrapper(model, {"messages": call_messages, "tools": tools_mapped, "token_usage": token_usage})
+        print (f"Iteration {iterations} agent_loop tool_calls result {tool_calls}")
 
+        with optional_phase(timer, PHASE_JSON_PARSE):
+            parsed_tool_calls = parse_llm_tool_calls(tool_calls, mcp_tools_dict)
+        if len(parsed_tool_calls) == 0:
+            # no tools selected or end of sequence tool call
+            loop_end = True
         else:
-            # print (f"DEBUG: tool_call {tool_call}")
-            tool_id = tool_call["id"] if "id" in tool_call else str(uuid.uuid4()) ## if tool_id not returned, using uuid
-            is_function_call = tool_call["is_function_call"] if "is_function_call" in tool_call else False
-            if is_function_call:
-                tool_name = tool_call["function_name"] if "function_name" in tool_call else (tool_call["name"] if "name" in tool_call else "")
-                server_name = mcp_tools_dict[tool_name] if tool_name in mcp_tools_dict else ""
-                tool_arguments_str = tool_call["function_arguments"] if "function_arguments" in tool_call else (tool_call["arguments"] if "arguments" in tool_call else {})
-                tool_arguments_json = {}
-                try:
-                    tool_arguments_json = json.loads(tool_arguments_str)
-                except Exception as e:
-                    logging.error(f" Failed to parse json {e}")
-                tool_arguments = fill_default_tool_arguments(server_name, tool_name, tool_arguments_json)
-                # print (f"Iteration {iterations} DEBUG: Convertion tool_arguments  is {tool_arguments}")
-                
-                ## tool call input
-                message_tool_assistant = tool_call_parameter_wrapper(model, tool_id, tool_name, tool_arguments)
-                call_messages.append(message_tool_assistant)
-                # print (f"### Agent Loop model {model} message_tool_assistant {message_tool_assistant}")
-                # print (f"DEBUG: tool_name {tool_name}, server_name {server_name}, mcp_tools_dict {mcp_tools_dict}")
-
-                tool_name = get_conflict_toolname_original(tool_name, server_name)
-                tool_output = run_tool_call(server_name, tool_name, tool_arguments)
-                print (f"Iteration {iterations} DEBUG: agent_loop run_tool_call input server_name {server_name}|tool_name {tool_name}| tool_arguments {tool_arguments}| tool_output {tool_output}")
-                
-                ## append message
-                status_code = tool_output["status_code"]
-                tool_result = tool_output["result"]
+            ## tool call input, the parallel tool calls of the step in one assistant message
+            call_messages.append(tool_calls_parameter_wrapper(model, parsed_tool_calls))
 
-                ## Add Message Claude Style
-                message_tool_result = tool_call_result_wrapper(model, tool_id, tool_name, tool_result)
-                # print (f"### Agent Loop model {model} message_tool_result {message_tool_result}")
-                
-                call_messages.append(message_tool_result)
-
-                function_call_result.append({
-                    "id": tool_id,
-                    "name": tool_name,
-                    "input": tool_arguments_json,
-                    "output": tool_output,
-                    "status_code": status_code
-                })
-            else:
-                ## end of sequence tool call
-                # print (f"Iteration {iterations} DEBUG: End of Sequence Tool Calls")
-                loop_end = True
-        # print (f"Iteration {iterations} DEBUG: Iteration {iterations} call_messages {call_messages}")
+            with optional_phase(timer, PHASE_TOOL_EXECUTION):
+                tool_outputs = run_step_tool_calls(parsed_tool_calls)
+            for parsed_tool_call, tool_output in zip(parsed_tool_calls, tool_outputs):
+                print (f"Iteration {iterations} DEBUG: agent_loop run_tool_call input server_name {parsed_tool_call['server_name']}|tool_name {parsed_tool_call['original_name']}| tool_arguments {parsed_tool_call['arguments']}| tool_output {tool_output}")
 
-    # print (f"Iteration {iterations} DEBUG: Final call_messages {call_messages}")
+            ## Add Message Claude Style
+            call_messages.extend(build_step_tool_result_messages(model, parsed_tool_calls, tool_outputs))
+            function_call_result.extend(build_step_function_call_result_nodes(parsed_tool_calls, tool_outputs, iterations))
 
     # construct final call result in format
     return function_call_result
 
-def call_llm_tools_function_call_wrapper(model, kwargs):
+async def async_agent_loop(query: str, tools: List[Dict], model: str, **kwargs) -> List[Dict]:
+    """
+    Async version of agent_loop, the LLM call uses the provider aapi_function_call and the
+    MCP tool calls use async_run_tool_call, so one event loop can drive many trials at the same time.
+
+    Args and Returns are the same as agent_loop
+    """
+    tool_set = get_loop_tool_set(tools, **kwargs)
+    mcp_tools_dict = tool_set.tool_to_server_dict
+    tools_mapped = tool_set.render(get_tool_format(model))
+    timer = kwargs.get("timer")
+    token_usage = kwargs.get("token_usage")
+
+    iterations = 0
+    max_iterations = kwargs.get("max_iterations") or DEFAULT_MAX_ITERATIONS
+
+    call_messages = [
+        {"role": "user", "content": query}
+    ]
+    function_call_result = []
+    loop_end = False
+    while ((not loop_end) and iterations < max_iterations):
+        iterations += 1
+        with optional_phase(timer, PHASE_LLM_FUNCTION_CALL):
+            tool_calls = await async_call_llm_tools_function_call_list_wrapper(model, {"messages": call_messages, "tools": tools_mapped, "token_usage": token_usage})
+        print (f"Iteration {iterations} async_agent_loop tool_calls result {tool_calls}")
+
+        with optional_phase(timer, PHASE_JSON_PARSE):
+            parsed_tool_calls = parse_llm_tool_calls(tool_calls, mcp_tools_dict)
+        if len(parsed_tool_calls) == 0:
+            loop_end = True
+        else:
+            call_messages.append(tool_calls_parameter_wrapper(model, parsed_tool_calls))
+
+            with optional_phase(timer, PHASE_TOOL_EXECUTION):
+                tool_outputs = await async_run_step_tool_calls(parsed_tool_calls)
+
+            call_messages.extend(build_step_tool_result_messages(model, parsed_tool_calls, tool_outputs))
+            function_call_result.extend(build_step_function_call_result_nodes(parsed_tool_calls, tool_outputs, iterations))
+
+    return function_call_result
+
+def parse_llm_tool_call(tool_call: Dict, mcp_tools_dict: Dict) -> Dict:
+    """
+        Args:
+            tool_call: dict, function call returned by call_llm_tools_function_call_wrapper
+            mcp_tools_dict: dict, key: tool_name, value: server_name, output of rev_tool_servername_dict
+        Return:
+            None if no tool is chosen by LLM, otherwise
+            Dict: id, name, server_name, original_name (tool name on the MCP server), arguments_json (parsed LLM output) and arguments (filled with default values)
+    """
+    if tool_call is None or len(tool_call) == 0:
+        # no tools selected, end of function call
+        return None
+    is_function_call = tool_call["is_function_call"] if "is_function_call" in tool_call else False
+    if not is_function_call:
+        ## end of sequence tool call
+        return None
+
+    tool_id = tool_call["id"] if "id" in tool_call else str(uuid.uuid4()) ## if tool_id not returned, using uuid
+    tool_name = tool_call["function_name"] if "function_name" in tool_call else (tool_call["name"] if "name" in tool_call else "")
+    server_name = mcp_tools_dict[tool_name] if tool_name in mcp_tools_dict else ""
+    tool_arguments_str = tool_call["function_arguments"] if "function_arguments" in tool_call else (tool_call["arguments"] if "arguments" in tool_call else {})
+    tool_arguments_json = {}
+    try:
+        # Claude returns the tool input as a dict, the OpenAI style APIs as a json string
+        tool_arguments_json = tool_arguments_str if isinstance(tool_arguments_str, dict) else json.loads(tool_arguments_str)
+    except Exception as e:
+        logging.error(f" Failed to parse json {e}")
+    tool_arguments = fill_default_tool_arguments(server_name, tool_name, tool_arguments_json)
+    return {
+        "id": tool_id,
+        "name": tool_name,
+        "server_name": server_name,
+        "original_name": get_conflict_toolname_original(tool_name, server_name),
+        "arguments_json": tool_arguments_json,
+        "arguments": tool_arguments
+    }
+
+def parse_llm_tool_calls(tool_calls: List[Dict], mcp_tools_dict: Dict) -> List[Dict]:
+    """
+        parse_llm_tool_call of each tool call of an LLM response, an empty list if the LLM chose no tool
+    """
+    parsed_tool_calls = []
+    for tool_call in tool_calls or []:
+        parsed_tool_call = parse_llm_tool_call(tool_call, mcp_tools_dict)
+        if parsed_tool_call is not None:
+            parsed_tool_calls.append(parsed_tool_call)
+    return parsed_tool_calls
+
+def build_function_call_result_node(tool_id: str, tool_name: str, tool_arguments_json: Dict, tool_output: Dict, step: Optional[str] = None) -> Dict:
+    """
+        Tool Call Result Node saved in function_call_result of the trial
+    """
+    node = {
+        "id": tool_id,
+        "name": tool_name,
+        "input": tool_arguments_json,
+        "output": tool_output,
+        "status_code": tool_output["status_code"]
+    }
+    if step is not None:
+        node["step"] = step
+    return node
+
+def build_step_function_call_result_nodes(parsed_tool_calls: List[Dict], tool_outputs: List[Dict], iteration: int) -> List[Dict]:
+    """
+        Tool Call Result Nodes of one step, the step is the iteration as a string like the "step" of the labels
+    """
+    return [build_function_call_result_node(parsed_tool_call["id"], parsed_tool_call["original_name"], parsed_tool_call["arguments_json"], tool_output, step=str(iteration))
+            for parsed_tool_call, tool_output in zip(parsed_tool_calls, tool_outputs)]
+
+def build_step_tool_result_messages(model: str, parsed_tool_calls: List[Dict], tool_outputs: List[Dict]) -> List[Dict]:
+    return tool_calls_result_wrapper(model, [{"id": parsed_tool_call["id"], "name": parsed_tool_call["original_name"], "result": tool_output["result"]}
+                                             for parsed_tool_call, tool_output in zip(parsed_tool_calls, tool_outputs)])
+
+def call_llm_tools_function_call_list_wrapper(model, kwargs) -> List[Dict]:
     """
+        All the tool calls of the LLM response, parallel tool calls return several
         Args:
             model: str
-            kwargs: dict
+            kwargs: dict, messages, tools and an optional token_usage: TokenUsage the usage of the call is added to
         Return:
-            dict
+            list of dict, in the format of call_llm_tools_function_call_wrapper
     """
     tools = kwargs["tools"] if "tools" in kwargs else []
     messages = kwargs["messages"] if "messages" in kwargs else []
@@ -192,12 +273,61 @@ def call_llm_tools_function_call_wrapper(model, kwargs):
 
     model_provider = get_model_provider(model)
     if model_provider is None:
-        logging.error(f"ERROR: call_llm_tools_function_call_wrapper model {model} missing API implementation in _global_model_provider of module model_utils.model_provider")
-        return None
+        logging.error(f"ERROR: call_llm_tools_function_call_list_wrapper model {model} missing API implementation in the provider registry of module model_utils.model_provider")
+        return []
     result = model_provider.api_function_call(messages, tools)
     # logging.info(f"Output result {result}")
+    if kwargs.get("token_usage") is not None:
+        kwargs["token_usage"].add(result.get(KEY_USAGE))
+    return get_function_call_list(result)
+
+async def async_call_llm_tools_function_call_list_wrapper(model, kwargs) -> List[Dict]:
+    """
+        Async version of call_llm_tools_function_call_list_wrapper
+    """
+    tools = kwargs["tools"] if "tools" in kwargs else []
+    messages = kwargs["messages"] if "messages" in kwargs else []
+
+    model_provider = get_model_provider(model)
+    if model_provider is None:
+        logging.error(f"ERROR: async_call_llm_tools_function_call_list_wrapper model {model} missing API implementation in the provider registry of module model_utils.model_provider")
+        return []
+    result = await model_provider.aapi_function_call(messages, tools)
+    if kwargs.get("token_usage") is not None:
+        kwargs["token_usage"].add(result.get(KEY_USAGE))
+    return get_function_call_list(result)
+
+def get_function_call_list(result: Dict) -> List[Dict]:
+    """
+        Tool calls of a provider result, results without KEY_FUNCTION_CALL_LIST (e.g. recorded in an older cassette) have the first one only
+    """
+    if KEY_FUNCTION_CALL_LIST in result:
+        return result[KEY_FUNCTION_CALL_LIST]
     tool_call_dict = result[KEY_FUNCTION_CALL] if KEY_FUNCTION_CALL in result else {}
-    return tool_call_dict
+    return [tool_call_dict] if tool_call_dict else []
+
+def call_llm_tools_function_call_wrapper(model, kwargs):
+    """
+        Args:
+            model: str
+            kwargs: dict, messages, tools and an optional token_usage: TokenUsage the usage of the call is added to
+        Return:
+            dict, the first tool call of the LLM response
+    """
+    tool_calls = call_llm_tools_function_call_list_wrapper(model, kwargs)
+    return tool_calls[0] if tool_calls else {}
+
+async def async_call_llm_tools_function_call_wrapper(model, kwargs):
+    """
+        Async version of call_llm_tools_function_call_wrapper
+        Args:
+            model: str
+            kwargs: dict
+        Return:
+            dict
+    """
+    tool_calls = await async_call_llm_tools_function_call_list_wrapper(model, kwargs)
+    return tool_calls[0] if tool_calls else {}
 
 def call_llm_prediction(query: str, tools: List[Dict], gpt_api) -> Tuple[str, Dict]:
     """
@@ -217,7 +347,8 @@ def call_llm_prediction(query: str, tools: List[Dict], gpt_api) -> Tuple[str, Di
 
 def run_tool_call(server_name: str, tool_name: str, function_call_params: Dict) -> Any:
     """
-    Running MCP Function Tool Call and Post to Local REST API from open mcp_marketplace
+    Running MCP Function Tool Call and Post to Local REST API from open mcp_marketplace,
+    through the shared MCPToolExecutor which keeps a pool of keep-alive connections.
     
     Args:
         server_name: e.g. amap-maps,  the key in mcp config  {"mcpServers": {"amap-maps": {},  "github": {}}}
@@ -227,49 +358,51 @@ def run_tool_call(server_name: str, tool_name: str, function_call_params: Dict)
     Returns:
         Any: return MCP results
     """
-    try:
+    return get_tool_executor().run_tool_call(server_name, tool_name, function_call_params)
 
-        assert isinstance(server_name, str) and server_name is not None
-        assert isinstance(tool_name, str) and tool_name is not None
-        assert isinstance(function_call_params, Dict) and function_call_params is not None
-        # logging.info(f"Running MCP server_name {server_name} Tool {tool_name} Call Params {function_call_params}")
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.99 Safari/537.36',
-                "Content-Type": "application/json"
-        }
-        url = 'http://127.0.0.1:5000/api/query'
-        
-        # rename tool name to avoid conflicts
-        tool_name_map = {
-            "google-search": "search",
-            "tavily-search": "tavily_search",
-            "tavily-crawl": "tavily_crawl",
-            "tavily-map": "tavily_map",
-            "tavily-extract": "tavily_extract"
-        }
-        tool_name_use = tool_name_map[tool_name] if tool_name in tool_name_map else tool_name
-        
-        input_params = {
-            "server_id": server_name, 
-            "tool_name": tool_name_use,
-            "tool_input": function_call_params
-        }
-        response = requests.post(url, data=json.dumps(input_params), headers=headers, timeout=5)
-        status_code = response.status_code
-        result_json = response.json()
-        # print (f"DEBUG: run_tool_call response {result_json}")
-        output = {
-            "status_code": status_code,
-            "result": result_json
-        }
-        return output
-    except Exception as e:
-        # return 500 server error code
-        # logging.error(f" Failed to run_tool_call mcp server_name {server_name} toolname {tool_name} function_call_params {function_call_params} with error {e}")
-        output = {
-            "status_code": 500,
-            "result": {}
-        }
-        return output
+async def async_run_tool_call(server_name: str, tool_name: str, function_call_params: Dict) -> Any:
+    """
+    Async version of run_tool_call, post to the same local REST API with the pooled httpx.AsyncClient
+    of the shared MCPToolExecutor
+
+    Args and Returns are the same as run_tool_call
+    """
+    return await get_tool_executor().arun_tool_call(server_name, tool_name, function_call_params)
+
+## pool of the parallel tool calls of one step, shared by the trials and created on first use
+_tool_dispatch_executor = None
+_tool_dispatch_lock = threading.Lock()
+
+def get_tool_dispatch_executor() -> ThreadPoolExecutor:
+    global _tool_dispatch_executor
+    with _tool_dispatch_lock:
+        if _tool_dispatch_executor is None:
+            _tool_dispatch_executor = ThreadPoolExecutor(max_workers=DEFAULT_POOL_SIZE, thread_name_prefix="ToolDispatch")
+        return _tool_dispatch_executor
+
+def run_step_tool_calls(parsed_tool_calls: List[Dict]) -> List[Dict]:
+    """
+    Run the tool calls of one step at the same time, a single call runs inline on the trial thread
+
+    Args:
+        parsed_tool_calls: list of parse_llm_tool_call outputs
+    Returns:
+        List of run_tool_call outputs in the order of parsed_tool_calls
+    """
+    if len(parsed_tool_calls) == 1:
+        parsed_tool_call = parsed_tool_calls[0]
+        return [run_tool_call(parsed_tool_call["server_name"], parsed_tool_call["original_name"], parsed_tool_call["arguments"])]
+    executor = get_tool_dispatch_executor()
+    futures = [executor.submit(run_tool_call, parsed_tool_call["server_name"], parsed_tool_call["original_name"], parsed_tool_call["arguments"])
+               for parsed_tool_call in parsed_tool_calls]
+    return [future.result() for future in futures]
+
+async def async_run_step_tool_calls(parsed_tool_calls: List[Dict]) -> List[Dict]:
+    """
+    Async version of run_step_tool_calls, the tool calls of the step are gathered on the event loop
+    """
+    return list(await asyncio.gather(*[async_run_tool_call(parsed_tool_call["server_name"], parsed_tool_call["original_name"], parsed_tool_call["arguments"])
+                                       for parsed_tool_call in parsed_tool_calls]))
 
 def check_correctness(pred_tool_result_list: List[Dict], label_result_list: List[Dict]) -> Tuple[bool, bool]:
     """
@@ -329,17 +462,19 @@ def get_log_file_path(args):
     logs_dir = os.path.join(os.getcwd(), "logs", args.category)
     os.makedirs(logs_dir, exist_ok=True)
     
+    # json: whole log rewritten after each task, jsonl: one record appended per task
+    log_format = getattr(args, "log_format", None) or RUN_LOG_FORMAT_JSON
     if args.log_file:
-        # Use specified log file name
-        if not args.log_file.endswith('.json'):
-            args.log_file += '.json'
+        # Use specified log file name, an explicit .json or .jsonl extension selects the format
+        if not args.log_file.endswith('.json') and not args.log_file.endswith('.jsonl'):
+            args.log_file += '.' + log_format
         log_file_path = os.path.join(logs_dir, args.log_file)
     else:
         # Generate filename: based on input filename and current time
         input_filename = os.path.basename(args.input_file)
         input_name = os.path.splitext(input_filename)[0]  # Remove extension
         current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_filename = f"{input_name}_{current_time}.json"
+        log_filename = f"{input_name}_{current_time}.{log_format}"
         log_file_path = os.path.join(logs_dir, log_filename)
     
     return log_file_path
@@ -359,8 +494,8 @@ def load_existing_log(log_file_path, args, total_instances):
     """
     if os.path.exists(log_file_path):
         try:
-            with open(log_file_path, 'r', encoding='utf-8') as f:
-                log_data = json.load(f)
+            # json layout, or JSONL records scanned into the json layout keeping only the trial results of each task
+            log_data = load_run_log(log_file_path) if not is_jsonl_log_path(log_file_path) else load_run_log_summary(log_file_path)
             
             # Validate that the log file is compatible with current run
             run_info = log_data.get("run_info", {})
@@ -381,12 +516,46 @@ def load_existing_log(log_file_path, args, total_instances):
                 return create_new_log_data(args, total_instances), 0
                 
         except Exception as e:
+            # keep the unreadable log for inspection instead of overwriting it with the new run
+            corrupt_log_file_path = f"{log_file_path}.corrupt_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            os.replace(log_file_path, corrupt_log_file_path)
             print(f"Error loading existing log file: {e}")
+            print(f"WARNING: moved the unreadable log file to {corrupt_log_file_path}, starting a new run")
             return create_new_log_data(args, total_instances), 0
     else:
         return create_new_log_data(args, total_instances), 0
 
 
+# fields of a trial_detail used by the final metrics
+TRIAL_RESULT_KEYS = ["trial_idx", "if_pass", "tool_correctness", "parameter_correctness", KEY_LATENCY_MS, KEY_TOKEN_USAGE]
+
+def summarize_task_details(task_details: Dict) -> Dict:
+    """
+    Trial results of a task_details, all the final metrics need. Runs with a JSONL log keep these in run_details
+    instead of the whole task, which is already in the append-only log, so memory doesn't grow with the tool outputs.
+    """
+    return {
+        "idx": task_details.get("idx"),
+        "call_type": task_details.get("call_type"),
+        "trials": [{key: trial[key] for key in TRIAL_RESULT_KEYS if key in trial} for trial in task_details.get("trials", [])]
+    }
+
+def load_run_log_summary(log_file_path: str) -> Dict:
+    """
+    Read a run log task by task into the json layout, with run_details holding summarize_task_details of each task
+    """
+    log_data = {"run_info": {}, "metrics": [], "run_details": []}
+    for record_type, record in iter_run_log(log_file_path):
+        if record_type == RECORD_TYPE_HEADER:
+            log_data["run_info"] = record.get("run_info", {})
+        elif record_type == RECORD_TYPE_TASK:
+            log_data["run_details"].append(summarize_task_details(record.get("task", {})))
+        elif record_type == RECORD_TYPE_FOOTER:
+            log_data["run_info"] = record.get("run_info", log_data["run_info"])
+            log_data["metrics"] = record.get("metrics", [])
+    return log_data
+
+
 def create_new_log_data(args, total_instances):
     """
     Create new log data structure
@@ -405,6 +574,11 @@ def create_new_log_data(args, total_instances):
             "category": args.category,
             "pass_k": args.pass_k,
             "evaluation_trial_per_task": args.evaluation_trial_per_task,
+            "concurrency": getattr(args, "concurrency", 1),
+            "async_loop": getattr(args, "async_loop", False),
+            "judge_concurrency": get_pipeline_limits(args)[1],
+            "judge_queue_size": get_pipeline_limits(args)[2],
+            "adaptive_trials": getattr(args, "adaptive_trials", None) or ADAPTIVE_MODE_OFF,
             "start_time": datetime.datetime.now().isoformat(),
             "total_instances": total_instances
         },
@@ -415,7 +589,7 @@ def create_new_log_data(args, total_instances):
 
 def save_log_file_incremental(log_data, log_file_path):
     """
-    Save log file incrementally (overwrites existing file)
+    Save log file incrementally (atomically replaces the existing file, a kill during the write keeps the previous checkpoint)
     
     Args:
         log_data: Dictionary containing run information
@@ -423,14 +597,434 @@ def save_log_file_incremental(log_data, log_file_path):
     """
     try:
         # Save log file
-        with open(log_file_path, 'w', encoding='utf-8') as f:
-            json.dump(log_data, f, ensure_ascii=False, indent=2)
+        atomic_write_json(log_data, log_file_path)
         
     except Exception as e:
         logging.error(f"Failed to save log file: {e}")
         print(f"Warning: Failed to save log file: {e}")
 
 
+def preprocess_task_data(data: Dict) -> Dict:
+    """
+    Parse one dataset instance into the inputs needed by the trials of a task
+
+    Args:
+        data: one instance of the dataset json array
+
+    Returns:
+        Dict: query, tools, function_call_label, mcp_tools_dict, call_type (single or multiple) and the shared tool_set of the task
+    """
+    query = data["query"]
+    tools = json.loads(data["tools"]) if isinstance(data["tools"], str) else data["tools"]
+    function_call_label = json.loads(data["function_call_label"]) if isinstance(data["function_call_label"], str) else data["function_call_label"]
+
+    mcp_server_tools = data["mcp_tools_dict"] if "mcp_tools_dict" in data else {}
+    mcp_server_tools_dict = json.loads(mcp_server_tools) if isinstance(mcp_server_tools, str) else mcp_server_tools
+    return {
+        "query": query,
+        "tools": tools,
+        "function_call_label": function_call_label,
+        "mcp_tools_dict": mcp_server_tools_dict,
+        "call_type": data.get("call_type"),
+        KEY_TOOL_SET: get_tool_set_registry().get_tool_set(tools, mcp_server_tools_dict)
+    }
+
+
+def run_single_trial(trial_idx: int, task_input: Dict, args) -> Dict:
+    """
+    Run one trial of a task: agent loop, correctness check and AST check by LLM as a judge
+
+    Args:
+        trial_idx: index of the trial within the task
+        task_input: output of preprocess_task_data
+        args: Command line arguments
+
+    Returns:
+        Dict: trial_detail saved in the log
+    """
+    # Execute tool call
+    timer = PhaseTimer()
+    token_usage = TokenUsage()
+    function_call_result = agent_loop(task_input["query"], task_input["tools"], args.model, mcp_tools_dict=task_input["mcp_tools_dict"], tool_set=task_input.get(KEY_TOOL_SET), timer=timer, token_usage=token_usage, max_iterations=getattr(args, "max_iterations", None))
+    print (f"DEBUG: function_call_result {function_call_result}")
+    return evaluate_trial(trial_idx, function_call_result, task_input, args, timer=timer, token_usage=token_usage)
+
+
+async def async_run_single_trial(trial_idx: int, task_input: Dict, args) -> Dict:
+    """
+    Async version of run_single_trial, the agent loop runs on the event loop and the
+    blocking checks (LLM as a judge) run in a worker thread.
+    """
+    timer = PhaseTimer()
+    token_usage = TokenUsage()
+    function_call_result = await async_agent_loop(task_input["query"], task_input["tools"], args.model, mcp_tools_dict=task_input["mcp_tools_dict"], tool_set=task_input.get(KEY_TOOL_SET), timer=timer, token_usage=token_usage, max_iterations=getattr(args, "max_iterations", None))
+    return await asyncio.to_thread(evaluate_trial, trial_idx, function_call_result, task_input, args, timer, token_usage)
+
+
+def evaluate_trial(trial_idx: int, function_call_result: List[Dict], task_input: Dict, args, timer: Optional[PhaseTimer] = None,
+                   token_usage: Optional[TokenUsage] = None) -> Dict:
+    """
+    Check the function_call_result of one trial against the label
+
+    Args:
+        timer: optional PhaseTimer of the agent loop, the judge time is added and the phases are saved in latency_ms
+        token_usage: optional TokenUsage of the LLM calls of the agent loop, saved in token_usage
+
+    Returns:
+        Dict: trial_detail saved in the log
+    """
+    query = task_input["query"]
+    function_call_label = task_input["function_call_label"]
+    with optional_phase(timer, PHASE_JUDGE):
+        # bool result
+        tool_consistency, output_consistency = check_correctness(function_call_result, function_call_label)
+        if_pass = output_consistency
+        tool_correctness, parameter_correctness = check_ast(
+            function_call_result, 
+            function_call_label,
+            query,
+            args.llm_as_judge_model
+        )
+    # Record detailed information for each trial
+    trial_detail = {
+        "trial_idx": trial_idx,
+        "function_call_result": function_call_result,
+        "if_pass": if_pass,
+        # "tool_correctness": True if tool_correctness == 1 else False,
+        "tool_correctness": tool_consistency,
+        "parameter_correctness": True if parameter_correctness == 1 else False
+    }
+    if timer is not None:
+        trial_detail[KEY_LATENCY_MS] = timer.to_dict()
+    if token_usage is not None:
+        trial_detail[KEY_TOKEN_USAGE] = token_usage.to_dict()
+    return trial_detail
+
+
+class AsyncTrialRunner:
+    """
+    Runs trial coroutines on one event loop in a background thread, at most `concurrency`
+    of them are in flight at the same time. submit() returns a concurrent.futures.Future,
+    so the caller consumes results the same way as with a ThreadPoolExecutor.
+
+    Usage:
+        runner = AsyncTrialRunner(concurrency=500)
+        future = runner.submit(async_run_single_trial, trial_idx, task_input, args)
+        trial_detail = future.result()
+        runner.shutdown()
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.thread = threading.Thread(target=self.loop.run_forever, name="AsyncTrialRunner", daemon=True)
+        self.thread.start()
+
+    async def _run_limited(self, coroutine_function, *args):
+        async with self.semaphore:
+            return await coroutine_function(*args)
+
+    def submit(self, coroutine_function, *args):
+        return asyncio.run_coroutine_threadsafe(self._run_limited(coroutine_function, *args), self.loop)
+
+    def shutdown(self):
+        async def _cancel_pending():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # the connection pool of the MCP tool calls belongs to this loop
+            await get_tool_executor().aclose()
+        asyncio.run_coroutine_threadsafe(_cancel_pending(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+# seconds between retries of a stage one trial waiting for a free slot on a full judge queue
+JUDGE_QUEUE_POLL_INTERVAL = 0.05
+
+def get_pipeline_limits(args) -> Tuple[int, int, int]:
+    """
+    Concurrency limits of the trial pipeline from the command line arguments
+
+    Returns:
+        Tuple[int, int, int]: (concurrency, judge_concurrency, judge_queue_size),
+        judge_concurrency defaults to concurrency and judge_queue_size to 2 * judge_concurrency
+    """
+    concurrency = getattr(args, "concurrency", 1) or 1
+    judge_concurrency = getattr(args, "judge_concurrency", None) or concurrency
+    judge_queue_size = getattr(args, "judge_queue_size", None) or 2 * judge_concurrency
+    return concurrency, judge_concurrency, judge_queue_size
+
+def get_trial_allocator(args) -> AdaptiveTrialAllocator:
+    """
+    AdaptiveTrialAllocator of the command line arguments, --adaptive_trials off runs all evaluation_trial_per_task trials
+    """
+    return AdaptiveTrialAllocator(
+        getattr(args, "adaptive_trials", None) or ADAPTIVE_MODE_OFF,
+        max_trials=args.evaluation_trial_per_task,
+        k_list=[int(k) for k in str(args.pass_k).split(",")],
+        min_trials=getattr(args, "adaptive_min_trials", None),
+        tolerance=getattr(args, "adaptive_tolerance", None) or DEFAULT_ADAPTIVE_TOLERANCE,
+        level=getattr(args, "ci_level", None) or DEFAULT_CI_LEVEL
+    )
+
+
+class TrialPipeline:
+    """
+    Two stage pipeline of trials. Stage one runs the agent loop (model under test and MCP tool calls)
+    with up to `concurrency` trials in flight, on threads or on one event loop (AsyncTrialRunner).
+    Finished trials are put on a bounded judge queue, which `judge_concurrency` judge workers drain
+    running evaluate_trial (correctness check and LLM as a judge).
+    When the judge stage lags, the full queue blocks stage one workers, so memory stays bounded
+    by judge_queue_size waiting trials.
+
+    Usage:
+        pipeline = TrialPipeline(args, concurrency=64, judge_concurrency=8, judge_queue_size=32)
+        future = pipeline.submit(trial_idx, task_input)
+        trial_detail = future.result()
+        pipeline.shutdown()
+    """
+
+    def __init__(self, args, concurrency: int, judge_concurrency: int, judge_queue_size: int, async_loop: bool = False):
+        self.args = args
+        self.judge_queue = queue.Queue(maxsize=max(1, judge_queue_size))
+        self.stop_event = threading.Event()
+        self.runner = AsyncTrialRunner(concurrency) if async_loop else None
+        self.executor = None if async_loop else ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="TrialExecutor")
+        self.judge_threads = [threading.Thread(target=self._judge_worker, name=f"TrialJudge-{i}", daemon=True) for i in range(max(1, judge_concurrency))]
+        for judge_thread in self.judge_threads:
+            judge_thread.start()
+
+    def submit(self, trial_idx: int, task_input: Dict) -> Future:
+        """
+        Submit one trial, the returned future resolves to the trial_detail after both stages
+        """
+        result_future = Future()
+        if self.runner is not None:
+            self.runner.submit(self._async_execute, trial_idx, task_input, result_future)
+        else:
+            self.executor.submit(self._execute, trial_idx, task_input, result_future)
+        return result_future
+
+    def _execute(self, trial_idx: int, task_input: Dict, result_future: Future):
+        timer = PhaseTimer()
+        token_usage = TokenUsage()
+        try:
+            function_call_result = agent_loop(task_input["query"], task_input["tools"], self.args.model, mcp_tools_dict=task_input["mcp_tools_dict"], tool_set=task_input.get(KEY_TOOL_SET), timer=timer, token_usage=token_usage, max_iterations=getattr(self.args, "max_iterations", None))
+        except BaseException as e:
+            result_future.set_exception(e)
+            return
+        judge_item = (trial_idx, function_call_result, task_input, result_future, timer, token_usage)
+        while not self.stop_event.is_set():
+            try:
+                self.judge_queue.put(judge_item, timeout=JUDGE_QUEUE_POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+        result_future.cancel()
+
+    async def _async_execute(self, trial_idx: int, task_input: Dict, result_future: Future):
+        timer = PhaseTimer()
+        token_usage = TokenUsage()
+        try:
+            function_call_result = await async_agent_loop(task_input["query"], task_input["tools"], self.args.model, mcp_tools_dict=task_input["mcp_tools_dict"], tool_set=task_input.get(KEY_TOOL_SET), timer=timer, token_usage=token_usage, max_iterations=getattr(self.args, "max_iterations", None))
+        except asyncio.CancelledError:
+            result_future.cancel()
+            raise
+        except Exception as e:
+            result_future.set_exception(e)
+            return
+        judge_item = (trial_idx, function_call_result, task_input, result_future, timer, token_usage)
+        # wait for a free slot without blocking the event loop, the trial keeps its concurrency slot meanwhile
+        while not self.stop_event.is_set():
+            try:
+                self.judge_queue.put_nowait(judge_item)
+                return
+            except queue.Full:
+                await asyncio.sleep(JUDGE_QUEUE_POLL_INTERVAL)
+        result_future.cancel()
+
+    def _judge_worker(self):
+        while True:
+            judge_item = self.judge_queue.get()
+            if judge_item is None:
+                return
+            trial_idx, function_call_result, task_input, result_future, timer, token_usage = judge_item
+            if not result_future.set_running_or_notify_cancel():
+                continue
+            try:
+                result_future.set_result(evaluate_trial(trial_idx, function_call_result, task_input, self.args, timer=timer, token_usage=token_usage))
+            except Exception as e:
+                result_future.set_exception(e)
+
+    def shutdown(self):
+        self.stop_event.set()
+        if self.runner is not None:
+            self.runner.shutdown()
+        else:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        # drop trials still waiting for a judge, then stop the judge workers
+        while True:
+            try:
+                judge_item = self.judge_queue.get_nowait()
+            except queue.Empty:
+                break
+            if judge_item is not None:
+                judge_item[3].cancel()
+        for _ in self.judge_threads:
+            self.judge_queue.put(None)
+        for judge_thread in self.judge_threads:
+            judge_thread.join()
+
+
+def build_task_details(idx: int, task_input: Dict, trial_details: List[Dict], args) -> Dict:
+    """
+    Build the task level log entry from the trial details, which are ordered by trial_idx
+
+    Args:
+        idx: index of the task in the dataset
+        task_input: output of preprocess_task_data
+        trial_details: list of trial_detail returned by run_single_trial
+        args: Command line arguments
+
+    Returns:
+        Dict: task_details appended to run_details
+    """
+    k_results = [trial["if_pass"] for trial in trial_details]
+    k_tool_correct_results = [trial["tool_correctness"] for trial in trial_details]
+    k_parameter_correct_results = [trial["parameter_correctness"] for trial in trial_details]
+    task_details = {
+        "idx": idx,
+        "query": task_input["query"],
+        # "tools": tools,
+        "function_call_label": task_input["function_call_label"],
+        # "mcp_tools_dict": mcp_server_tools_dict,
+        "call_type": task_input.get("call_type"),
+        "trials": trial_details
+    }
+
+    # Add task-level summary information
+    task_details["k_results"] = k_results
+    task_details["k_tool_correct_results"] = k_tool_correct_results
+    task_details["k_parameter_correct_results"] = k_parameter_correct_results
+    task_details["data_pass"] = any(k_results)
+    task_details["tool_data_pass"] = any(k_tool_correct_results)
+    task_details["parameter_data_pass"] = any(k_parameter_correct_results)
+    # fewer than evaluation_trial_per_task when --adaptive_trials stopped the task early
+    task_details["num_trials"] = len(trial_details)
+    task_details["num_passed"] = sum(k_results)
+    task_details["num_tool_correct"] = sum(k_tool_correct_results)
+    task_details["num_parameter_correct"] = sum(k_parameter_correct_results)
+    return task_details
+
+
+def iter_task_results(data_list: Iterable[Dict], start_idx: int, args, trial_checkpoint: TrialCheckpoint = None):
+    """
+    Run the trials of all tasks from start_idx and yield the results task by task in dataset order,
+    so the caller can append to run_details and save the log exactly like the sequential run.
+
+    With args.concurrency > 1 (or args.judge_concurrency > 1), trials of the next few tasks go through
+    a TrialPipeline: the agent loop of up to concurrency trials runs on a bounded thread pool, and
+    judging runs on its own judge_concurrency workers fed by a bounded queue of judge_queue_size trials.
+    With args.async_loop, the agent loops are coroutines driven by one event loop (AsyncTrialRunner),
+    which scales to many more in-flight trials than threads.
+    With args.adaptive_trials, the trials of a task run in batches of the AdaptiveTrialAllocator and the
+    task stops once it is settled, so trial_details can be shorter than evaluation_trial_per_task.
+
+    Args:
+        data_list: dataset instances, a list or an iterator such as iter_dataset, read one task ahead of the trials at a time
+        start_idx: index of the first task to run, e.g. resumed from load_existing_log
+        args: Command line arguments
+        trial_checkpoint: optional, trials found in it are not run again and every finished trial is added to it
+
+    Yields:
+        Tuple[int, Dict, List[Dict]]: (task idx, task_input, trial_details ordered by trial_idx)
+    """
+    concurrency, judge_concurrency, judge_queue_size = get_pipeline_limits(args)
+    async_loop = getattr(args, "async_loop", False)
+    num_trials = args.evaluation_trial_per_task
+    allocator = get_trial_allocator(args)
+
+    # tasks before start_idx are already in the log, they are read past but not kept
+    data_items = itertools.islice(enumerate(data_list), start_idx, None)
+
+    if concurrency <= 1 and judge_concurrency <= 1 and not async_loop:
+        for i, data in data_items:
+            task_input = preprocess_task_data(data)
+            checkpoint_trials = trial_checkpoint.get(i) if trial_checkpoint is not None else {}
+            trial_details = []
+            batch_size = allocator.next_batch_size(trial_details)
+            while batch_size > 0:
+                for idx in range(len(trial_details), len(trial_details) + batch_size):
+                    if idx in checkpoint_trials:
+                        trial_details.append(checkpoint_trials[idx])
+                        continue
+                    trial_detail = run_single_trial(idx, task_input, args)
+                    if trial_checkpoint is not None:
+                        trial_checkpoint.add(i, trial_detail)
+                    trial_details.append(trial_detail)
+                batch_size = allocator.next_batch_size(trial_details)
+            yield i, task_input, trial_details
+        return
+
+    def submit_task_trials(i, task_input, start_trial_idx, batch_size):
+        checkpoint_trials = trial_checkpoint.get(i) if trial_checkpoint is not None else {}
+        futures = []
+        for idx in range(start_trial_idx, start_trial_idx + batch_size):
+            if idx in checkpoint_trials:
+                future = Future()
+                future.set_result(checkpoint_trials[idx])
+            else:
+                future = pipeline.submit(idx, task_input)
+                if trial_checkpoint is not None:
+                    future.add_done_callback(lambda f, i=i: trial_checkpoint.add(i, f.result()) if not f.cancelled() and f.exception() is None else None)
+            futures.append(future)
+        return futures
+
+    def submit_next_batch(task_entry, wait: bool) -> bool:
+        """
+        Submit the next batch of trials of a pending task once its submitted trials finished,
+        Returns: False when the task is done
+        """
+        i, task_input, futures = task_entry
+        if not wait and not all(future.done() for future in futures):
+            return True
+        batch_size = allocator.next_batch_size([future.result() for future in futures])
+        if batch_size > 0:
+            futures.extend(submit_task_trials(i, task_input, len(futures), batch_size))
+        return batch_size > 0
+
+    pipeline = TrialPipeline(args, concurrency, judge_concurrency, judge_queue_size, async_loop=async_loop)
+    # number of tasks submitted ahead, enough to keep both stages busy while the head task finishes
+    window_size = max(1, math.ceil((2 * concurrency + judge_concurrency + judge_queue_size) / max(1, num_trials)))
+    pending_tasks = deque()
+    data_exhausted = False
+    try:
+        while not data_exhausted or pending_tasks:
+            while not data_exhausted and len(pending_tasks) < window_size:
+                next_item = next(data_items, None)
+                if next_item is None:
+                    data_exhausted = True
+                    break
+                next_idx, data = next_item
+                task_input = preprocess_task_data(data)
+                futures = submit_task_trials(next_idx, task_input, 0, allocator.next_batch_size([]))
+                pending_tasks.append((next_idx, task_input, futures))
+            if not pending_tasks:
+                break
+            # adaptive trials: tasks of the window whose batch finished get their next batch, the head task is waited for
+            for task_entry in itertools.islice(pending_tasks, 1, None):
+                submit_next_batch(task_entry, wait=False)
+            while submit_next_batch(pending_tasks[0], wait=True):
+                pass
+            i, task_input, futures = pending_tasks.popleft()
+            yield i, task_input, [future.result() for future in futures]
+    finally:
+        pipeline.shutdown()
+
 def run_benchmark(args):
     """
     Run benchmark test with incremental logging and resume functionality
@@ -458,171 +1052,167 @@ def run_benchmark(args):
         raise ValueError(error_msg)
     
     print(f"Validation passed: EVALUATION_TRIAL_PER_TASK={args.evaluation_trial_per_task}, max_pass_k={max_pass_k}")
+
+    # Shared MCP tool executor, keep at least one connection per concurrent trial alive
+    mcp_pool_size = getattr(args, "mcp_pool_size", None) or max(DEFAULT_POOL_SIZE, getattr(args, "concurrency", 1) or 1)
+    # Optional cache of the tool outputs, cache (per server ttl), record or strict replay
+    tool_cache_mode = getattr(args, "tool_cache_mode", None) or TOOL_CACHE_MODE_OFF
+    tool_result_cache = ToolResultCache(
+        path=getattr(args, "tool_cache_path", None) or DEFAULT_TOOL_CACHE_PATH,
+        mode=tool_cache_mode,
+        rules=load_tool_cache_rules(getattr(args, "tool_cache_rules", None))
+    ) if tool_cache_mode != TOOL_CACHE_MODE_OFF else None
+    tool_executor = configure_tool_executor(base_url=getattr(args, "mcp_base_url", None), pool_size=mcp_pool_size, result_cache=tool_result_cache)
+    print(f"MCP tool executor: {tool_executor.query_url} with connection pool size {mcp_pool_size}")
+    if tool_result_cache is not None:
+        print(f"MCP tool result cache: {tool_result_cache.mode} {tool_result_cache.path}")
+
+    # Shared LLM-as-judge verdict cache of check_ast
+    judge_cache = configure_judge_cache(
+        path=getattr(args, "judge_cache_path", None) or DEFAULT_JUDGE_CACHE_PATH,
+        enabled=not getattr(args, "no_judge_cache", False)
+    )
+    print(f"LLM-as-judge cache: {judge_cache.path if judge_cache is not None else 'disabled'}")
+
+    # Record or replay of the model provider calls (tool calls and LLM-as-judge)
+    cassette = configure_cassette(
+        mode=getattr(args, "cassette_mode", None) or CASSETTE_MODE_OFF,
+        path=getattr(args, "cassette_path", None) or DEFAULT_CASSETTE_PATH
+    )
+    if cassette is not None:
+        print(f"Model call cassette: {cassette.mode} {cassette.path}")
+
+    # Client side RPM/TPM limits and retries of the model providers, the adaptive concurrency of a provider
+    # starts at the most calls the trials and the judges can have in flight and backs off when throttled
+    rate_limit_rules = load_rate_limit_rules(getattr(args, "rate_limits", None))
+    if getattr(args, "max_retries", None) is not None:
+        rate_limit_rules = {**rate_limit_rules, "default": {**rate_limit_rules.get("default", {}), "max_retries": args.max_retries}}
+    concurrency, judge_concurrency, _ = get_pipeline_limits(args)
+    configure_rate_limiter(rules=rate_limit_rules, max_concurrency=concurrency + judge_concurrency)
     
-    # Loading Data from Instances
-    with open(args.input_file, 'r', encoding='utf-8') as f:
-        data_list = json.load(f)
-    
-    # data_list = data_list[:500] # for debug
-    print(f"Loaded {len(data_list)} instances of data files")
+    # Instances are read from the dataset file one task at a time (legacy or normalized dataset, items share the tool catalog),
+    # the number of instances comes from the normalized dataset header or a streaming count
+    total_instances = count_dataset_items(args.input_file)
+    data_list = iter_dataset(args.input_file)
+    print(f"Found {total_instances} instances of data files")
     
     # Determine log file path
     log_file_path = get_log_file_path(args)
     
     # Check for existing log file for resume functionality
-    log_data, start_idx = load_existing_log(log_file_path, args, len(data_list))
+    log_data, start_idx = load_existing_log(log_file_path, args, total_instances)
     
     if start_idx > 0:
         print(f"Resuming from task {start_idx} (found existing log file: {log_file_path})")
     else:
         print(f"Starting new benchmark run (log file: {log_file_path})")
+
+    # JSONL run log: append one record per task instead of rewriting the whole log
+    run_log_writer = JsonlRunLogWriter(log_file_path, log_data["run_info"], resume=start_idx > 0) if is_jsonl_log_path(log_file_path) else None
+    if run_log_writer is None and start_idx == 0:
+        # checkpoint run_info before the first task, so the trials of task 0 can be resumed too
+        save_log_file_incremental(log_data, log_file_path)
+
+    # Trials finished before their task is logged, resume only re-runs the trials in flight
+    trial_checkpoint = TrialCheckpoint(log_file_path + TRIAL_CHECKPOINT_SUFFIX, run_id=log_data["run_info"].get("start_time", ""), start_idx=start_idx)
+    if len(trial_checkpoint) > 0:
+        print(f"Resuming {len(trial_checkpoint)} finished trials from {trial_checkpoint.checkpoint_path}")
     
+    # Time of the run log writes, one sample per task
+    log_write_stats = LatencyStats()
+
     # Process remaining tasks with progress bar
-    remaining_tasks = len(data_list) - start_idx
+    remaining_tasks = total_instances - start_idx
     if remaining_tasks > 0:
         print(f"\nProcessing {remaining_tasks} remaining tasks...")
         
-        for i in tqdm(range(start_idx, len(data_list)), desc="Processing tasks", unit="task", initial=start_idx, total=len(data_list)):
-            data = data_list[i]
-            
-            ## preprocess data line
-            query = data["query"]
-            tools = json.loads(data["tools"]) if isinstance(data["tools"], str) else data["tools"]
-            function_call_label = json.loads(data["function_call_label"]) if isinstance(data["function_call_label"], str) else data["function_call_label"]
-
-            mcp_server_tools = data["mcp_tools_dict"] if "mcp_tools_dict" in data else {}
-            mcp_server_tools_dict = json.loads(mcp_server_tools) if isinstance(mcp_server_tools, str) else mcp_server_tools
-
-            ## change to parallel
-            k_results = []
-            k_tool_correct_results = []
-            k_parameter_correct_results = []
-            task_details = {
-                "idx": i,
-                "query": query,
-                # "tools": tools,
-                "function_call_label": function_call_label,
-                # "mcp_tools_dict": mcp_server_tools_dict,
-                "trials": []
-            }
-            
-            for idx in range(args.evaluation_trial_per_task):
-                # Execute tool call
-                function_call_result = agent_loop(query, tools, args.model, mcp_tools_dict=mcp_server_tools_dict)
-                print (f"DEBUG: function_call_result {function_call_result}")
-                # bool result
-                tool_consistency, output_consistency = check_correctness(function_call_result, function_call_label)
-                if_pass = output_consistency
-                tool_correctness, parameter_correctness = check_ast(
-                    function_call_result, 
-                    function_call_label,
-                    query,
-                    args.llm_as_judge_model
-                )
-                k_results.append(if_pass)
-                # k_tool_correct_results.append(True if tool_correctness == 1 else False)
-                k_tool_correct_results.append(tool_consistency)
-                k_parameter_correct_results.append(True if parameter_correctness == 1 else False)
-                
-                # Record detailed information for each trial
-                trial_detail = {
-                    "trial_idx": idx,
-                    "function_call_result": function_call_result,
-                    "if_pass": if_pass,
-                    # "tool_correctness": True if tool_correctness == 1 else False,
-                    "tool_correctness": tool_consistency,
-                    "parameter_correctness": True if parameter_correctness == 1 else False
-                }
-                task_details["trials"].append(trial_detail)
-
-            # Add task-level summary information
-            task_details["k_results"] = k_results
-            task_details["k_tool_correct_results"] = k_tool_correct_results
-            task_details["k_parameter_correct_results"] = k_parameter_correct_results
-            task_details["data_pass"] = any(k_results)
-            task_details["tool_data_pass"] = any(k_tool_correct_results)
-            task_details["parameter_data_pass"] = any(k_parameter_correct_results)
-            task_details["num_trials"] = args.evaluation_trial_per_task
-            task_details["num_passed"] = sum(k_results)
-            task_details["num_tool_correct"] = sum(k_tool_correct_results)
-            task_details["num_parameter_correct"] = sum(k_parameter_correct_results)
-            
-            log_data["run_details"].append(task_details)
+        task_results = iter_task_results(data_list, start_idx, args, trial_checkpoint=trial_checkpoint)
+        for i, task_input, trial_details in tqdm(task_results, desc="Processing tasks", unit="task", initial=start_idx, total=total_instances):
+            task_details = build_task_details(i, task_input, trial_details, args)
             
             # Save log incrementally after each task
-            save_log_file_incremental(log_data, log_file_path)
+            log_write_start = time.perf_counter()
+            if run_log_writer is not None:
+                run_log_writer.append_task(task_details)
+                log_data["run_details"].append(summarize_task_details(task_details))
+            else:
+                log_data["run_details"].append(task_details)
+                save_log_file_incremental(log_data, log_file_path)
+            trial_checkpoint.discard(i)
+            log_write_stats.add(PHASE_LOG_WRITE, (time.perf_counter() - log_write_start) * 1000.0)
     else:
         print("No remaining tasks to process.")
     
     # Calculate final metrics from complete log data (similar to calculate_metrics.py)
     print("\nCalculating final metrics from complete log data...")
     
-    # Arrays to store results for each task
-    num_trails_array = []
-    num_pass_array = []
-    num_tool_correct_array = []
-    num_parameter_correct_array = []
+    # Trial counts of each task, pass@k of all the k values is computed from them in one vectorized pass
+    pass_at_k_counts = PassAtKCounts()
+    latency_stats = LatencyStats()
+    token_usage_stats = TokenUsageStats()
     
     # Process each task from the complete log
     for task in log_data["run_details"]:
         trials = task.get("trials", [])
-        if not trials:
+        if not pass_at_k_counts.add_task(trials, category=args.category, model=args.model, call_type=task.get("call_type")):
             continue
-            
-        # Count trials and correct results
-        num_trials = len(trials)
-        num_passed = sum(1 for trial in trials if (trial.get("if_pass", False) and trial.get("tool_correctness", False) and trial.get("parameter_correctness", False)))
-        num_tool_correct = sum(1 for trial in trials if trial.get("tool_correctness", False))
-        num_parameter_correct = sum(1 for trial in trials if (trial.get("parameter_correctness", False) and trial.get("tool_correctness", False)))
-        
-        num_trails_array.append(num_trials)
-        num_pass_array.append(num_passed)
-        num_tool_correct_array.append(num_tool_correct)
-        num_parameter_correct_array.append(num_parameter_correct)
+        for trial in trials:
+            latency_stats.add_trial(trial)
+            token_usage_stats.add_trial(trial)
     
-    print(f"Processed {len(num_trails_array)} tasks")
-    print(f"Total trials: {sum(num_trails_array)}")
-    print(f"Total passed: {sum(num_pass_array)}")
-    print(f"Total tool correct: {sum(num_tool_correct_array)}")
-    print(f"Total parameter correct: {sum(num_parameter_correct_array)}")
-
-    # Calculate metrics for each k value
-    metrics_list = []
-    for k in pass_k_list:
-        # Calculate pass@{k} for overall correctness
-        pass_at_k_arr = estimate_pass_at_k(num_trails_array, num_pass_array, k)          
-        pass_at_k = sum(pass_at_k_arr)/len(pass_at_k_arr) if len(pass_at_k_arr) > 0 else 0
-        
-        # Calculate pass@{k} for tool correctness
-        tool_pass_at_k_arr = estimate_pass_at_k(num_trails_array, num_tool_correct_array, k)
-        tool_pass_at_k = sum(tool_pass_at_k_arr)/len(tool_pass_at_k_arr) if len(tool_pass_at_k_arr) > 0 else 0
-        
-        # Calculate pass@{k} for parameter correctness
-        parameter_pass_at_k_arr = estimate_pass_at_k(num_trails_array, num_parameter_correct_array, k)
-        parameter_pass_at_k = sum(parameter_pass_at_k_arr)/len(parameter_pass_at_k_arr) if len(parameter_pass_at_k_arr) > 0 else 0
-        
-        metric = {
-            "category": args.category,
-            "model": args.model,
-            f"pass@{k}": pass_at_k,
-            f"tool_pass@{k}": tool_pass_at_k,
-            f"parameter_pass@{k}": parameter_pass_at_k,
-            "num_tasks": len(num_trails_array),
-            "num_trials_total": sum(num_trails_array),
-            "num_passed_total": sum(num_pass_array),
-            "num_tool_correct_total": sum(num_tool_correct_array),
-            "num_parameter_correct_total": sum(num_parameter_correct_array)
-        }
-        metrics_list.append(metric)
+    totals = pass_at_k_counts.totals()
+    print(f"Processed {totals['num_tasks']} tasks")
+    print(f"Total trials: {totals['num_trials_total']}")
+    print(f"Total passed: {totals['num_passed_total']}")
+    print(f"Total tool correct: {totals['num_tool_correct_total']}")
+    print(f"Total parameter correct: {totals['num_parameter_correct_total']}")
+
+    # Calculate pass@k, tool_pass@k and parameter_pass@k for each k value
+    # with the confidence interval of each value over the tasks, --ci_method none leaves them out
+    interval_estimator = get_interval_estimator(getattr(args, "ci_method", DEFAULT_CI_METHOD), level=getattr(args, "ci_level", None),
+                                                num_resamples=getattr(args, "bootstrap_samples", None))
+    metrics_list = summarize_pass_at_k(pass_at_k_counts, pass_k_list, group_values={"category": args.category, "model": args.model},
+                                       interval_estimator=interval_estimator)
+    for k, metric in zip(pass_k_list, metrics_list):
         log_data["metrics"].append(metric)
-        
-        print(f"Pass@{k} - Overall: {pass_at_k:.4f}, Tool: {tool_pass_at_k:.4f}, Parameter: {parameter_pass_at_k:.4f}")
+        print(format_pass_at_k_metric(metric, k))
+
+    # Latency percentiles of the trial phases and the log writes of this run
+    latency_stats.merge(log_write_stats)
+    log_data["run_info"][KEY_LATENCY] = {"category": args.category, "model": args.model, "phases_ms": latency_stats.summary()}
+    print(f"Latency of the phases:\n{format_latency_summary(log_data['run_info'][KEY_LATENCY]['phases_ms'])}")
+    # Token usage of the model under test, the LLM as a judge calls are not counted
+    token_prices = load_token_prices(getattr(args, "token_price_file", None)).get(args.model)
+    log_data["run_info"][KEY_TOKEN_USAGE] = {"category": args.category, "model": args.model, "usage": token_usage_stats.summary(prices=token_prices)}
+    print(f"Token usage: {format_token_usage_summary(log_data['run_info'][KEY_TOKEN_USAGE]['usage'])}")
+    # Trials saved by --adaptive_trials, the token and cost savings are estimated from the means of the trials run
+    allocator = get_trial_allocator(args)
+    if allocator.enabled:
+        usage_summary = log_data["run_info"][KEY_TOKEN_USAGE]["usage"]
+        log_data["run_info"][KEY_ADAPTIVE_TRIALS] = allocator.summary(
+            [len(task.get("trials", [])) for task in log_data["run_details"] if task.get("trials")],
+            mean_tokens_per_trial=usage_summary.get("mean_total_tokens_per_trial"),
+            mean_cost_usd_per_trial=usage_summary.get("mean_cost_usd_per_trial"))
+        print(f"Adaptive trials: {format_adaptive_summary(log_data['run_info'][KEY_ADAPTIVE_TRIALS])}")
 
     # Add end time
     log_data["run_info"]["end_time"] = datetime.datetime.now().isoformat()
     
     # Save final log file
-    save_log_file_incremental(log_data, log_file_path)
+    if run_log_writer is not None:
+        run_log_writer.write_footer(log_data["run_info"], log_data["metrics"])
+        run_log_writer.close()
+    else:
+        save_log_file_incremental(log_data, log_file_path)
+    trial_checkpoint.close(remove=True)
+
+    if judge_cache is not None:
+        print(f"LLM-as-judge cache stats: {judge_cache.stats()}")
+    if cassette is not None:
+        print(f"Model call cassette stats: {cassette.stats()}")
+    if tool_result_cache is not None:
+        print(f"MCP tool result cache stats: {tool_result_cache.stats()}")
+    print(f"Model provider rate limiter stats: {get_rate_limiter_stats()}")
     
     print(f"Final Evaluation: {metrics_list}")
     return metrics_list
@@ -0,0 +1,206 @@
+import json
+import asyncio
+import logging
+import threading
+import httpx
+from typing import Dict, Any, Optional
+
+from src.mcp_tool_bench.global_variables import settings
+from src.mcp_tool_bench.http_utils import create_pooled_session, DEFAULT_POOL_SIZE
+from src.mcp_tool_bench.agents.base_tool_call_agent.tool_result_cache import ToolResultCache, TOOL_CACHE_MODE_REPLAY
+
+DEFAULT_MCP_BASE_URL = "http://127.0.0.1:5000"
+DEFAULT_MCP_TIMEOUT = 5
+
+# rename tool name to avoid conflicts
+MCP_TOOL_NAME_MAP = {
+    "google-search": "search",
+    "tavily-search": "tavily_search",
+    "tavily-crawl": "tavily_crawl",
+    "tavily-map": "tavily_map",
+    "tavily-extract": "tavily_extract"
+}
+
+MCP_REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/54.0.2840.99 Safari/537.36',
+    "Content-Type": "application/json"
+}
+
+class MCPToolExecutor:
+    """
+    Execute MCP tool calls by posting to the /api/query REST API of the mcp_marketplace client.
+    One executor is shared by all trials, it keeps a pool of keep-alive connections to the server.
+    With a result_cache, cached or replayed outputs are returned without calling the server.
+
+    Usage:
+        executor = get_tool_executor()
+        output = executor.run_tool_call("puppeteer", "puppeteer_navigate", {"url": "https://arxiv.org/"})
+        # {"status_code": 200, "result": {...}}
+    """
+
+    def __init__(self, base_url: Optional[str] = None, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_MCP_TIMEOUT,
+                 result_cache: Optional[ToolResultCache] = None):
+        """
+        Args:
+            base_url: e.g. http://127.0.0.1:5000, default to settings.MCP_TOOL_BASE_URL or DEFAULT_MCP_BASE_URL
+            pool_size: max number of keep-alive connections, set it to the number of concurrent trials
+            timeout: timeout in seconds of each tool call
+            result_cache: optional ToolResultCache of the tool outputs (cache, record or strict replay)
+        """
+        self.base_url = (base_url or settings.MCP_TOOL_BASE_URL or DEFAULT_MCP_BASE_URL).rstrip("/")
+        self.query_url = self.base_url + "/api/query"
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.result_cache = result_cache
+        # only retry connection errors, the request is not sent and tool calls may not be idempotent
+        self.session = create_pooled_session(pool_size=pool_size, max_retries=2, backoff_factor=0.1)
+        self.session.headers.update(MCP_REQUEST_HEADERS)
+        # created on first async call, the httpx connection pool belongs to the running event loop
+        self.async_client = None
+        self.async_client_loop = None
+
+    def build_query_input(self, server_name: str, tool_name: str, function_call_params: Dict) -> Dict:
+        """
+            Request body of the /api/query endpoint
+        """
+        tool_name_use = MCP_TOOL_NAME_MAP[tool_name] if tool_name in MCP_TOOL_NAME_MAP else tool_name
+        input_params = {
+            "server_id": server_name, 
+            "tool_name": tool_name_use,
+            "tool_input": function_call_params
+        }
+        return input_params
+
+    def get_cached_output(self, input_params: Dict) -> Optional[Dict[str, Any]]:
+        """
+            Output of the result cache, a strict replay answers a miss with a failed call instead of the server
+        """
+        if self.result_cache is None:
+            return None
+        output = self.result_cache.get(input_params)
+        if output is None and self.result_cache.mode == TOOL_CACHE_MODE_REPLAY:
+            return self.result_cache.miss_output(input_params)
+        return output
+
+    def run_tool_call(self, server_name: str, tool_name: str, function_call_params: Dict) -> Dict[str, Any]:
+        """
+        Args:
+            server_name: e.g. amap-maps,  the key in mcp config  {"mcpServers": {"amap-maps": {},  "github": {}}}
+            tool_name: e.g. maps_weather
+            function_call_params: { "city": "New York"}
+
+        Returns:
+            Dict: {"status_code": 200, "result": {}}, status_code 500 if the request failed
+        """
+        try:
+            assert isinstance(server_name, str) and server_name is not None
+            assert isinstance(tool_name, str) and tool_name is not None
+            assert isinstance(function_call_params, Dict) and function_call_params is not None
+            input_params = self.build_query_input(server_name, tool_name, function_call_params)
+            cached_output = self.get_cached_output(input_params)
+            if cached_output is not None:
+                return cached_output
+            response = self.session.post(self.query_url, data=json.dumps(input_params), timeout=self.timeout)
+            output = {
+                "status_code": response.status_code,
+                "result": response.json()
+            }
+            if self.result_cache is not None:
+                self.result_cache.put(input_params, output)
+            return output
+        except Exception as e:
+            # return 500 server error code
+            # logging.error(f" Failed to run_tool_call mcp server_name {server_name} toolname {tool_name} function_call_params {function_call_params} with error {e}")
+            output = {
+                "status_code": 500,
+                "result": {}
+            }
+            return output
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        if self.async_client is None:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            self.async_client = httpx.AsyncClient(headers=MCP_REQUEST_HEADERS, limits=limits)
+            self.async_client_loop = asyncio.get_running_loop()
+        return self.async_client
+
+    async def arun_tool_call(self, server_name: str, tool_name: str, function_call_params: Dict) -> Dict[str, Any]:
+        """
+            Async version of run_tool_call, same Args and Returns
+        """
+        try:
+            assert isinstance(server_name, str) and server_name is not None
+            assert isinstance(tool_name, str) and tool_name is not None
+            assert isinstance(function_call_params, Dict) and function_call_params is not None
+            input_params = self.build_query_input(server_name, tool_name, function_call_params)
+            cached_output = self.get_cached_output(input_params)
+            if cached_output is not None:
+                return cached_output
+            response = await self.get_async_client().post(self.query_url, content=json.dumps(input_params), timeout=self.timeout)
+            output = {
+                "status_code": response.status_code,
+                "result": response.json()
+            }
+            if self.result_cache is not None:
+                self.result_cache.put(input_params, output)
+            return output
+        except Exception as e:
+            output = {
+                "status_code": 500,
+                "result": {}
+            }
+            return output
+
+    def close(self):
+        """
+        Close the connection pools, the async client is closed on its event loop when that loop still runs in another thread
+        """
+        self.session.close()
+        async_client, loop = self.async_client, self.async_client_loop
+        self.async_client, self.async_client_loop = None, None
+        if async_client is None or loop is None or loop.is_closed():
+            return
+        if loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(async_client.aclose(), loop).result(timeout=self.timeout)
+            except Exception as e:
+                logging.warning(f"MCPToolExecutor failed to close the async client: {e}")
+        else:
+            loop.run_until_complete(async_client.aclose())
+
+    async def aclose(self):
+        """
+        Close the async client on the running event loop, e.g. before the loop of the async trials stops
+        """
+        async_client = self.async_client
+        self.async_client, self.async_client_loop = None, None
+        if async_client is not None:
+            await async_client.aclose()
+
+
+_global_tool_executor: Optional[MCPToolExecutor] = None
+_global_tool_executor_lock = threading.Lock()
+
+def configure_tool_executor(base_url: Optional[str] = None, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_MCP_TIMEOUT,
+                            result_cache: Optional[ToolResultCache] = None) -> MCPToolExecutor:
+    """
+    Replace the shared tool executor, e.g. run_benchmark sets the base url, pool size and result cache from the command line
+    """
+    global _global_tool_executor
+    with _global_tool_executor_lock:
+        if _global_tool_executor is not None:
+            _global_tool_executor.close()
+        _global_tool_executor = MCPToolExecutor(base_url=base_url, pool_size=pool_size, timeout=timeout, result_cache=result_cache)
+        logging.info(f"MCP tool executor base_url {_global_tool_executor.base_url} pool_size {pool_size}")
+        return _global_tool_executor
+
+def get_tool_executor() -> MCPToolExecutor:
+    """
+    Get the shared tool executor, created with default settings on first use
+    """
+    global _global_tool_executor
+    if _global_tool_executor is None:
+        with _global_tool_executor_lock:
+            if _global_tool_executor is None:
+                _global_tool_executor = MCPToolExecutor()
+    return _global_tool_executor
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from src.mcp_tool_bench.common_utils import canonical_json_hash
+from src.mcp_tool_bench.utils.kv_store import LRUCache, SqliteKVStore
+
+DEFAULT_TOOL_CACHE_PATH = os.path.join("logs", "cache", "tool_cache.sqlite")
+DEFAULT_TOOL_CACHE_LRU_SIZE = 4096
+
+TOOL_CACHE_MODE_OFF = "off"
+TOOL_CACHE_MODE_CACHE = "cache"
+TOOL_CACHE_MODE_RECORD = "record"
+TOOL_CACHE_MODE_REPLAY = "replay"
+TOOL_CACHE_MODES = [TOOL_CACHE_MODE_OFF, TOOL_CACHE_MODE_CACHE, TOOL_CACHE_MODE_RECORD, TOOL_CACHE_MODE_REPLAY]
+
+# status code of a strict replay miss, same as a failed tool call
+TOOL_CACHE_MISS_STATUS = 500
+
+# Cacheability rules of the cache mode, by server_id of /api/query:
+#   ttl: seconds a result is reused, null never expires, 0 never cached
+#   exclude_tools: tools with side effects, never cached, a successful call of one of them invalidates
+#                  the cached outputs of its server (in the sqlite store too, so later runs don't reuse them)
+# Servers which are not listed use default_ttl. A --tool_cache_rules json file with the same layout replaces them.
+DEFAULT_TOOL_CACHE_RULES = {
+    "default_ttl": 3600,
+    "servers": {
+        # the test project files only change through the excluded tools, which invalidate the cached reads
+        "filesystem": {"ttl": None, "exclude_tools": ["write_file", "edit_file", "create_directory", "move_file"]},
+        # stateful browser sessions, the result depends on the previous actions
+        "playwright": {"ttl": 0},
+        "puppeteer": {"ttl": 0},
+        "tavily-mcp": {"ttl": 86400},
+        "google-search": {"ttl": 86400},
+        # market prices
+        "finance-agent-mcp-server": {"ttl": 300},
+        "paypal": {"ttl": 0},
+        "alipay": {"ttl": 0}
+    }
+}
+
+def load_tool_cache_rules(file_path: Optional[str]) -> Dict:
+    if not file_path:
+        return DEFAULT_TOOL_CACHE_RULES
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def is_successful_tool_output(output: Dict) -> bool:
+    result = output.get("result")
+    return output.get("status_code") == 200 and not (isinstance(result, dict) and result.get("success") is False)
+
+
+class ToolResultCache:
+    """
+    Cache of MCP tool outputs keyed by the /api/query request (server_id, tool_name, canonical tool_input),
+    an in-memory LRU in front of a persistent sqlite store.
+
+    Modes:
+        cache   reuse successful outputs within the ttl of the server, tools excluded by the rules always call the server
+                and, when they succeed, invalidate the outputs of the server cached before them
+        record  every call goes to the server, every answered call is saved, e.g. to replay the run later
+        replay  strict, every call is answered from the store regardless of the rules and the ttl, without network,
+                a miss returns status 500 like a failed tool call, so re-runs are hermetic
+
+    Usage:
+        tool_result_cache = ToolResultCache(mode="replay", path="logs/cache/tool_cache.sqlite")
+        configure_tool_executor(base_url=..., result_cache=tool_result_cache)
+    """
+
+    def __init__(self, path: str = DEFAULT_TOOL_CACHE_PATH, mode: str = TOOL_CACHE_MODE_CACHE, rules: Optional[Dict] = None,
+                 lru_size: int = DEFAULT_TOOL_CACHE_LRU_SIZE):
+        if mode not in TOOL_CACHE_MODES or mode == TOOL_CACHE_MODE_OFF:
+            raise ValueError(f"Unknown tool cache mode {mode}, supported: {TOOL_CACHE_MODES[1:]}")
+        self.path = path
+        self.mode = mode
+        self.rules = rules if rules is not None else DEFAULT_TOOL_CACHE_RULES
+        self.lru = LRUCache(maxsize=lru_size)
+        self.store = SqliteKVStore(path, table="tool_results")
+        self._stats_lock = threading.Lock()
+        # server_id -> time of the last successful call of an excluded tool, read from the store once
+        self._invalidated_at = {}
+        self._invalidation_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0
+        self.invalidations = 0
+
+    def make_key(self, query_input: Dict) -> str:
+        return canonical_json_hash({
+            "server_id": query_input.get("server_id"),
+            "tool_name": query_input.get("tool_name"),
+            "tool_input": query_input.get("tool_input")
+        })
+
+    def get_ttl(self, server_id: str, tool_name: str) -> Optional[float]:
+        """
+        Seconds an output of the tool is reused, None never expires, 0 not cacheable
+        """
+        server_rules = self.rules.get("servers", {}).get(server_id)
+        if server_rules is None:
+            return self.rules.get("default_ttl", 0)
+        if tool_name in server_rules.get("exclude_tools", []):
+            return 0
+        return server_rules.get("ttl", self.rules.get("default_ttl", 0))
+
+    def is_excluded_tool(self, server_id: str, tool_name: str) -> bool:
+        return tool_name in self.rules.get("servers", {}).get(server_id, {}).get("exclude_tools", [])
+
+    def invalidation_key(self, server_id: str) -> str:
+        return f"invalidated_at:{server_id}"
+
+    def get_invalidated_at(self, server_id: str) -> float:
+        with self._invalidation_lock:
+            if server_id not in self._invalidated_at:
+                self._invalidated_at[server_id] = self.store.get(self.invalidation_key(server_id)) or 0.0
+            return self._invalidated_at[server_id]
+
+    def invalidate_server(self, server_id: str):
+        """
+        Outputs of the server cached until now are not reused, e.g. the reads of the filesystem after a write_file
+        """
+        invalidated_at = time.time()
+        with self._invalidation_lock:
+            self._invalidated_at[server_id] = invalidated_at
+        try:
+            self.store.put(self.invalidation_key(server_id), invalidated_at)
+            self._count("invalidations")
+        except Exception as e:
+            logging.error(f"ToolResultCache failed to save the invalidation of {server_id}: {e}")
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            setattr(self, key, getattr(self, key) + 1)
+
+    def get(self, query_input: Dict) -> Optional[Dict]:
+        """
+        Cached output of the /api/query request, None if the server has to be called
+        """
+        if self.mode == TOOL_CACHE_MODE_RECORD:
+            return None
+        ttl = None
+        if self.mode == TOOL_CACHE_MODE_CACHE:
+            ttl = self.get_ttl(query_input.get("server_id"), query_input.get("tool_name"))
+            if ttl is not None and ttl <= 0:
+                return None
+        key = self.make_key(query_input)
+        entry = self.lru.get(key)
+        if entry is None:
+            entry = self.store.get(key)
+            if entry is not None:
+                self.lru.put(key, entry)
+        if entry is None or (ttl is not None and time.time() - entry["created_at"] > ttl) or \
+                (self.mode == TOOL_CACHE_MODE_CACHE and entry["created_at"] <= self.get_invalidated_at(query_input.get("server_id"))):
+            self._count("misses")
+            return None
+        self._count("hits")
+        return entry["output"]
+
+    def miss_output(self, query_input: Dict) -> Dict:
+        logging.error(f"Tool cache replay has no recorded output of {query_input.get('server_id')}/{query_input.get('tool_name')}")
+        return {"status_code": TOOL_CACHE_MISS_STATUS, "result": {}}
+
+    def put(self, query_input: Dict, output: Dict):
+        """
+        Save the output the server answered, the cache mode keeps successful outputs of cacheable tools only
+        """
+        if self.mode == TOOL_CACHE_MODE_REPLAY:
+            return
+        if self.mode == TOOL_CACHE_MODE_CACHE:
+            if not is_successful_tool_output(output):
+                return
+            if self.is_excluded_tool(query_input.get("server_id"), query_input.get("tool_name")):
+                self.invalidate_server(query_input.get("server_id"))
+                return
+            ttl = self.get_ttl(query_input.get("server_id"), query_input.get("tool_name"))
+            if ttl is not None and ttl <= 0:
+                return
+        key = self.make_key(query_input)
+        entry = {"output": output, "created_at": time.time()}
+        self.lru.put(key, entry)
+        try:
+            self.store.put(key, entry)
+            self._count("saved")
+        except Exception as e:
+            logging.error(f"ToolResultCache failed to save the output of {query_input.get('server_id')}/{query_input.get('tool_name')}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "saved": self.saved, "invalidations": self.invalidations, "size": len(self.store)}
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,129 @@
+import json
+import threading
+from typing import Dict, List, Optional
+
+from src.mcp_tool_bench.global_variables import TOOL_FORMAT_OPENAI, TOOL_FORMAT_CLAUDE
+from src.mcp_tool_bench.common_utils import canonical_json_hash
+from src.mcp_tool_bench.model_utils.base_api import tools_openai_wrapper, tools_claude_wrapper
+from src.mcp_tool_bench.utils.kv_store import LRUCache
+
+# number of tool list objects remembered by identity, so trials of one task skip the fingerprint
+DEFAULT_TOOL_SET_IDENTITY_CACHE_SIZE = 1024
+
+def rev_tool_servername_dict(mcp_server_tools):
+    """
+        Args:
+            mcp_server_tools:
+            key: server_name, value, list of tool_name
+
+        Return:
+            Dict, key: tool_name, value: server_name
+            if tool_name conflicts, add {server_name}_{tool_name} as tool_name
+    """
+    tool_to_servername_dict = {}
+    for key, value in mcp_server_tools.items():
+        for tool_name in value:
+            if tool_name in tool_to_servername_dict:
+                tool_to_servername_dict[key + "_" + tool_name] = key
+            else:
+                tool_to_servername_dict[tool_name] = key
+    return tool_to_servername_dict
+
+TOOL_FORMAT_WRAPPERS = {
+    TOOL_FORMAT_OPENAI: tools_openai_wrapper,
+    TOOL_FORMAT_CLAUDE: tools_claude_wrapper
+}
+
+
+class RenderedTools(list):
+    """
+    Tool list rendered in a provider format, a plain list for every provider,
+    with json_bytes holding its serialized request fragment and content_hash its
+    canonical hash (cassette keys), both computed once.
+    """
+
+    def __init__(self, tools: List[Dict]):
+        super().__init__(tools)
+        self._json_bytes = None
+        self._content_hash = None
+
+    @property
+    def json_bytes(self) -> bytes:
+        if self._json_bytes is None:
+            self._json_bytes = json.dumps(self).encode("utf-8")
+        return self._json_bytes
+
+    @property
+    def content_hash(self) -> str:
+        if self._content_hash is None:
+            self._content_hash = canonical_json_hash(list(self))
+        return self._content_hash
+
+
+class ToolSet:
+    """
+    The candidate tools of a task with everything derived from them, computed once and shared by all trials:
+    the provider renderings (RenderedTools per tool format) and the tool_name to server_name index.
+
+    Usage:
+        tool_set = get_tool_set_registry().get_tool_set(tools, mcp_tools_dict)
+        tools_mapped = tool_set.render(TOOL_FORMAT_OPENAI)
+        server_name = tool_set.tool_to_server_dict[tool_name]
+    """
+
+    def __init__(self, tool_set_id: str, tools: List[Dict], mcp_tools_dict: Dict):
+        self.tool_set_id = tool_set_id
+        self.tools = tools
+        self.mcp_tools_dict = mcp_tools_dict
+        self.tool_to_server_dict = rev_tool_servername_dict(mcp_tools_dict)
+        self._renderings = {}
+        self._lock = threading.Lock()
+
+    def render(self, tool_format: str = TOOL_FORMAT_OPENAI) -> RenderedTools:
+        rendered_tools = self._renderings.get(tool_format)
+        if rendered_tools is None:
+            with self._lock:
+                rendered_tools = self._renderings.get(tool_format)
+                if rendered_tools is None:
+                    wrapper = TOOL_FORMAT_WRAPPERS.get(tool_format, tools_openai_wrapper)
+                    rendered_tools = RenderedTools(wrapper(self.tools))
+                    self._renderings[tool_format] = rendered_tools
+        return rendered_tools
+
+
+class ToolSetRegistry:
+    """
+    Fingerprints tool lists and returns one shared ToolSet per distinct (tools, mcp_tools_dict).
+    A tool list object seen before is found by identity without hashing it again, e.g. all items
+    of a normalized dataset or all trials of one task.
+    """
+
+    def __init__(self, identity_cache_size: int = DEFAULT_TOOL_SET_IDENTITY_CACHE_SIZE):
+        self._tool_sets = {}
+        self._identity_cache = LRUCache(maxsize=identity_cache_size)
+        self._lock = threading.Lock()
+
+    def get_tool_set(self, tools: List[Dict], mcp_tools_dict: Optional[Dict] = None) -> ToolSet:
+        mcp_tools_dict = mcp_tools_dict if mcp_tools_dict is not None else {}
+        identity_key = (id(tools), id(mcp_tools_dict))
+        cached = self._identity_cache.get(identity_key)
+        # the cached entry keeps the objects alive, so their ids can't be reused by other objects
+        if cached is not None and cached[0] is tools and cached[1] is mcp_tools_dict:
+            return cached[2]
+        tool_set_id = canonical_json_hash({"tools": tools, "mcp_tools_dict": mcp_tools_dict})
+        with self._lock:
+            tool_set = self._tool_sets.get(tool_set_id)
+            if tool_set is None:
+                tool_set = ToolSet(tool_set_id, tools, mcp_tools_dict)
+                self._tool_sets[tool_set_id] = tool_set
+        self._identity_cache.put(identity_key, (tools, mcp_tools_dict, tool_set))
+        return tool_set
+
+    def __len__(self):
+        return len(self._tool_sets)
+
+
+_global_tool_set_registry = ToolSetRegistry()
+
+def get_tool_set_registry() -> ToolSetRegistry:
+    return _global_tool_set_registry
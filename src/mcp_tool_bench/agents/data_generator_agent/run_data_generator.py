@@ -5,6 +5,7 @@ This file performs the following operations:
 3. For each extraction result, i.e., for each tools list, call LLM to generate user questions (query field) and tool call examples list (function_call_label field). Output files are placed in logs directory
 4. Post-process user questions and tool call examples to remove unreasonable data.
 5. Add uuid field, category field, tools field (all tools from category_tools.json, i.e., candidate set) to the processed data, save to data/category directory, file name is category_version.json
+   In the normalized dataset format (default) the candidate tools set is stored once in the tool_catalog and items reference it by tool_set_id, see utils/dataset.py
 '''
 
 import json
@@ -16,8 +17,9 @@ from .utils.pre_process import merge_mcp_tools
 from .utils.pre_process import random_extract_tools
 from .utils.post_process import post_process_data
 from .utils.generate_query import generate_query_and_function_calls
+from src.mcp_tool_bench.utils.dataset import save_dataset, DATASET_FORMAT_NORMALIZED
 
-def run_data_generation(category: str, data_version: str, mcp_config_path: str):
+def run_data_generation(category: str, data_version: str, mcp_config_path: str, dataset_format: str = DATASET_FORMAT_NORMALIZED):
     """
     Run data generation pipeline
     
@@ -25,6 +27,7 @@ def run_data_generation(category: str, data_version: str, mcp_config_path: str):
         category: Data category, such as browser, search
         data_version: Data version, such as v0, v1
         mcp_config_path: MCP configuration file path
+        dataset_format: normalized (shared tool catalog) or legacy (tools embedded in every item)
     """
     print(f"Starting data generation: category={category}, version={data_version}")
     
@@ -46,10 +49,10 @@ def run_data_generation(category: str, data_version: str, mcp_config_path: str):
     
     # Step 1.5: Save final data
     print("  1.5 Save final data")
-    save_final_data(processed_data, category, data_version, category_tools_path, mcp_tools_dict)
+    save_final_data(processed_data, category, data_version, category_tools_path, mcp_tools_dict, dataset_format=dataset_format)
 
 
-def save_final_data(processed_data: List[Dict], category: str, data_version: str, category_tools_path: str, mcp_tools_dict: Dict):
+def save_final_data(processed_data: List[Dict], category: str, data_version: str, category_tools_path: str, mcp_tools_dict: Dict, dataset_format: str = DATASET_FORMAT_NORMALIZED):
     """
     Save final processed data
     
@@ -58,6 +61,7 @@ def save_final_data(processed_data: List[Dict], category: str, data_version: str
         category: Data category
         data_version: Data version
         category_tools_path: Category tools file path
+        dataset_format: normalized (shared tool catalog) or legacy (tools embedded in every item)
     """
     # Read all tools as candidate set
     with open(category_tools_path, 'r', encoding='utf-8-sig') as f:
@@ -129,11 +133,10 @@ def save_final_data(processed_data: List[Dict], category: str, data_version: str
     output_dir = Path(f"data/{category}")
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Save as JSON array
+    # Save as JSON array (legacy) or items referencing the shared tool catalog (normalized)
     output_file = output_dir / f"{category}_{data_version}.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(final_data, f, ensure_ascii=False, indent=2)
+    save_dataset(final_data, str(output_file), dataset_format)
 
-    print(f"Data saved to: {output_file}")
+    print(f"Data saved to: {output_file} (dataset format {dataset_format})")
     print(f"Generated {len(final_data)} data items")
     print(f"MCP tools dict: {mcp_tools_dict}") 
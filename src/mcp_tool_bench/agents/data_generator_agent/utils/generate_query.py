@@ -2,7 +2,7 @@ from typing import List, Dict, Any
 from utils.prompt import user_prompt_template_generate_query, system_prompt_template_generate_query, system_prompt_template_generate_query_for_single_tool, system_prompt_template_generate_query_for_filesystem
 from utils.prompt_reference import candidate_reference_list, special_needs_description_list
 import json
-from src.mcp_tool_bench.model_utils.model_provider import _global_model_provider
+from src.mcp_tool_bench.model_utils.model_provider import get_registered_model_provider
 from src.mcp_tool_bench.global_variables import *
 import html
 import re
@@ -89,7 +89,7 @@ def generate_query_and_function_calls(extraction_results: List[List[Dict]], cate
             }
         ]
         # print("messages: ", messages)
-        model_provider = _global_model_provider[MODEL_SELECTION_GPT4O_ANT] if MODEL_SELECTION_GPT4O_ANT in _global_model_provider else None
+        model_provider = get_registered_model_provider(MODEL_SELECTION_GPT4O_ANT)
         output = model_provider.api_chat(messages, wait_time=5) if model_provider is not None else {}
         print("output: ", output)
         raw_response = output[KEY_COMPLETION] if KEY_COMPLETION in output else ""
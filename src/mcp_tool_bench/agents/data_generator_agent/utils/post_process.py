@@ -23,7 +23,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(CURRENT_DIR, '../../..')))
 sys.path.insert(0, os.path.abspath(os.path.join(CURRENT_DIR, '../..')))
 sys.path.insert(0, os.path.abspath(os.path.join(CURRENT_DIR, '../')))
 sys.path.insert(0, os.path.abspath(os.path.join(CURRENT_DIR, './')))
-from src.mcp_tool_bench.model_utils.model_provider import _global_model_provider
+from src.mcp_tool_bench.model_utils.model_provider import get_registered_model_provider
 from src.mcp_tool_bench.global_variables import *
 from utils.prompt import user_prompt_template_reasonableness_checks, system_prompt_template_reasonableness_checks
 # Set up logging
@@ -206,7 +206,7 @@ def is_reasonable_data(item: Dict) -> Tuple[bool, str]:
         }
     ]
     # print("messages: ", messages)
-    model_provider = _global_model_provider[MODEL_SELECTION_GPT4O_ANT] if MODEL_SELECTION_GPT4O_ANT in _global_model_provider else None
+    model_provider = get_registered_model_provider(MODEL_SELECTION_GPT4O_ANT)
     output = model_provider.api_chat(messages, wait_time=5) if model_provider is not None else {}
     raw_response = output[KEY_COMPLETION] if KEY_COMPLETION in output else ""
 
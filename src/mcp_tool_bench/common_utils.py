@@ -10,3 +10,17 @@ def get_conflict_toolname_original(tool_name, server_name):
     if tool_name.startswith(server_name):
         tool_name_norm = tool_name.split("__")[-1] if len(tool_name.split("__")) > 0 else tool_name
     return tool_name_norm
+
+def canonical_json_dumps(obj):
+    """
+        Deterministic json string of obj: sorted keys, no whitespace, non-ascii kept
+    """
+    import json
+    return json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+def canonical_json_hash(obj):
+    """
+        sha256 hex digest of canonical_json_dumps(obj), used as content address of cache entries
+    """
+    import hashlib
+    return hashlib.sha256(canonical_json_dumps(obj).encode("utf-8")).hexdigest()
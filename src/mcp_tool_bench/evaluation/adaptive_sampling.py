@@ -0,0 +1,145 @@
+import math
+from statistics import NormalDist
+from typing import Dict, Any, List, Optional, Sequence
+
+from src.mcp_tool_bench.evaluation.pass_at_k import trial_outcome_counts
+
+ADAPTIVE_MODE_OFF = "off"
+ADAPTIVE_MODE_EXACT = "exact"
+ADAPTIVE_MODE_CONFIDENCE = "confidence"
+ADAPTIVE_MODES = [ADAPTIVE_MODE_OFF, ADAPTIVE_MODE_EXACT, ADAPTIVE_MODE_CONFIDENCE]
+
+DEFAULT_ADAPTIVE_MIN_TRIALS = 3
+DEFAULT_ADAPTIVE_TOLERANCE = 0.1
+DEFAULT_ADAPTIVE_LEVEL = 0.95
+
+KEY_ADAPTIVE_TRIALS = "adaptive_trials"
+
+def wilson_interval(num_trials: int, num_correct: int, level: float) -> (float, float):
+    """
+    Wilson score interval of the success probability of num_correct successes in num_trials
+    """
+    if num_trials <= 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + level / 2.0)
+    z2 = z * z
+    center = (num_correct + z2 / 2.0) / (num_trials + z2)
+    half_width = z * math.sqrt(num_correct * (num_trials - num_correct) / num_trials + z2 / 4.0) / (num_trials + z2)
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+class AdaptiveTrialAllocator:
+    """
+    Decides per task how many of the max_trials (evaluation_trial_per_task) trials to run, trials run in batches
+    and the task stops as soon as more trials can't change its result.
+
+    exact: stop once the passed count c after m trials is at least max_trials - min(k) + 1. The pass@k estimate
+        1 - comb(n - c, k) / comb(n, k) of the full max_trials is then 1.0 whatever the remaining trials return,
+        and so is the estimate of the m trials, for every k of the run and for tool and parameter pass@k
+        (their counts are at least the passed count). The metrics are identical to running all the trials, so the
+        mode is unbiased like the current estimator. It saves trials of the tasks a model solves reliably
+        when the smallest k is above 1; pass@1 never stops early.
+    confidence: also stop after min_trials (at least max(k), the estimate of fewer trials than k is 1.0
+        even when they all failed) once the Wilson interval (level) of the success rate of every metric,
+        mapped to pass@k = 1 - (1 - p)^k, has a half width within tolerance for every k, e.g. all the first trials
+        passed or all failed. This is approximate: the stop depends on the outcomes seen so far, so the mean pass@k
+        of the stopped tasks is slightly biased (towards the early outcomes), keep it for exploratory runs and
+        compare final numbers with exact or off.
+
+    Usage:
+        allocator = AdaptiveTrialAllocator(ADAPTIVE_MODE_EXACT, max_trials=5, k_list=[3, 5])
+        trials = []
+        batch = allocator.next_batch_size(trials)
+        while batch > 0:
+            trials.extend(run_trials(len(trials), batch))
+            batch = allocator.next_batch_size(trials)
+    """
+
+    def __init__(self, mode: str, max_trials: int, k_list: Sequence[int], min_trials: Optional[int] = None,
+                 tolerance: float = DEFAULT_ADAPTIVE_TOLERANCE, level: float = DEFAULT_ADAPTIVE_LEVEL):
+        if mode not in ADAPTIVE_MODES:
+            raise ValueError(f"Unknown adaptive trial mode {mode}, expected one of {ADAPTIVE_MODES}")
+        self.mode = mode
+        self.max_trials = max(1, int(max_trials))
+        self.k_list = sorted(set(int(k) for k in k_list)) or [1]
+        self.min_trials = min(self.max_trials, max(self.k_list[-1], DEFAULT_ADAPTIVE_MIN_TRIALS if min_trials is None else int(min_trials)))
+        self.tolerance = tolerance
+        self.level = level
+        # passed count after which every pass@k of the full max_trials is 1.0
+        self.settled_passed = max(1, self.max_trials - self.k_list[0] + 1)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != ADAPTIVE_MODE_OFF
+
+    def is_settled(self, num_trials: int, num_passed: int) -> bool:
+        return num_passed >= self.settled_passed
+
+    def is_tight(self, num_trials: int, num_correct_list: List[int]) -> bool:
+        for num_correct in num_correct_list:
+            low, high = wilson_interval(num_trials, num_correct, self.level)
+            for k in self.k_list:
+                if ((1.0 - (1.0 - high) ** k) - (1.0 - (1.0 - low) ** k)) / 2.0 > self.tolerance:
+                    return False
+        return True
+
+    def next_batch_size(self, trials: List[Dict]) -> int:
+        """
+        Number of trials to run next for a task with the given finished trials, 0 when the task is done
+        """
+        num_trials, num_passed, num_tool_correct, num_parameter_correct = trial_outcome_counts(trials)
+        remaining = self.max_trials - num_trials
+        if remaining <= 0:
+            return 0
+        if not self.enabled:
+            return remaining
+        if num_trials > 0 and self.is_settled(num_trials, num_passed):
+            return 0
+        if self.mode == ADAPTIVE_MODE_CONFIDENCE:
+            # never below max(k) trials, n - c < k makes pass@k 1.0 also for a task without a passed trial
+            if num_trials < self.min_trials:
+                return self.min_trials - num_trials
+            if self.is_tight(num_trials, [num_passed, num_tool_correct, num_parameter_correct]):
+                return 0
+            return 1
+        # exact: the fewest trials which could settle the task, all of them have to pass, else run the rest
+        return min(remaining, max(1, self.settled_passed - num_passed))
+
+    def describe(self) -> Dict[str, Any]:
+        description = {"mode": self.mode, "max_trials_per_task": self.max_trials, "k": self.k_list}
+        if self.mode == ADAPTIVE_MODE_CONFIDENCE:
+            description.update({"min_trials": self.min_trials, "tolerance": self.tolerance, "level": self.level})
+        return description
+
+    def summary(self, trials_per_task: Sequence[int], mean_tokens_per_trial: Optional[float] = None,
+                mean_cost_usd_per_trial: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Savings of the run saved in run_info, trials_per_task: trials run of each task
+        """
+        summary = self.describe()
+        trials_budget = self.max_trials * len(trials_per_task)
+        trials_run = int(sum(trials_per_task))
+        trials_saved = max(0, trials_budget - trials_run)
+        summary.update({
+            "num_tasks": len(trials_per_task),
+            "tasks_stopped_early": sum(1 for num_trials in trials_per_task if num_trials < self.max_trials),
+            "trials_budget": trials_budget,
+            "trials_run": trials_run,
+            "trials_saved": trials_saved,
+            "saved_ratio": round(trials_saved / trials_budget, 4) if trials_budget > 0 else 0.0
+        })
+        # estimates from the means of the trials which ran
+        if mean_tokens_per_trial is not None:
+            summary["estimated_tokens_saved"] = round(trials_saved * mean_tokens_per_trial)
+        if mean_cost_usd_per_trial is not None:
+            summary["estimated_cost_usd_saved"] = round(trials_saved * mean_cost_usd_per_trial, 6)
+        return summary
+
+def format_adaptive_summary(summary: Dict[str, Any]) -> str:
+    line = (f"{summary['mode']}: ran {summary['trials_run']} of {summary['trials_budget']} trials, saved {summary['trials_saved']} "
+            f"({summary['saved_ratio']:.1%}), {summary['tasks_stopped_early']} of {summary['num_tasks']} tasks stopped early")
+    if "estimated_tokens_saved" in summary:
+        line += f", about {summary['estimated_tokens_saved']} tokens"
+    if "estimated_cost_usd_saved" in summary:
+        line += f", ${summary['estimated_cost_usd_saved']:.4f}"
+    return line
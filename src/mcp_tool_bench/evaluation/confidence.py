@@ -0,0 +1,108 @@
+import numpy as np
+from statistics import NormalDist
+from typing import Dict, Any, Optional
+
+CI_METHOD_NONE = "none"
+CI_METHOD_BOOTSTRAP = "bootstrap"
+CI_METHOD_ANALYTIC = "analytic"
+CI_METHODS = [CI_METHOD_NONE, CI_METHOD_BOOTSTRAP, CI_METHOD_ANALYTIC]
+
+DEFAULT_CI_METHOD = CI_METHOD_BOOTSTRAP
+DEFAULT_CI_LEVEL = 0.95
+DEFAULT_BOOTSTRAP_SAMPLES = 1000
+DEFAULT_BOOTSTRAP_SEED = 0
+# most task draws generated at once, 1000 resamples of up to 4000 tasks are one vectorized pass,
+# larger runs draw the resamples in row chunks of one generator to bound the memory
+BOOTSTRAP_MAX_DRAWS = 4_000_000
+
+class PassAtKIntervalEstimator:
+    """
+    Confidence intervals of the mean pass@k over the tasks of a group, the tasks are the sampling unit.
+
+    bootstrap: percentile interval of the means of num_resamples resamples of the tasks with replacement,
+        a resample is a row of the counts of each task drawn (one bincount for all the resamples), so the means
+        of the resamples are one matrix product with the per task pass@k of estimate_pass_at_k_matrix.
+    analytic: normal approximation, mean +/- z * std / sqrt(num_tasks), clipped to [0, 1].
+
+    Usage:
+        estimator = PassAtKIntervalEstimator(CI_METHOD_BOOTSTRAP, level=0.95)
+        metrics = summarize_pass_at_k(counts, [1, 3], interval_estimator=estimator)
+        metrics[0]["pass@1_ci"]  # [0.3512, 0.4890]
+    """
+
+    def __init__(self, method: str = DEFAULT_CI_METHOD, level: float = DEFAULT_CI_LEVEL, num_resamples: int = DEFAULT_BOOTSTRAP_SAMPLES,
+                 seed: int = DEFAULT_BOOTSTRAP_SEED):
+        if method not in (CI_METHOD_BOOTSTRAP, CI_METHOD_ANALYTIC):
+            raise ValueError(f"Unknown confidence interval method {method}, expected {CI_METHOD_BOOTSTRAP} or {CI_METHOD_ANALYTIC}")
+        if not 0.0 < level < 1.0:
+            raise ValueError(f"Confidence level {level} must be between 0 and 1")
+        self.method = method
+        self.level = level
+        self.num_resamples = max(1, int(num_resamples))
+        self.seed = seed
+
+    def describe(self) -> Dict[str, Any]:
+        description = {"method": self.method, "level": self.level}
+        if self.method == CI_METHOD_BOOTSTRAP:
+            description.update({"num_resamples": self.num_resamples, "seed": self.seed})
+        return description
+
+    def intervals(self, values: np.ndarray, group_index: np.ndarray, num_groups: int) -> np.ndarray:
+        """
+        Args:
+            values: pass@k of every task, shape (..., num_tasks), e.g. (num_k, num_metrics, num_tasks)
+            group_index: group of every task
+            num_groups: number of groups
+        Returns:
+            np.ndarray of shape (..., num_groups, 2), the low and high bound of the mean of each group
+        """
+        lead_shape = values.shape[:-1]
+        flat_values = values.reshape(-1, values.shape[-1])
+        bounds = np.zeros((flat_values.shape[0], num_groups, 2))
+        for g in range(num_groups):
+            group_values = flat_values[:, group_index == g]
+            if group_values.shape[1] == 0:
+                continue
+            if self.method == CI_METHOD_BOOTSTRAP:
+                bounds[:, g] = self.bootstrap_bounds(group_values)
+            else:
+                bounds[:, g] = self.analytic_bounds(group_values)
+        return bounds.reshape(lead_shape + (num_groups, 2))
+
+    def analytic_bounds(self, values: np.ndarray) -> np.ndarray:
+        num_tasks = values.shape[1]
+        mean = values.mean(axis=1)
+        std = values.std(axis=1, ddof=1) if num_tasks > 1 else np.zeros_like(mean)
+        half_width = NormalDist().inv_cdf(0.5 + self.level / 2.0) * std / np.sqrt(num_tasks)
+        return np.clip(np.stack([mean - half_width, mean + half_width], axis=-1), 0.0, 1.0)
+
+    def bootstrap_bounds(self, values: np.ndarray) -> np.ndarray:
+        num_tasks = values.shape[1]
+        rng = np.random.default_rng(self.seed)
+        values_t = np.ascontiguousarray(values.T)
+        chunk_size = max(1, BOOTSTRAP_MAX_DRAWS // num_tasks)
+        means = []
+        for start in range(0, self.num_resamples, chunk_size):
+            num_rows = min(chunk_size, self.num_resamples - start)
+            draws = rng.integers(0, num_tasks, size=(num_rows, num_tasks))
+            # (num_rows, num_tasks) times each task is drawn in each resample, times the values gives the sums of the resamples
+            row_offsets = np.arange(num_rows)[:, None] * num_tasks
+            task_draws = np.bincount((draws + row_offsets).ravel(), minlength=num_rows * num_tasks).reshape(num_rows, num_tasks)
+            means.append(task_draws @ values_t / num_tasks)
+        means = np.concatenate(means)
+        alpha = (1.0 - self.level) / 2.0
+        low, high = np.quantile(means, [alpha, 1.0 - alpha], axis=0)
+        return np.stack([low, high], axis=-1)
+
+
+def get_interval_estimator(method: Optional[str] = DEFAULT_CI_METHOD, level: Optional[float] = None, num_resamples: Optional[int] = None,
+                           seed: Optional[int] = None) -> Optional[PassAtKIntervalEstimator]:
+    """
+    PassAtKIntervalEstimator of the settings, None for the none method, unset settings take the defaults
+    """
+    if not method or method == CI_METHOD_NONE:
+        return None
+    return PassAtKIntervalEstimator(method,
+                                    level=DEFAULT_CI_LEVEL if level is None else level,
+                                    num_resamples=DEFAULT_BOOTSTRAP_SAMPLES if num_resamples is None else num_resamples,
+                                    seed=DEFAULT_BOOTSTRAP_SEED if seed is None else seed)
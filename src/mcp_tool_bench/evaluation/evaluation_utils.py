@@ -4,6 +4,7 @@ from typing import Dict, List, Any, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from src.mcp_tool_bench.global_variables import *
+from src.mcp_tool_bench.evaluation.pass_at_k import estimate_pass_at_k_matrix
 
 def base_error_analysis(function_call_result: Any) -> Dict[str, Any]:
     """
@@ -121,23 +122,10 @@ def estimate_pass_at_k(num_samples, num_correct, k):
         Reference: Implementation from LiveCodeBench: https://github.com/LiveCodeBench/LiveCodeBench
     """
 
-    def estimator(n: int, c: int, k: int) -> float:
-        """Calculates 1 - comb(n - c, k) / comb(n, k)."""
-        if n - c < k:
-            return 1.0
-        return 1.0 - np.prod(1.0 - k / np.arange(n - c + 1, n + 1))
-
-    import itertools
-
-    if isinstance(num_samples, int):
-        num_samples_it = itertools.repeat(num_samples, len(num_correct))
-    else:
+    if not isinstance(num_samples, int):
         assert len(num_samples) == len(num_correct)
-        num_samples_it = iter(num_samples)
-
-    return np.array(
-        [estimator(int(n), int(c), k) for n, c in zip(num_samples_it, num_correct)]
-    )
+    # vectorized in log space, estimate_pass_at_k_matrix computes all the k values in one pass
+    return estimate_pass_at_k_matrix(num_samples, num_correct, [k])[0]
 
 
 _global_tool_result_check_func_provider: Dict[str, Any] = {}
@@ -0,0 +1,112 @@
+import os
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src.mcp_tool_bench.common_utils import canonical_json_hash
+from src.mcp_tool_bench.utils.kv_store import LRUCache, SqliteKVStore
+
+DEFAULT_JUDGE_CACHE_PATH = os.path.join("logs", "cache", "judge_cache.sqlite")
+DEFAULT_JUDGE_CACHE_LRU_SIZE = 4096
+
+# fields of the predicted tool call compared by the LLM judge, ids and tool outputs change between trials
+JUDGE_CACHE_PRED_FIELDS = ["name", "input"]
+
+class JudgeCache:
+    """
+    Content addressed cache of LLM-as-judge verdicts of check_ast, with an in-memory LRU
+    in front of a persistent sqlite store. Re-scoring a log or re-running a dataset
+    does not call the judge again for a (prediction, label, query, judge model) it already saw.
+
+    Usage:
+        judge_cache = get_judge_cache()
+        key = judge_cache.make_key(pred_tool_result_list, label_result_list, query, model_name, system_prompt)
+        verdict = judge_cache.get(key)  # (tool_correctness, parameter_correctness) or None
+        judge_cache.put(key, tool_correctness, parameter_correctness)
+    """
+
+    def __init__(self, path: str = DEFAULT_JUDGE_CACHE_PATH, lru_size: int = DEFAULT_JUDGE_CACHE_LRU_SIZE):
+        self.path = path
+        self.lru = LRUCache(maxsize=lru_size)
+        self.store = SqliteKVStore(path, table="judge_cache")
+        # judges of concurrent trials share the cache
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            setattr(self, key, getattr(self, key) + 1)
+
+    def make_key(self, pred_tool_result_list: List[Dict], label_result_list: List[Dict], query: str, model_name: str, system_prompt: str = "") -> str:
+        """
+        Canonical hash of the judge input. The predicted tool calls only keep the fields the judge compares
+        (tool name and parameters), the system prompt is part of the key so a prompt change invalidates old verdicts.
+        """
+        pred_canonical = [
+            {field: pred_tool_result[field] for field in JUDGE_CACHE_PRED_FIELDS if field in pred_tool_result}
+            if isinstance(pred_tool_result, dict) else pred_tool_result
+            for pred_tool_result in (pred_tool_result_list or [])
+        ]
+        return canonical_json_hash({
+            "pred_tool_result_list": pred_canonical,
+            "label_result_list": label_result_list,
+            "query": query,
+            "model_name": model_name,
+            "system_prompt": system_prompt
+        })
+
+    def get(self, key: str) -> Optional[Tuple[int, int]]:
+        verdict = self.lru.get(key)
+        if verdict is None:
+            verdict = self.store.get(key)
+            if verdict is not None:
+                self.lru.put(key, verdict)
+        if verdict is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return verdict["tool_correctness"], verdict["parameter_correctness"]
+
+    def put(self, key: str, tool_correctness: int, parameter_correctness: int):
+        verdict = {"tool_correctness": tool_correctness, "parameter_correctness": parameter_correctness}
+        self.lru.put(key, verdict)
+        try:
+            self.store.put(key, verdict)
+        except Exception as e:
+            logging.error(f"JudgeCache failed to persist verdict {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        return {"hits": hits, "misses": misses, "size": len(self.store)}
+
+
+_global_judge_cache: Optional[JudgeCache] = None
+_global_judge_cache_enabled = True
+_global_judge_cache_lock = threading.Lock()
+
+def configure_judge_cache(path: str = DEFAULT_JUDGE_CACHE_PATH, enabled: bool = True, lru_size: int = DEFAULT_JUDGE_CACHE_LRU_SIZE) -> Optional[JudgeCache]:
+    """
+    Set the shared judge cache used by check_ast, enabled=False turns caching off
+    """
+    global _global_judge_cache, _global_judge_cache_enabled
+    with _global_judge_cache_lock:
+        _global_judge_cache_enabled = enabled
+        _global_judge_cache = JudgeCache(path=path, lru_size=lru_size) if enabled else None
+        return _global_judge_cache
+
+def get_judge_cache() -> Optional[JudgeCache]:
+    """
+    Get the shared judge cache, created at DEFAULT_JUDGE_CACHE_PATH on first use. None if disabled.
+    """
+    global _global_judge_cache
+    if _global_judge_cache is None and _global_judge_cache_enabled:
+        with _global_judge_cache_lock:
+            if _global_judge_cache is None and _global_judge_cache_enabled:
+                try:
+                    _global_judge_cache = JudgeCache()
+                except Exception as e:
+                    logging.error(f"Failed to open judge cache at {DEFAULT_JUDGE_CACHE_PATH}, caching disabled {e}")
+                    return None
+    return _global_judge_cache
@@ -0,0 +1,216 @@
+import numpy as np
+from typing import Dict, List, Any, Iterable, Optional, Sequence, Tuple, Union
+
+## pass@k metric name -> count of correct trials of a task in the run log
+METRIC_PASS = "pass"
+METRIC_TOOL_PASS = "tool_pass"
+METRIC_PARAMETER_PASS = "parameter_pass"
+PASS_AT_K_METRICS = [METRIC_PASS, METRIC_TOOL_PASS, METRIC_PARAMETER_PASS]
+PASS_AT_K_COUNT_KEYS = {
+    METRIC_PASS: "num_passed",
+    METRIC_TOOL_PASS: "num_tool_correct",
+    METRIC_PARAMETER_PASS: "num_parameter_correct",
+}
+
+## columns a run can be grouped by
+GROUP_CATEGORY = "category"
+GROUP_MODEL = "model"
+GROUP_CALL_TYPE = "call_type"
+PASS_AT_K_GROUP_KEYS = [GROUP_CATEGORY, GROUP_MODEL, GROUP_CALL_TYPE]
+DEFAULT_GROUP_BY = [GROUP_CATEGORY, GROUP_MODEL]
+UNKNOWN_GROUP = "unknown"
+
+def log_factorial_table(max_n: int) -> np.ndarray:
+    """
+    log(m!) for m in 0..max_n, log_factorial_table(n)[m]
+    """
+    table = np.zeros(max_n + 1, dtype=np.float64)
+    if max_n > 0:
+        np.cumsum(np.log(np.arange(1, max_n + 1, dtype=np.float64)), out=table[1:])
+    return table
+
+def estimate_pass_at_k_matrix(num_samples: Union[int, Sequence[int], np.ndarray], num_correct: Union[Sequence[int], np.ndarray],
+                              k_list: Sequence[int]) -> np.ndarray:
+    """
+    Unbiased pass@k of every task for every k in one pass, 1 - comb(n - c, k) / comb(n, k) computed as
+    1 - exp(log((n-c)!) - log((n-c-k)!) - log(n!) + log((n-k)!)) from a table of log factorials,
+    1.0 when n - c < k, the same as estimate_pass_at_k.
+
+    Args:
+        num_samples: n, trials of each task, an int for all the tasks
+        num_correct: c, correct trials, shape (..., num_tasks), e.g. (3, num_tasks) for overall, tool and parameter
+        k_list: k values
+    Returns:
+        np.ndarray of shape (len(k_list), *num_correct.shape)
+    """
+    c = np.asarray(num_correct, dtype=np.int64)
+    n = np.broadcast_to(np.asarray(num_samples, dtype=np.int64), c.shape)
+    k = np.asarray(k_list, dtype=np.int64).reshape((-1,) + (1,) * c.ndim)
+    if c.size == 0:
+        return np.zeros(k.shape[:1] + c.shape, dtype=np.float64)
+    lf = log_factorial_table(int(n.max()))
+    n_wrong = n - c
+    solvable = n_wrong >= k
+    # clip the indices of the unsolvable entries, their value is replaced by 1.0
+    log_ratio = (lf[n_wrong] - lf[np.clip(n_wrong - k, 0, None)]
+                 - lf[n] + lf[np.clip(n - k, 0, None)])
+    # c == 0 is exactly 0.0, the log factorials of n don't cancel to 0 in floating point
+    return np.where(solvable, np.where(c == 0, 0.0, -np.expm1(log_ratio)), 1.0)
+
+
+def trial_outcome_counts(trials: Iterable[Dict]) -> Tuple[int, int, int, int]:
+    """
+    Trials, passed, tool correct and parameter correct counts of one task, in one pass over the trials.
+    Passed needs if_pass, tool and parameter correctness, parameter correct needs the tool correct too.
+    """
+    num_trials = num_passed = num_tool_correct = num_parameter_correct = 0
+    for trial in trials:
+        num_trials += 1
+        tool_correct = bool(trial.get("tool_correctness", False))
+        parameter_correct = tool_correct and bool(trial.get("parameter_correctness", False))
+        num_tool_correct += tool_correct
+        num_parameter_correct += parameter_correct
+        num_passed += parameter_correct and bool(trial.get("if_pass", False))
+    return num_trials, num_passed, num_tool_correct, num_parameter_correct
+
+
+class PassAtKCounts:
+    """
+    Trial counts of the tasks of one or more runs with their group columns, the input of summarize_pass_at_k
+
+    Usage:
+        counts = PassAtKCounts()
+        for task in log_data["run_details"]:
+            counts.add_task(task.get("trials", []), category=category, model=model, call_type=task.get("call_type"))
+        metrics = summarize_pass_at_k(counts, [1, 3])
+    """
+
+    def __init__(self):
+        self.num_trials = []
+        self.num_correct = {metric: [] for metric in PASS_AT_K_METRICS}
+        self.groups = {key: [] for key in PASS_AT_K_GROUP_KEYS}
+
+    def __len__(self) -> int:
+        return len(self.num_trials)
+
+    def add_counts(self, num_trials: int, num_passed: int, num_tool_correct: int, num_parameter_correct: int, **group_values):
+        self.num_trials.append(num_trials)
+        self.num_correct[METRIC_PASS].append(num_passed)
+        self.num_correct[METRIC_TOOL_PASS].append(num_tool_correct)
+        self.num_correct[METRIC_PARAMETER_PASS].append(num_parameter_correct)
+        for key in PASS_AT_K_GROUP_KEYS:
+            self.groups[key].append(group_values.get(key) or UNKNOWN_GROUP)
+
+    def add_task(self, trials: List[Dict], **group_values) -> bool:
+        """
+        Returns: False for a task without trials, which is not counted
+        """
+        if not trials:
+            return False
+        self.add_counts(*trial_outcome_counts(trials), **group_values)
+        return True
+
+    def merge(self, other: "PassAtKCounts"):
+        self.num_trials.extend(other.num_trials)
+        for metric in PASS_AT_K_METRICS:
+            self.num_correct[metric].extend(other.num_correct[metric])
+        for key in PASS_AT_K_GROUP_KEYS:
+            self.groups[key].extend(other.groups[key])
+
+    def totals(self) -> Dict[str, int]:
+        totals = {"num_tasks": len(self.num_trials), "num_trials_total": int(sum(self.num_trials))}
+        for metric in PASS_AT_K_METRICS:
+            totals[f"{PASS_AT_K_COUNT_KEYS[metric]}_total"] = int(sum(self.num_correct[metric]))
+        return totals
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns: n of shape (num_tasks,) and c of shape (len(PASS_AT_K_METRICS), num_tasks)
+        """
+        num_trials = np.asarray(self.num_trials, dtype=np.int64)
+        num_correct = np.asarray([self.num_correct[metric] for metric in PASS_AT_K_METRICS], dtype=np.int64).reshape(len(PASS_AT_K_METRICS), -1)
+        return num_trials, num_correct
+
+    def group_index(self, group_by: Sequence[str]) -> Tuple[List[Tuple[str, ...]], np.ndarray]:
+        """
+        Returns: the sorted distinct group keys and the group of every task
+        """
+        if not group_by:
+            # one group of all the tasks, also when there are none
+            return [()], np.zeros(len(self.num_trials), dtype=np.int64)
+        keys = list(zip(*[self.groups[key] for key in group_by]))
+        group_keys = sorted(set(keys))
+        key_to_index = {group_key: index for index, group_key in enumerate(group_keys)}
+        return group_keys, np.fromiter((key_to_index[key] for key in keys), dtype=np.int64, count=len(keys))
+
+
+def pass_at_k_task_values(counts: PassAtKCounts, k_list: Sequence[int], group_by: Optional[Sequence[str]] = None) -> Tuple[List[Tuple[str, ...]], np.ndarray, np.ndarray]:
+    """
+    Returns: the group keys, the group of every task and the pass@k of every task of shape (num_k, num_metrics, num_tasks)
+    """
+    num_trials, num_correct = counts.arrays()
+    group_keys, group_index = counts.group_index(list(group_by or []))
+    return group_keys, group_index, estimate_pass_at_k_matrix(num_trials, num_correct, k_list)
+
+def summarize_pass_at_k(counts: PassAtKCounts, k_list: Sequence[int], group_by: Optional[Sequence[str]] = None,
+                        group_values: Optional[Dict[str, Any]] = None, interval_estimator: Any = None) -> List[Dict[str, Any]]:
+    """
+    pass@k, tool_pass@k and parameter_pass@k of each group for every k, the mean over the tasks of the group.
+
+    Args:
+        counts: PassAtKCounts of the tasks
+        k_list: k values
+        group_by: columns of PASS_AT_K_GROUP_KEYS, None or [] is one group of all the tasks
+        group_values: values set in every metric, e.g. the category and model of a single run
+        interval_estimator: optional PassAtKIntervalEstimator of evaluation.confidence, adds the confidence
+            interval [low, high] of each value as "pass@1_ci", ... and its "ci" settings
+    Returns:
+        List of metric dicts, for each group the k values in the order of k_list, in the layout of the run log metrics:
+        {"category", "model", "pass@1", "tool_pass@1", "parameter_pass@1", "num_tasks", "num_trials_total", ...}
+    """
+    group_by = list(group_by or [])
+    group_keys, group_index, pass_at_k = pass_at_k_task_values(counts, k_list, group_by)
+    num_trials, num_correct = counts.arrays()
+
+    num_groups = len(group_keys)
+    group_num_tasks = np.bincount(group_index, minlength=num_groups)
+    group_num_trials = np.bincount(group_index, weights=num_trials, minlength=num_groups)
+    group_num_correct = [np.bincount(group_index, weights=num_correct[m], minlength=num_groups) for m in range(len(PASS_AT_K_METRICS))]
+    # sums over the tasks of each group, (num_k, num_metrics, num_groups)
+    group_sums = np.zeros((len(k_list), len(PASS_AT_K_METRICS), num_groups))
+    if num_groups > 0:
+        np.add.at(group_sums, (slice(None), slice(None), group_index), pass_at_k)
+    group_means = group_sums / np.maximum(group_num_tasks, 1)
+    # (num_k, num_metrics, num_groups, 2)
+    intervals = interval_estimator.intervals(pass_at_k, group_index, num_groups) if interval_estimator is not None else None
+
+    metrics_list = []
+    for g, group_key in enumerate(group_keys):
+        for i, k in enumerate(k_list):
+            metric = dict(group_values or {})
+            metric.update(zip(group_by, group_key))
+            for m, name in enumerate(PASS_AT_K_METRICS):
+                metric[f"{name}@{k}"] = float(group_means[i, m, g])
+                if intervals is not None:
+                    metric[f"{name}@{k}_ci"] = [round(float(intervals[i, m, g, 0]), 6), round(float(intervals[i, m, g, 1]), 6)]
+            metric["num_tasks"] = int(group_num_tasks[g])
+            metric["num_trials_total"] = int(group_num_trials[g])
+            for m, name in enumerate(PASS_AT_K_METRICS):
+                metric[f"{PASS_AT_K_COUNT_KEYS[name]}_total"] = int(group_num_correct[m][g])
+            if intervals is not None:
+                metric["ci"] = interval_estimator.describe()
+            metrics_list.append(metric)
+    return metrics_list
+
+def format_pass_at_k_value(metric: Dict[str, Any], key: str) -> str:
+    """
+    value of the metric key, with its confidence interval when there is one, e.g. 0.4200 [0.3512, 0.4890]
+    """
+    interval = metric.get(f"{key}_ci")
+    if interval is None:
+        return f"{metric[key]:.4f}"
+    return f"{metric[key]:.4f} [{interval[0]:.4f}, {interval[1]:.4f}]"
+
+def format_pass_at_k_metric(metric: Dict[str, Any], k: int) -> str:
+    return (f"Pass@{k} - Overall: {format_pass_at_k_value(metric, f'pass@{k}')}, Tool: {format_pass_at_k_value(metric, f'tool_pass@{k}')}, "
+            f"Parameter: {format_pass_at_k_value(metric, f'parameter_pass@{k}')}")
@@ -15,6 +15,9 @@ class Settings(BaseSettings):
     CUSTOM_OPENAI_API_KEY: Optional[str] = None
     CUSTOM_OPENAI_BASE_URL: Optional[str] = None
 
+    # MCP tool client (mcp_marketplace) REST API, default http://127.0.0.1:5000
+    MCP_TOOL_BASE_URL: Optional[str] = None
+
     model_config = SettingsConfigDict(
         env_file=".env",  
         env_file_encoding="utf-8",
@@ -48,3 +51,17 @@ KEY_BASE_COMPARE_FUNC = "base_compare_func"
 KEY_COMPLETION = "completion"
 KEY_REASON_CONTENT = "reason"
 KEY_FUNCTION_CALL = "function_call"
+# all the tool calls of a response, KEY_FUNCTION_CALL is the first of them
+KEY_FUNCTION_CALL_LIST = "function_call_list"
+KEY_TOOL_SET = "tool_set"
+KEY_USAGE = "usage"
+
+## Normalized token usage of a model call, result[KEY_USAGE] of every provider
+USAGE_PROMPT_TOKENS = "prompt_tokens"
+USAGE_COMPLETION_TOKENS = "completion_tokens"
+USAGE_CACHED_TOKENS = "cached_tokens"
+USAGE_TOTAL_TOKENS = "total_tokens"
+
+## Tool list formats of the providers
+TOOL_FORMAT_OPENAI = "openai"
+TOOL_FORMAT_CLAUDE = "claude"
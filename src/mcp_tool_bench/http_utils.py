@@ -0,0 +1,42 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Optional
+
+DEFAULT_POOL_SIZE = 32
+
+def create_pooled_session(pool_size: int = DEFAULT_POOL_SIZE,
+                          max_retries: int = 0,
+                          backoff_factor: float = 0.0,
+                          status_forcelist: Optional[List[int]] = None,
+                          allowed_methods: Optional[List[str]] = None) -> requests.Session:
+    """
+    Create a requests.Session with a keep-alive connection pool, so repeated calls
+    to the same host reuse the TCP (and TLS) connection instead of opening a new one.
+
+    Args:
+        pool_size: max number of connections kept alive per host, set it to the number of concurrent callers
+        max_retries: retries of failed requests, 0 only retries nothing
+        backoff_factor: exponential backoff between retries, sleep {backoff_factor} * (2 ** (retry - 1)) seconds
+        status_forcelist: HTTP status codes which are retried, e.g. [429, 500, 502, 503, 504]
+        allowed_methods: HTTP methods which are retried on status/read errors, e.g. ["POST"]
+
+    Returns:
+        requests.Session
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist or [],
+        allowed_methods=allowed_methods if allowed_methods is not None else Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,163 @@
+import json
+import time
+import random
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, Optional, Tuple
+
+from src.mcp_tool_bench.mock.latency import LatencyModel
+
+DEFAULT_MOCK_HOST = "127.0.0.1"
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON over HTTP/1.1 with keep-alive, so pooled clients reuse their connections like against the real servers.
+    Routes are dispatched to MockHTTPServer.handle_post / handle_get, which return (status_code, json body, headers).
+    """
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in one segment, otherwise Nagle and delayed ACK add ~40ms to every response
+    wbufsize = 1 << 16
+    disable_nagle_algorithm = True
+
+    def _send_json(self, status_code: int, body: Any, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        content_length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(content_length) if content_length > 0 else b""
+        try:
+            request = json.loads(raw_body) if raw_body else {}
+        except Exception as e:
+            self._send_json(400, {"error": f"Invalid json body: {e}"})
+            return
+        self._send_json(*self.server.mock_server.dispatch("POST", self.path, request))
+
+    def do_GET(self):
+        self._send_json(*self.server.mock_server.dispatch("GET", self.path, {}))
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s" % (self.address_string(), format % args))
+
+
+class MockHTTPServer:
+    """
+    Base of the local mock servers: a threaded HTTP server with injected latency and errors.
+
+    Every request sleeps a sample of latency_model, then fails with error_status at error_rate (with a Retry-After header for 429/503),
+    or hangs for timeout_seconds at timeout_rate (the client times out), otherwise it is answered by handle_post/handle_get.
+    GET /api/stats returns the request counters.
+
+    Usage:
+        server = SubClass(port=0, latency_model=LatencyModel.from_spec("lognormal:200,0.5"), error_rate=0.05)
+        server.start()  # background thread, server.base_url is e.g. http://127.0.0.1:53211
+        ...
+        server.stop()
+    """
+
+    def __init__(self, host: str = DEFAULT_MOCK_HOST, port: int = 0, latency_model: Optional[LatencyModel] = None,
+                 error_rate: float = 0.0, error_status: int = 500, timeout_rate: float = 0.0, timeout_seconds: float = 30.0,
+                 retry_after: Optional[float] = None, seed: Optional[int] = None):
+        self.latency_model = latency_model if latency_model is not None else LatencyModel()
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "injected_errors": 0, "injected_timeouts": 0}
+        self.httpd = ThreadingHTTPServer((host, port), MockRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock_server = self
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str, value: int = 1):
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + value
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def dispatch(self, method: str, path: str, request: Dict) -> Tuple[int, Any, Dict[str, str]]:
+        if method == "GET" and path.rstrip("/") == "/api/stats":
+            return 200, self.get_stats(), {}
+        self.count("requests")
+        latency = self.latency_model.sample()
+        with self._random_lock:
+            draw = self.random.random()
+        if latency > 0:
+            time.sleep(latency)
+        if draw < self.timeout_rate:
+            self.count("injected_timeouts")
+            time.sleep(self.timeout_seconds)
+        elif draw < self.timeout_rate + self.error_rate:
+            self.count("injected_errors")
+            return self.error_status, self.error_body(self.error_status), self.error_headers(self.error_status)
+        if method == "POST":
+            return self.handle_post(path, request)
+        return self.handle_get(path)
+
+    def error_body(self, status_code: int) -> Any:
+        return {"error": f"Injected error with status {status_code}"}
+
+    def error_headers(self, status_code: int) -> Dict[str, str]:
+        # rate limit and overload responses tell the client when to retry
+        if self.retry_after is not None and status_code in (429, 503):
+            return {"Retry-After": str(self.retry_after)}
+        return {}
+
+    def handle_post(self, path: str, request: Dict) -> Tuple[int, Any, Dict[str, str]]:
+        return 404, {"error": f"Unknown path {path}"}, {}
+
+    def handle_get(self, path: str) -> Tuple[int, Any, Dict[str, str]]:
+        return 404, {"error": f"Unknown path {path}"}, {}
+
+    def start(self) -> "MockHTTPServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve_forever(self):
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.httpd.server_close()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+def add_mock_server_arguments(parser):
+    """
+    Command line arguments shared by the mock servers
+    """
+    parser.add_argument("--host", type=str, default=DEFAULT_MOCK_HOST, help="Host to bind")
+    parser.add_argument("--latency", type=str, default=None, help="Latency distribution in ms, e.g. constant:50, uniform:20,200, normal:100,20, lognormal:200,0.5, exponential:100")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of requests answered with --error_status")
+    parser.add_argument("--error_status", type=int, default=500, help="HTTP status code of the injected errors, e.g. 500, 503, 429")
+    parser.add_argument("--timeout_rate", type=float, default=0.0, help="Fraction of requests that hang for --timeout_seconds before being answered")
+    parser.add_argument("--timeout_seconds", type=float, default=30.0, help="Hang time of the injected timeouts")
+    parser.add_argument("--retry_after", type=float, default=None, help="Retry-After header in seconds of injected 429 and 503 errors")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed of the latency and error injection")
+    return parser
@@ -0,0 +1,81 @@
+import math
+import random
+import threading
+from typing import Optional
+
+LATENCY_DIST_NONE = "none"
+LATENCY_DIST_CONSTANT = "constant"
+LATENCY_DIST_UNIFORM = "uniform"
+LATENCY_DIST_NORMAL = "normal"
+LATENCY_DIST_LOGNORMAL = "lognormal"
+LATENCY_DIST_EXPONENTIAL = "exponential"
+
+# spec -> meaning of the comma separated parameters, all times in milliseconds
+LATENCY_DIST_PARAMS = {
+    LATENCY_DIST_NONE: [],
+    LATENCY_DIST_CONSTANT: ["latency_ms"],
+    LATENCY_DIST_UNIFORM: ["min_ms", "max_ms"],
+    LATENCY_DIST_NORMAL: ["mean_ms", "std_ms"],
+    LATENCY_DIST_LOGNORMAL: ["median_ms", "sigma"],
+    LATENCY_DIST_EXPONENTIAL: ["mean_ms"]
+}
+
+class LatencyModel:
+    """
+    Random response latency of the mock servers, described by a spec string "<dist>:<param>,<param>", times in ms:
+        none                no delay
+        constant:50         always 50 ms
+        uniform:20,200      uniform between 20 and 200 ms
+        normal:100,20       mean 100 ms, standard deviation 20 ms, truncated at 0
+        lognormal:200,0.5   median 200 ms, sigma 0.5 of the underlying normal, a long right tail like real APIs
+        exponential:100     mean 100 ms
+
+    Usage:
+        latency_model = LatencyModel.from_spec("lognormal:200,0.5", seed=42)
+        time.sleep(latency_model.sample())  # seconds
+    """
+
+    def __init__(self, dist: str = LATENCY_DIST_NONE, params: Optional[list] = None, seed: Optional[int] = None):
+        if dist not in LATENCY_DIST_PARAMS:
+            raise ValueError(f"Unknown latency distribution {dist}, supported: {list(LATENCY_DIST_PARAMS.keys())}")
+        params = params or []
+        if len(params) != len(LATENCY_DIST_PARAMS[dist]):
+            raise ValueError(f"Latency distribution {dist} takes parameters {LATENCY_DIST_PARAMS[dist]}, got {params}")
+        self.dist = dist
+        self.params = [float(param) for param in params]
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec: Optional[str], seed: Optional[int] = None) -> "LatencyModel":
+        if not spec:
+            return cls(LATENCY_DIST_NONE, seed=seed)
+        dist, _, params_str = spec.partition(":")
+        params = [param for param in params_str.split(",") if param.strip()] if params_str else []
+        return cls(dist.strip(), params, seed=seed)
+
+    def sample_ms(self) -> float:
+        # random.Random is not safe to share between server threads without a lock
+        with self._lock:
+            if self.dist == LATENCY_DIST_CONSTANT:
+                latency_ms = self.params[0]
+            elif self.dist == LATENCY_DIST_UNIFORM:
+                latency_ms = self.random.uniform(self.params[0], self.params[1])
+            elif self.dist == LATENCY_DIST_NORMAL:
+                latency_ms = self.random.gauss(self.params[0], self.params[1])
+            elif self.dist == LATENCY_DIST_LOGNORMAL:
+                latency_ms = self.random.lognormvariate(math.log(max(self.params[0], 1e-6)), self.params[1])
+            elif self.dist == LATENCY_DIST_EXPONENTIAL:
+                latency_ms = self.random.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+            else:
+                latency_ms = 0.0
+        return max(0.0, latency_ms)
+
+    def sample(self) -> float:
+        """
+        Latency in seconds
+        """
+        return self.sample_ms() / 1000.0
+
+    def __repr__(self):
+        return f"{self.dist}:{','.join(str(param) for param in self.params)}" if self.params else self.dist
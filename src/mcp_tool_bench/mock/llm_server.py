@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Local mock of an OpenAI compatible chat completions endpoint, to measure the throughput and concurrency scaling
+of run_benchmark without network or API keys.
+
+Function calling requests are answered with the function_call_label of the dataset item whose query is the first
+user message: the n-th call of a conversation (n tool call turns already in the messages) returns all the calls of
+step n of the label as parallel tool_calls, labels without a "step" are one step each, a conversation past the last
+step gets a plain text answer. Chat requests without tools, e.g. the
+LLM-as-judge prompts, get --chat_response. Latency is sampled per request, plus --per_token_ms for every completion token.
+
+Usage:
+    python -m src.mcp_tool_bench.mock.llm_server --datasets data/browser/browser_0724_single_v3.json --port 8000 --latency lognormal:800,0.6
+    # .env or environment, models which are not registered providers use the custom OpenAI compatible provider
+    CUSTOM_OPENAI_BASE_URL=http://127.0.0.1:8000/v1 CUSTOM_OPENAI_API_KEY=mock python run.py --stage tool_call --model mock-model --llm_as_judge_model mock-judge ...
+"""
+
+import json
+import time
+import uuid
+import argparse
+from typing import Any, Dict, List, Optional
+
+from src.mcp_tool_bench.utils.dataset import parse_json_field, iter_dataset
+from src.mcp_tool_bench.mock.latency import LatencyModel
+from src.mcp_tool_bench.mock.http_server import MockHTTPServer, add_mock_server_arguments
+
+DEFAULT_MOCK_LLM_PORT = 8000
+DEFAULT_CHAT_RESPONSE = json.dumps({"tool_correctness": 1, "parameter_correctness": 1})
+DEFAULT_FINAL_RESPONSE = "All the steps are done."
+
+# rough size of a token, for the usage of the responses and --per_token_ms
+CHARS_PER_TOKEN = 4
+
+CHAT_COMPLETIONS_PATHS = ["/v1/chat/completions", "/chat/completions"]
+
+def message_text(message: Dict) -> str:
+    """
+    Text of a message, content is a string or a list of content parts
+    """
+    content = message.get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+def count_tool_call_turns(messages: List[Dict]) -> int:
+    """
+    Number of assistant turns with tool calls in the conversation, OpenAI tool_calls or Claude tool_use parts
+    """
+    num_turns = 0
+    for message in messages:
+        if message.get("role") != "assistant":
+            continue
+        if message.get("tool_calls"):
+            num_turns += 1
+        elif isinstance(message.get("content"), list) and any(isinstance(part, dict) and part.get("type") == "tool_use" for part in message["content"]):
+            num_turns += 1
+    return num_turns
+
+def group_label_steps(labels: List[Dict]) -> List[List[Dict]]:
+    """
+    Labels grouped by "step" in the order of the first label of each step, a label without a step is a step of its own
+    """
+    steps = []
+    step_index = {}
+    for label in labels:
+        step = label.get("step") if isinstance(label, dict) else None
+        if step is None:
+            steps.append([label])
+        elif step in step_index:
+            steps[step_index[step]].append(label)
+        else:
+            step_index[step] = len(steps)
+            steps.append([label])
+    return steps
+
+def label_arguments(label: Dict) -> str:
+    arguments = label.get("input", {})
+    return arguments if isinstance(arguments, str) else json.dumps(arguments, ensure_ascii=False)
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+class MockLLMServer(MockHTTPServer):
+    """
+    Scripted OpenAI compatible POST /v1/chat/completions, GET /v1/models
+
+    Usage:
+        server = MockLLMServer(dataset_files=["data/browser/browser_0724_single_v3.json"], port=0).start()
+        provider = CustomOpenAIAPIProvider("mock-model", base_url=server.base_url + "/v1")
+        ...
+        server.stop()
+    """
+
+    def __init__(self, dataset_files: Optional[List[str]] = None, chat_response: str = DEFAULT_CHAT_RESPONSE,
+                 final_response: str = DEFAULT_FINAL_RESPONSE, per_token_ms: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.chat_response = chat_response
+        self.final_response = final_response
+        self.per_token_ms = per_token_ms
+        # query -> function_call_label grouped by step
+        self.scripts = {}
+        self.stats.update({"tool_calls": 0, "final_answers": 0, "chat_answers": 0, "unknown_queries": 0})
+        for file_path in dataset_files or []:
+            num_items = 0
+            for item in iter_dataset(file_path):
+                self.scripts[item.get("query", "")] = group_label_steps(parse_json_field(item.get("function_call_label", [])) or [])
+                num_items += 1
+            print(f"Loaded {num_items} scripted queries from {file_path}")
+
+    def build_response(self, model: str, message: Dict, finish_reason: str, prompt_tokens: int, completion_tokens: int) -> Dict:
+        return {
+            "id": "chatcmpl-mock-" + uuid.uuid4().hex,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    def script_message(self, messages: List[Dict], tools: Optional[List]) -> Dict:
+        if not tools:
+            self.count("chat_answers")
+            return {"role": "assistant", "content": self.chat_response}
+        query = next((message_text(message) for message in messages if message.get("role") == "user"), "")
+        if query not in self.scripts:
+            self.count("unknown_queries")
+            return {"role": "assistant", "content": self.final_response}
+        steps = self.scripts[query]
+        step = count_tool_call_turns(messages)
+        if step >= len(steps):
+            self.count("final_answers")
+            return {"role": "assistant", "content": self.final_response}
+        self.count("tool_calls", len(steps[step]))
+        return {
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [{
+                "index": index,
+                "id": "call_mock_" + uuid.uuid4().hex[:24],
+                "type": "function",
+                "function": {
+                    "name": label.get("name", ""),
+                    "arguments": label_arguments(label)
+                }
+            } for index, label in enumerate(steps[step])]
+        }
+
+    def handle_post(self, path: str, request: Dict):
+        if path.rstrip("/") not in CHAT_COMPLETIONS_PATHS:
+            return super().handle_post(path, request)
+        messages = request.get("messages", [])
+        message = self.script_message(messages, request.get("tools"))
+        completion_text = message.get("content") or json.dumps(message.get("tool_calls", []), ensure_ascii=False)
+        completion_tokens = estimate_tokens(completion_text)
+        prompt_tokens = estimate_tokens(json.dumps(messages, ensure_ascii=False) + json.dumps(request.get("tools") or [], ensure_ascii=False))
+        if self.per_token_ms > 0:
+            time.sleep(self.per_token_ms * completion_tokens / 1000.0)
+        finish_reason = "tool_calls" if "tool_calls" in message else "stop"
+        return 200, self.build_response(request.get("model", ""), message, finish_reason, prompt_tokens, completion_tokens), {}
+
+    def handle_get(self, path: str):
+        if path.rstrip("/") in ("/v1/models", "/models"):
+            return 200, {"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "mock"}]}, {}
+        return super().handle_get(path)
+
+    def error_body(self, status_code: int) -> Any:
+        return {"error": {"message": f"Injected error with status {status_code}", "type": "mock_error", "code": status_code}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of an OpenAI compatible chat completions endpoint, scripted tool calls from the function_call_label of datasets")
+    parser.add_argument("--datasets", type=str, nargs="*", default=[], help="Datasets whose function_call_label are returned as tool_calls, matched by query")
+    parser.add_argument("--port", type=int, default=DEFAULT_MOCK_LLM_PORT, help="Port to listen on, the base url of the clients is http://<host>:<port>/v1")
+    parser.add_argument("--chat_response", type=str, default=DEFAULT_CHAT_RESPONSE, help="Content returned to requests without tools, default is a passing LLM-as-judge verdict")
+    parser.add_argument("--final_response", type=str, default=DEFAULT_FINAL_RESPONSE, help="Content returned once all the labeled steps are called, or for unknown queries")
+    parser.add_argument("--per_token_ms", type=float, default=0.0, help="Extra latency per completion token in ms, on top of --latency")
+    add_mock_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        dataset_files=args.datasets,
+        chat_response=args.chat_response,
+        final_response=args.final_response,
+        per_token_ms=args.per_token_ms,
+        host=args.host,
+        port=args.port,
+        latency_model=LatencyModel.from_spec(args.latency, seed=args.seed),
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    print(f"Mock LLM server listening on {server.base_url}/v1 with {len(server.scripts)} scripted queries, latency {server.latency_model}, error_rate {args.error_rate}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
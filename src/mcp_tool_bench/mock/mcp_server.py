@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Local mock of the mcp_marketplace /api/query endpoint, so the tool_call runner can be run and load tested offline.
+
+Tool outputs are replayed from recordings, keyed by (server_id, tool_name, tool_input):
+    - datasets, legacy or normalized: the outputs of function_call_label
+    - run logs, .json or .jsonl: the function_call_result of every trial, and the function_call_label of every task
+    - recording files (.jsonl), one {"server_id", "tool_name", "tool_input", "status_code", "result"} per line,
+      e.g. written by --record_file while proxying misses to a real server with --upstream_url
+Later files override earlier ones. A recorded output without a server (trial results of run logs) matches any server_id.
+Requests without a recording get a generic success result, or --miss_status with --on_miss error.
+
+Usage:
+    python -m src.mcp_tool_bench.mock.mcp_server --recordings data/browser/browser_0724_single_v3.json --port 5000 --latency lognormal:200,0.5 --error_rate 0.02
+    python run.py --stage tool_call --mcp_base_url http://127.0.0.1:5000 ...
+"""
+
+import os
+import json
+import logging
+import argparse
+import threading
+import requests
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.mcp_tool_bench.common_utils import canonical_json_hash
+from src.mcp_tool_bench.utils.dataset import parse_json_field, iter_dataset
+from src.mcp_tool_bench.utils.json_stream import JsonStreamReader
+from src.mcp_tool_bench.utils.run_log import iter_run_log, is_jsonl_log_path, RECORD_TYPE_TASK
+from src.mcp_tool_bench.agents.base_tool_call_agent.tool_executor import MCP_TOOL_NAME_MAP, DEFAULT_MCP_BASE_URL, DEFAULT_MCP_TIMEOUT
+from src.mcp_tool_bench.mock.latency import LatencyModel
+from src.mcp_tool_bench.mock.http_server import MockHTTPServer, add_mock_server_arguments
+
+DEFAULT_MOCK_MCP_PORT = 5000
+
+ON_MISS_SYNTHETIC = "synthetic"
+ON_MISS_ERROR = "error"
+
+def synthetic_tool_result(tool_name: str) -> Dict:
+    return {"success": True, "data": [f"Mock result of {tool_name}"], "error": None}
+
+def recording_key(server_id: Optional[str], tool_name: str, tool_input: Any) -> Tuple:
+    return (server_id, tool_name, canonical_json_hash(tool_input if tool_input is not None else {}))
+
+def make_recording(server_id: Optional[str], tool_name: str, tool_input: Any, output: Dict) -> Dict:
+    """
+    Recording of one tool call, tool_name as sent to /api/query (after MCP_TOOL_NAME_MAP)
+    """
+    return {
+        "server_id": server_id,
+        "tool_name": MCP_TOOL_NAME_MAP.get(tool_name, tool_name),
+        "tool_input": parse_json_field(tool_input) if tool_input is not None else {},
+        "status_code": output.get("status_code", 200),
+        "result": output.get("result", {})
+    }
+
+def iter_item_recordings(item: Dict) -> Iterator[Dict]:
+    """
+    Recordings of a dataset item or run log task: the labels, then the trial results
+    """
+    label_server_dict = {}
+    for label in parse_json_field(item.get("function_call_label", [])) or []:
+        if not isinstance(label, dict) or "output" not in label:
+            continue
+        label_server_dict[label.get("name", "")] = label.get("mcp_server")
+        yield make_recording(label.get("mcp_server"), label.get("name", ""), label.get("input", {}), label["output"])
+    for trial in item.get("trials", []):
+        for node in trial.get("function_call_result", []) or []:
+            if isinstance(node, dict) and isinstance(node.get("output"), dict):
+                yield make_recording(label_server_dict.get(node.get("name", "")), node.get("name", ""), node.get("input", {}), node["output"])
+
+def iter_recordings(file_path: str) -> Iterator[Dict]:
+    """
+    Recordings of a dataset, run log or recording file, read incrementally
+    """
+    if is_jsonl_log_path(file_path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            first_line = f.readline()
+        if first_line.strip() and "record_type" in json.loads(first_line):
+            for record_type, record in iter_run_log(file_path):
+                if record_type == RECORD_TYPE_TASK:
+                    yield from iter_item_recordings(record.get("task", {}))
+            return
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(file_path, 'r', encoding='utf-8') as f:
+        reader = JsonStreamReader(f)
+        is_run_log = reader.peek() == "{" and next(reader.iter_object(), None) == "run_info"
+    if is_run_log:
+        for record_type, record in iter_run_log(file_path):
+            if record_type == RECORD_TYPE_TASK:
+                yield from iter_item_recordings(record.get("task", {}))
+        return
+    for item in iter_dataset(file_path):
+        yield from iter_item_recordings(item)
+
+
+class MockMCPServer(MockHTTPServer):
+    """
+    Replays recorded tool outputs on POST /api/query {"server_id", "tool_name", "tool_input"}
+
+    Usage:
+        server = MockMCPServer(recording_files=["data/browser/browser_0724_single_v3.json"], port=0).start()
+        configure_tool_executor(base_url=server.base_url)
+        ...
+        server.stop()
+    """
+
+    def __init__(self, recording_files: Optional[List[str]] = None, on_miss: str = ON_MISS_SYNTHETIC, miss_status: int = 404,
+                 upstream_url: Optional[str] = None, record_file: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.on_miss = on_miss
+        self.miss_status = miss_status
+        self.recordings = {}
+        self.upstream_query_url = upstream_url.rstrip("/") + "/api/query" if upstream_url else None
+        self.upstream_session = requests.Session() if upstream_url else None
+        self.record_file = open(record_file, 'a', encoding='utf-8') if record_file else None
+        self._record_lock = threading.Lock()
+        self.stats.update({"hits": 0, "misses": 0, "upstream_calls": 0})
+        for file_path in recording_files or []:
+            num_recordings = 0
+            for recording in iter_recordings(file_path):
+                self.add_recording(recording)
+                num_recordings += 1
+            print(f"Loaded {num_recordings} recorded tool calls from {file_path}")
+
+    def add_recording(self, recording: Dict):
+        output = {"status_code": recording.get("status_code", 200), "result": recording.get("result", {})}
+        key = recording_key(recording.get("server_id"), recording.get("tool_name", ""), recording.get("tool_input", {}))
+        self.recordings[key] = output
+        # wildcard server_id, for requests whose server isn't recorded
+        self.recordings[(None,) + key[1:]] = output
+
+    def lookup(self, server_id: str, tool_name: str, tool_input: Any) -> Optional[Dict]:
+        key = recording_key(server_id, tool_name, tool_input)
+        output = self.recordings.get(key)
+        if output is None:
+            output = self.recordings.get((None,) + key[1:])
+        return output
+
+    def call_upstream(self, request: Dict) -> Dict:
+        self.count("upstream_calls")
+        try:
+            response = self.upstream_session.post(self.upstream_query_url, data=json.dumps(request), headers={"Content-Type": "application/json"}, timeout=DEFAULT_MCP_TIMEOUT)
+            output = {"status_code": response.status_code, "result": response.json()}
+        except Exception as e:
+            logging.error(f"Failed to call upstream {self.upstream_query_url}: {e}")
+            return {"status_code": 500, "result": {}}
+        recording = {"server_id": request.get("server_id"), "tool_name": request.get("tool_name", ""), "tool_input": request.get("tool_input", {}), **output}
+        self.add_recording(recording)
+        if self.record_file is not None:
+            with self._record_lock:
+                self.record_file.write(json.dumps(recording, ensure_ascii=False) + "\n")
+                self.record_file.flush()
+        return output
+
+    def handle_post(self, path: str, request: Dict):
+        if path.rstrip("/") != "/api/query":
+            return super().handle_post(path, request)
+        server_id = request.get("server_id", "")
+        tool_name = request.get("tool_name", "")
+        tool_input = request.get("tool_input", {})
+        output = self.lookup(server_id, tool_name, tool_input)
+        if output is not None:
+            self.count("hits")
+            return output["status_code"], output["result"], {}
+        self.count("misses")
+        if self.upstream_query_url is not None:
+            output = self.call_upstream(request)
+            return output["status_code"], output["result"], {}
+        if self.on_miss == ON_MISS_ERROR:
+            return self.miss_status, {"success": False, "data": [], "error": f"No recording of {server_id}/{tool_name}"}, {}
+        return 200, synthetic_tool_result(tool_name), {}
+
+    def error_body(self, status_code: int) -> Any:
+        return {"success": False, "data": [], "error": f"Injected error with status {status_code}"}
+
+    def stop(self):
+        super().stop()
+        if self.record_file is not None:
+            self.record_file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the MCP /api/query endpoint, replays recorded tool outputs with injected latency and errors")
+    parser.add_argument("--recordings", type=str, nargs="*", default=[], help="Datasets, run logs (.json/.jsonl) or recording files (.jsonl) to replay")
+    parser.add_argument("--port", type=int, default=DEFAULT_MOCK_MCP_PORT, help="Port to listen on, the runner default is {}".format(DEFAULT_MCP_BASE_URL))
+    parser.add_argument("--on_miss", type=str, default=ON_MISS_SYNTHETIC, choices=[ON_MISS_SYNTHETIC, ON_MISS_ERROR], help="Answer of unrecorded calls, a generic success result or --miss_status")
+    parser.add_argument("--miss_status", type=int, default=404, help="HTTP status code of unrecorded calls with --on_miss error")
+    parser.add_argument("--upstream_url", type=str, default=None, help="Real MCP server to forward unrecorded calls to, e.g. http://127.0.0.1:5001")
+    parser.add_argument("--record_file", type=str, default=None, help="Recording file (.jsonl) the upstream outputs are appended to")
+    add_mock_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockMCPServer(
+        recording_files=args.recordings,
+        on_miss=args.on_miss,
+        miss_status=args.miss_status,
+        upstream_url=args.upstream_url,
+        record_file=args.record_file,
+        host=args.host,
+        port=args.port,
+        latency_model=LatencyModel.from_spec(args.latency, seed=args.seed),
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    print(f"Mock MCP server listening on {server.base_url}/api/query with {len(server.recordings)} recording keys, latency {server.latency_model}, error_rate {args.error_rate}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,26 @@
 import json
+import asyncio
+import logging
 from typing import List, Dict, Any, Optional
 from ..global_variables import *
+from .rate_limiter import get_rate_limiter, estimate_request_tokens, raise_for_retryable_response, ProviderRateLimiter
 
 class BaseModelAPIProvider:
     """
+        The requests of a provider go through the shared rate limiter of its rate_limit_provider (RPM/TPM limits,
+        adaptive concurrency and retries with backoff), see model_utils.rate_limiter.
 
         Usage:
-            model_provider = _global_model_provider[MODEL_SELECTION_GPT4O] if MODEL_SELECTION_GPT4O in _global_model_provider else None
+            model_provider = get_model_provider(MODEL_SELECTION_GPT4O)
             result = model_provider.api_chat(messages) if model_provider is not None else {}
             completion = result[KEY_COMPLETION]
 
+        Async usage, one event loop can drive many in-flight requests:
+            result = await model_provider.aapi_function_call(messages, tools)
+
     """
+    # key of the limits in the --rate_limits rules, shared by the models of the provider
+    rate_limit_provider = "default"
 
     def __init__(self, model_name: str):
         """
@@ -19,6 +29,10 @@ class BaseModelAPIProvider:
         """
         self.model_name = model_name
 
+    @property
+    def rate_limiter(self) -> ProviderRateLimiter:
+        return get_rate_limiter(self.rate_limit_provider)
+
     def api_chat(self, messages: List[Any], **kwargs) -> Dict[str, Any]:
         """        
         Args:
@@ -53,6 +67,22 @@ class BaseModelAPIProvider:
         }
         return result
 
+    async def aapi_chat(self, messages: List[Any], **kwargs) -> Dict[str, Any]:
+        """
+        Async version of api_chat, returns the same result dict.
+        The default implementation runs the blocking api_chat in a worker thread,
+        providers with a native async client override it.
+        """
+        return await asyncio.to_thread(self.api_chat, messages, **kwargs)
+
+    async def aapi_function_call(self, messages: List[Any], tools: list, **kwargs) -> Dict[str, Any]:
+        """
+        Async version of api_function_call, returns the same result dict.
+        The default implementation runs the blocking api_function_call in a worker thread,
+        providers with a native async client override it.
+        """
+        return await asyncio.to_thread(self.api_function_call, messages, tools, **kwargs)
+
 def function_call_result_common_mapper(tool_call):
     """
         This wrapper is a common mapper to wrap the result of OpenAI/Claude Stype function call results, thinking/no thinking models
@@ -105,6 +135,19 @@ def function_call_result_common_mapper(tool_call):
         logging.error(f"Failed to run tool_result_to_claude_mapper {e}")
     return tools_choice_response, completion, reasoningContent
 
+def function_call_list_common_mapper(tool_calls: List[Dict]) -> List[Dict]:
+    """
+        function_call_result_common_mapper of each tool call of a response, e.g. parallel tool calls of OpenAI
+        Return:
+            List[Dict]: tools_choice_response of the tool calls, in the order of the response
+    """
+    tools_choice_response_list = []
+    for tool_call in tool_calls or []:
+        tools_choice_response, _, _ = function_call_result_common_mapper(tool_call)
+        if tools_choice_response:
+            tools_choice_response_list.append(tools_choice_response)
+    return tools_choice_response_list
+
 def tool_call_parameter_wrapper(model: str, tool_id: str, tool_name: str, tool_arguments: dict):
     
     message_tool_parameter = {}
@@ -121,6 +164,31 @@ def tool_call_parameter_wrapper(model: str, tool_id: str, tool_name: str, tool_a
         message_tool_parameter = tool_call_param_openai_wrapper(tool_id, tool_name, tool_arguments)
     return message_tool_parameter
 
+def tool_calls_parameter_wrapper(model: str, tool_calls: List[Dict]) -> Dict:
+    """
+        One assistant message of the parallel tool calls of a step, tool_calls: [{"id", "name", "arguments"}]
+    """
+    messages = [tool_call_parameter_wrapper(model, tool_call["id"], tool_call["name"], tool_call["arguments"]) for tool_call in tool_calls]
+    message_tool_parameter = messages[0]
+    for message in messages[1:]:
+        if "tool_calls" in message_tool_parameter:
+            message_tool_parameter["tool_calls"].extend(message["tool_calls"])
+        else:
+            message_tool_parameter["content"].extend(message["content"])
+    return message_tool_parameter
+
+def tool_calls_result_wrapper(model: str, tool_results: List[Dict]) -> List[Dict]:
+    """
+        Messages of the results of the parallel tool calls of a step, tool_results: [{"id", "name", "result"}]
+        OpenAI style APIs take one tool message per call, Claude one user message with all the tool_result parts
+    """
+    messages = [tool_call_result_wrapper(model, tool_result["id"], tool_result["name"], tool_result["result"]) for tool_result in tool_results]
+    if len(messages) > 1 and messages[0].get("role") == "user":
+        for message in messages[1:]:
+            messages[0]["content"].extend(message["content"])
+        return messages[:1]
+    return messages
+
 def tool_call_result_wrapper(model: str, tool_id: str, tool_name: str, tool_result: dict):
     
     message_tool_result = {}
@@ -148,6 +216,56 @@ def tools_openai_wrapper(tools):
     } for tool in tools]
     return tools_wrapped
 
+def tools_claude_wrapper(tools):
+    tools_wrapped = [{
+        "name": tool["name"] if "name" in tool else "",
+        "description": tool["description"] if "description" in tool else "",
+        "input_schema": tool["input_schema"] if "input_schema" in tool else {"type": "object", "properties": {}}
+    } for tool in tools]
+    return tools_wrapped
+
+def get_tool_format(model: str) -> str:
+    """
+        Format of the tools list the provider of the model takes, Claude uses name/description/input_schema,
+        OpenAI, Qwen and the other OpenAI compatible APIs use the OpenAI function format
+    """
+    if "claude" in model:
+        return TOOL_FORMAT_CLAUDE
+    return TOOL_FORMAT_OPENAI
+
+def _usage_field(usage, key: str):
+    value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+    return value if value is not None else 0
+
+def normalize_usage(usage) -> Dict[str, int]:
+    """
+        Token usage of a model response in one format, from the OpenAI compatible usage (OpenAI, Qwen, Kimi, custom)
+        or the Anthropic usage, a dict or an SDK object.
+        Args:
+            usage: e.g. {"prompt_tokens": 266, "completion_tokens": 20, "prompt_tokens_details": {"cached_tokens": 0}}
+                or {"input_tokens": 250, "output_tokens": 20, "cache_read_input_tokens": 16, "cache_creation_input_tokens": 0}
+        Return:
+            {"prompt_tokens": 266, "completion_tokens": 20, "cached_tokens": 0, "total_tokens": 286}, {} if usage is missing
+    """
+    if not usage:
+        return {}
+    if _usage_field(usage, "input_tokens") or _usage_field(usage, "output_tokens"):
+        # Anthropic input_tokens excludes the tokens read from or written to the prompt cache
+        cached_tokens = _usage_field(usage, "cache_read_input_tokens")
+        prompt_tokens = _usage_field(usage, "input_tokens") + cached_tokens + _usage_field(usage, "cache_creation_input_tokens")
+        completion_tokens = _usage_field(usage, "output_tokens")
+    else:
+        prompt_tokens = _usage_field(usage, "prompt_tokens")
+        completion_tokens = _usage_field(usage, "completion_tokens")
+        prompt_tokens_details = _usage_field(usage, "prompt_tokens_details")
+        cached_tokens = _usage_field(prompt_tokens_details, "cached_tokens") if prompt_tokens_details else 0
+    return {
+        USAGE_PROMPT_TOKENS: int(prompt_tokens),
+        USAGE_COMPLETION_TOKENS: int(completion_tokens),
+        USAGE_CACHED_TOKENS: int(cached_tokens),
+        USAGE_TOTAL_TOKENS: int(prompt_tokens + completion_tokens)
+    }
+
 def tool_call_param_openai_wrapper(tool_id: str, tool_name: str, arguments: Dict, **kwargs):
     
     context_id = kwargs["context_id"] if "context_id" in kwargs else ""
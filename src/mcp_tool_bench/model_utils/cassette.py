@@ -0,0 +1,165 @@
+import os
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from src.mcp_tool_bench.common_utils import canonical_json_hash
+from src.mcp_tool_bench.utils.kv_store import SqliteKVStore
+from .base_api import BaseModelAPIProvider
+
+DEFAULT_CASSETTE_PATH = os.path.join("logs", "cache", "cassette.sqlite")
+
+CASSETTE_MODE_OFF = "off"
+CASSETTE_MODE_RECORD = "record"
+CASSETTE_MODE_REPLAY = "replay"
+CASSETTE_MODE_AUTO = "auto"
+CASSETTE_MODES = [CASSETTE_MODE_OFF, CASSETTE_MODE_RECORD, CASSETTE_MODE_REPLAY, CASSETTE_MODE_AUTO]
+
+# request kwargs that don't change the response
+CASSETTE_IGNORED_KWARGS = ["wait_time"]
+
+class Cassette:
+    """
+    On-disk store of model provider calls, (method, model, messages, tools, kwargs) -> results, in one sqlite file.
+
+    The same request is sent once per trial and the model samples a different answer each time, so a key holds
+    the list of recorded results: the n-th identical request of a run is stored at, and replayed from, index n
+    (modulo the number recorded, when a replay runs more trials than were recorded).
+
+    Modes:
+        record  every call goes to the provider, the results are saved (a re-recorded index is overwritten)
+        replay  every call is answered from the store, no network I/O, a miss returns {} like a failed provider call
+        auto    replay the recorded results, call the provider and record on a miss
+
+    Usage:
+        cassette = configure_cassette(mode="replay", path="logs/cache/cassette.sqlite")
+        model_provider = get_model_provider(model)  # wrapped in a CassetteModelAPIProvider
+    """
+
+    def __init__(self, path: str = DEFAULT_CASSETTE_PATH, mode: str = CASSETTE_MODE_REPLAY):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode {mode}, supported: {CASSETTE_MODES}")
+        self.path = path
+        self.mode = mode
+        self.store = SqliteKVStore(path, table="cassette")
+        # key -> number of requests seen in this run
+        self._occurrences = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def make_key(self, method: str, model: str, messages: List[Any], tools: Optional[List[Any]], kwargs: Dict) -> str:
+        """
+        Canonical hash of the request, the tools hash is reused when the rendered tool list carries it
+        """
+        tools_hash = getattr(tools, "content_hash", None) or canonical_json_hash(tools or [])
+        return canonical_json_hash({
+            "method": method,
+            "model": model,
+            "messages": messages,
+            "tools": tools_hash,
+            "kwargs": {key: value for key, value in kwargs.items() if key not in CASSETTE_IGNORED_KWARGS}
+        })
+
+    def next_occurrence(self, key: str) -> int:
+        with self._lock:
+            occurrence = self._occurrences.get(key, 0)
+            self._occurrences[key] = occurrence + 1
+            return occurrence
+
+    def lookup(self, key: str, occurrence: int) -> Optional[Dict]:
+        results = self.store.get(key)
+        if not results or (self.mode == CASSETTE_MODE_AUTO and occurrence >= len(results)):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return results[occurrence % len(results)]
+
+    def record(self, key: str, occurrence: int, result: Dict):
+        # failed provider calls return {}, they are retried next time instead of being replayed
+        if not result:
+            return
+        try:
+            with self._lock:
+                results = self.store.get(key) or []
+                if occurrence < len(results):
+                    results[occurrence] = result
+                else:
+                    results.append(result)
+                self.store.put(key, results)
+                self.recorded += 1
+        except Exception as e:
+            logging.error(f"Cassette failed to record the result of {key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "recorded": self.recorded, "size": len(self.store)}
+
+
+class CassetteModelAPIProvider(BaseModelAPIProvider):
+    """
+    Provider wrapper recording the calls of model_provider to a Cassette, or answering them from it.
+    In replay mode model_provider may be None, e.g. re-scoring without API keys.
+    """
+
+    def __init__(self, model_name: str, model_provider: Optional[BaseModelAPIProvider], cassette: Cassette):
+        super().__init__(model_name)
+        self.model_provider = model_provider
+        self.cassette = cassette
+
+    def _before_call(self, method: str, messages: List[Any], tools: Optional[List[Any]], kwargs: Dict):
+        key = self.cassette.make_key(method, self.model_name, messages, tools, kwargs)
+        occurrence = self.cassette.next_occurrence(key)
+        if self.cassette.mode != CASSETTE_MODE_RECORD:
+            result = self.cassette.lookup(key, occurrence)
+            if result is not None:
+                return key, occurrence, result
+        if self.cassette.mode == CASSETTE_MODE_REPLAY or self.model_provider is None:
+            logging.error(f"Cassette has no recorded {method} result of model {self.model_name} for the request {key}")
+            return key, occurrence, {}
+        return key, occurrence, None
+
+    def api_chat(self, messages: List[Any], **kwargs) -> Dict[str, Any]:
+        key, occurrence, result = self._before_call("api_chat", messages, None, kwargs)
+        if result is None:
+            result = self.model_provider.api_chat(messages, **kwargs)
+            self.cassette.record(key, occurrence, result)
+        return result
+
+    def api_function_call(self, messages: List[Any], tools: list, **kwargs) -> Dict[str, Any]:
+        key, occurrence, result = self._before_call("api_function_call", messages, tools, kwargs)
+        if result is None:
+            result = self.model_provider.api_function_call(messages, tools, **kwargs)
+            self.cassette.record(key, occurrence, result)
+        return result
+
+    async def aapi_chat(self, messages: List[Any], **kwargs) -> Dict[str, Any]:
+        # sync and async calls of the same request share their recordings
+        key, occurrence, result = self._before_call("api_chat", messages, None, kwargs)
+        if result is None:
+            result = await self.model_provider.aapi_chat(messages, **kwargs)
+            self.cassette.record(key, occurrence, result)
+        return result
+
+    async def aapi_function_call(self, messages: List[Any], tools: list, **kwargs) -> Dict[str, Any]:
+        key, occurrence, result = self._before_call("api_function_call", messages, tools, kwargs)
+        if result is None:
+            result = await self.model_provider.aapi_function_call(messages, tools, **kwargs)
+            self.cassette.record(key, occurrence, result)
+        return result
+
+
+_global_cassette: Optional[Cassette] = None
+
+def configure_cassette(mode: str = CASSETTE_MODE_OFF, path: str = DEFAULT_CASSETTE_PATH) -> Optional[Cassette]:
+    """
+    Set the cassette get_model_provider wraps the providers with, mode off removes it
+    """
+    global _global_cassette
+    _global_cassette = Cassette(path=path, mode=mode) if mode != CASSETTE_MODE_OFF else None
+    return _global_cassette
+
+def get_cassette() -> Optional[Cassette]:
+    return _global_cassette
@@ -22,9 +22,13 @@ class ClaudeModelAPIProvider(BaseModelAPIProvider):
     Anthropic Claude API for chat and tool use.
     https://docs.anthropic.com/en/docs/tool-use
     """
+    rate_limit_provider = "claude"
+
     def __init__(self, model_name: str = ""):
         super().__init__(model_name)
-        self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+        # retries are left to the shared rate limiter, which sees the throttling
+        self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY, max_retries=0)
+        self.async_client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY, max_retries=0)
 
     def api_chat(self, messages: List, **kwargs) -> Dict[str, Any]:
         """
@@ -35,26 +39,21 @@ class ClaudeModelAPIProvider(BaseModelAPIProvider):
             if not model:
                 model = MODEL_SELECTION_CLAUDE_37
 
-            system_message_content = ""
-            chat_messages = []
-            for msg in messages:
-                if msg["role"] == "system":
-                    system_message_content += msg["content"] + "\n"
-                else:
-                    chat_messages.append(msg)
+            system_message_content, chat_messages = split_claude_system_messages(messages)
 
-            response = self.client.messages.create(
+            response = self.rate_limiter.call(lambda: self.client.messages.create(
                 model=model,
                 max_tokens=kwargs.get("max_tokens", 1024), # Claude requires max_tokens
                 messages=chat_messages,
                 system=system_message_content.strip() if system_message_content else None,
                 temperature=kwargs.get("temperature", 0.3),
-            )
+            ), estimate_request_tokens(messages))
             completion, reasoningContent = post_process_claude_chat_response(response)
             result = {
                 KEY_FUNCTION_CALL: {},
                 KEY_COMPLETION: completion,
-                KEY_REASON_CONTENT: reasoningContent
+                KEY_REASON_CONTENT: reasoningContent,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
             }
             return result
 
@@ -74,16 +73,10 @@ class ClaudeModelAPIProvider(BaseModelAPIProvider):
             if not model:
                 model = MODEL_SELECTION_CLAUDE_37
 
-            system_message_content = ""
-            chat_messages = []
-            for msg in messages:
-                if msg["role"] == "system":
-                    system_message_content += msg["content"] + "\n"
-                else:
-                    chat_messages.append(msg)
+            system_message_content, chat_messages = split_claude_system_messages(messages)
 
             # Claude's `tools` parameter directly takes the list of tool definitions
-            response = self.client.messages.create(
+            response = self.rate_limiter.call(lambda: self.client.messages.create(
                 model=model,
                 max_tokens=kwargs.get("max_tokens", 1024), # Claude requires max_tokens
                 messages=chat_messages,
@@ -91,12 +84,14 @@ class ClaudeModelAPIProvider(BaseModelAPIProvider):
                 tool_choice=kwargs.get("tool_choice", {"type": "auto"}), # Default to auto
                 system=system_message_content.strip() if system_message_content else None,
                 temperature=kwargs.get("temperature", 0.3),
-            )
-            tool_result, completion, reasoningContent = post_process_claude_function_call_response(response)
+            ), estimate_request_tokens(messages, tools))
+            tool_results, completion, reasoningContent = post_process_claude_function_call_list_response(response)
             result = {
-                KEY_FUNCTION_CALL: tool_result,
+                KEY_FUNCTION_CALL: tool_results[0] if tool_results else {},
+                KEY_FUNCTION_CALL_LIST: tool_results,
                 KEY_COMPLETION: completion,
-                KEY_REASON_CONTENT: reasoningContent
+                KEY_REASON_CONTENT: reasoningContent,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
             }
             return result
 
@@ -104,6 +99,84 @@ class ClaudeModelAPIProvider(BaseModelAPIProvider):
             logging.error(f"Failed to process Claude api_function_call: {e}")
             return {}
 
+    async def aapi_chat(self, messages: List, **kwargs) -> Dict[str, Any]:
+        """
+        Claude chat completion with the async client.
+        """
+        try:
+            model = self.model_name
+            if not model:
+                model = MODEL_SELECTION_CLAUDE_37
+
+            system_message_content, chat_messages = split_claude_system_messages(messages)
+
+            response = await self.rate_limiter.acall(lambda: self.async_client.messages.create(
+                model=model,
+                max_tokens=kwargs.get("max_tokens", 1024), # Claude requires max_tokens
+                messages=chat_messages,
+                system=system_message_content.strip() if system_message_content else None,
+                temperature=kwargs.get("temperature", 0.3),
+            ), estimate_request_tokens(messages))
+            completion, reasoningContent = post_process_claude_chat_response(response)
+            result = {
+                KEY_FUNCTION_CALL: {},
+                KEY_COMPLETION: completion,
+                KEY_REASON_CONTENT: reasoningContent,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
+            }
+            return result
+
+        except Exception as e:
+            logging.error(f"Failed to process Claude aapi_chat: {e}")
+            return {}
+
+    async def aapi_function_call(self, messages: List, tools: List, **kwargs) -> Dict[str, Any]:
+        """
+        Claude tool use (function calling) with the async client.
+        """
+        try:
+            model = self.model_name
+            if not model:
+                model = MODEL_SELECTION_CLAUDE_37
+
+            system_message_content, chat_messages = split_claude_system_messages(messages)
+
+            response = await self.rate_limiter.acall(lambda: self.async_client.messages.create(
+                model=model,
+                max_tokens=kwargs.get("max_tokens", 1024), # Claude requires max_tokens
+                messages=chat_messages,
+                tools=tools,
+                tool_choice=kwargs.get("tool_choice", {"type": "auto"}),
+                system=system_message_content.strip() if system_message_content else None,
+                temperature=kwargs.get("temperature", 0.3),
+            ), estimate_request_tokens(messages, tools))
+            tool_results, completion, reasoningContent = post_process_claude_function_call_list_response(response)
+            result = {
+                KEY_FUNCTION_CALL: tool_results[0] if tool_results else {},
+                KEY_FUNCTION_CALL_LIST: tool_results,
+                KEY_COMPLETION: completion,
+                KEY_REASON_CONTENT: reasoningContent,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
+            }
+            return result
+
+        except Exception as e:
+            logging.error(f"Failed to process Claude aapi_function_call: {e}")
+            return {}
+
+def split_claude_system_messages(messages: List) -> (str, List):
+    """
+    Claude takes the system prompt as a separate parameter, split it from the chat messages.
+    """
+    system_message_content = ""
+    chat_messages = []
+    for msg in messages:
+        if msg["role"] == "system":
+            system_message_content += msg["content"] + "\n"
+        else:
+            chat_messages.append(msg)
+    return system_message_content, chat_messages
+
 def post_process_claude_chat_response(response: Any) -> (str, str):
     """
     Processes the response from Claude chat completion.
@@ -123,11 +196,18 @@ def post_process_claude_chat_response(response: Any) -> (str, str):
 def post_process_claude_function_call_response(response: Any) -> (Dict[str, Any], str, str):
     """
     Processes the response from Claude for tool use.
-    Extracts the tool call details and any text response.
+    Extracts the tool call details of the first tool_use block and any text response.
+    """
+    tool_call_results, completion_content, reasoning_content = post_process_claude_function_call_list_response(response)
+    return tool_call_results[0] if tool_call_results else {}, completion_content, reasoning_content
+
+def post_process_claude_function_call_list_response(response: Any) -> (List[Dict[str, Any]], str, str):
+    """
+    Extracts the tool call details of all the tool_use blocks, Claude returns several for parallel tool use, and any text response.
     """
     if response is None or not response.content:
-        return {}, "", ""
-    tool_call_result = {}
+        return [], "", ""
+    tool_call_results = []
     completion_content = ""
     reasoning_content = ""
 
@@ -135,20 +215,19 @@ def post_process_claude_function_call_response(response: Any) -> (Dict[str, Any]
 
         for block in response.content:
             if block.type == "tool_use":
-                if not tool_call_result: 
-                    tool_call_result = {
-                        "function_name": block.name,
-                        "function_arguments": block.input, # Claude's tool_use.input is already a dict
-                        "is_function_call": True,
-                        "id": block.id # Store tool_use ID for sending tool results back
-                    }
+                tool_call_results.append({
+                    "function_name": block.name,
+                    "function_arguments": block.input, # Claude's tool_use.input is already a dict
+                    "is_function_call": True,
+                    "id": block.id # Store tool_use ID for sending tool results back
+                })
             elif block.type == "text":
                 completion_content += block.text
-        return tool_call_result, completion_content, reasoning_content
+        return tool_call_results, completion_content, reasoning_content
             
     except Exception as e:
-        print (f"DEBUG: Failed to post_process_claude_function_call_response with error {e}")       
-        return tool_call_result, completion_content, reasoning_content
+        print (f"DEBUG: Failed to post_process_claude_function_call_list_response with error {e}")       
+        return tool_call_results, completion_content, reasoning_content
 
 if __name__ == '__main__':    
     # Test function calling
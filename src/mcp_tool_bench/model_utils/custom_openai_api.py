@@ -4,7 +4,7 @@ import logging
 from typing import List, Dict, Any
 import os
 import sys
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.abspath(os.path.join(CURRENT_DIR, '../../..')))
@@ -12,13 +12,15 @@ sys.path.insert(0, os.path.abspath(os.path.join(CURRENT_DIR, '../..')))
 sys.path.insert(0, os.path.abspath(os.path.join(CURRENT_DIR, '../')))
 sys.path.insert(0, os.path.abspath(os.path.join(CURRENT_DIR, './')))
 
-from src.mcp_tool_bench.model_utils.base_api import BaseModelAPIProvider, function_call_result_common_mapper, KEY_FUNCTION_CALL, KEY_COMPLETION, KEY_REASON_CONTENT
+from src.mcp_tool_bench.model_utils.base_api import BaseModelAPIProvider, function_call_result_common_mapper, function_call_list_common_mapper, normalize_usage, estimate_request_tokens, KEY_FUNCTION_CALL, KEY_FUNCTION_CALL_LIST, KEY_COMPLETION, KEY_REASON_CONTENT, KEY_USAGE
 
 class CustomOpenAIAPIProvider(BaseModelAPIProvider):
     """
     Custom OpenAI-compatible API provider that allows setting custom model name, base URL, and API key.
     This can be used with various OpenAI-compatible services like Ollama, LocalAI, vLLM, etc.
     """
+    rate_limit_provider = "custom_openai"
+
     def __init__(self, model_name: str, base_url: str, api_key: str = "not-needed"):
         """
         Initialize the custom OpenAI-compatible API provider.
@@ -31,9 +33,16 @@ class CustomOpenAIAPIProvider(BaseModelAPIProvider):
         super().__init__(model_name)
         self.base_url = base_url
         self.api_key = api_key
+        # retries are left to the shared rate limiter, which sees the throttling
         self.client = OpenAI(
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            max_retries=0
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0
         )
 
     def api_chat(self, messages: List, **kwargs) -> Dict[str, Any]:
@@ -45,17 +54,18 @@ class CustomOpenAIAPIProvider(BaseModelAPIProvider):
             if not model:
                 raise ValueError("Model name is required for custom API provider")
 
-            response = self.client.chat.completions.create(
+            response = self.rate_limiter.call(lambda: self.client.chat.completions.create(
                 model=model,
                 messages=messages,
                 temperature=kwargs.get("temperature", 0.3),
                 **{k: v for k, v in kwargs.items() if k not in ['temperature', 'wait_time']}
-            )
+            ), estimate_request_tokens(messages))
             completion, reasoning_content = self._post_process_chat_response(response)
             result = {
                 KEY_FUNCTION_CALL: {},
                 KEY_COMPLETION: completion,
-                KEY_REASON_CONTENT: reasoning_content
+                KEY_REASON_CONTENT: reasoning_content,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
             }
             return result
 
@@ -75,21 +85,23 @@ class CustomOpenAIAPIProvider(BaseModelAPIProvider):
             if not model:
                 raise ValueError("Model name is required for custom API provider")
 
-            response = self.client.chat.completions.create(
+            response = self.rate_limiter.call(lambda: self.client.chat.completions.create(
                 model=model,
                 messages=messages,
                 tools=tools,
                 tool_choice="auto",
                 temperature=kwargs.get("temperature", 0.3),
                 **{k: v for k, v in kwargs.items() if k not in ['temperature', 'wait_time']}
-            )
-            tool_call = self._post_process_function_call_response(response)
-            tool_call_mapped, completion, reasoning_content = function_call_result_common_mapper(tool_call)
+            ), estimate_request_tokens(messages, tools))
+            tool_calls = self._post_process_function_call_list_response(response)
+            tool_call_mapped, completion, reasoning_content = function_call_result_common_mapper(tool_calls[0] if tool_calls else {})
 
             result = {
                 KEY_FUNCTION_CALL: tool_call_mapped,
+                KEY_FUNCTION_CALL_LIST: function_call_list_common_mapper(tool_calls),
                 KEY_COMPLETION: completion,
-                KEY_REASON_CONTENT: reasoning_content
+                KEY_REASON_CONTENT: reasoning_content,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
             }
             return result
 
@@ -97,6 +109,68 @@ class CustomOpenAIAPIProvider(BaseModelAPIProvider):
             logging.error(f"Failed to process Custom OpenAI API api_function_call: {e}")
             return {}
 
+    async def aapi_chat(self, messages: List, **kwargs) -> Dict[str, Any]:
+        """
+        Custom OpenAI-compatible chat completion with the async client.
+        """
+        try:
+            model = self.model_name
+            if not model:
+                raise ValueError("Model name is required for custom API provider")
+
+            response = await self.rate_limiter.acall(lambda: self.async_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=kwargs.get("temperature", 0.3),
+                **{k: v for k, v in kwargs.items() if k not in ['temperature', 'wait_time']}
+            ), estimate_request_tokens(messages))
+            completion, reasoning_content = self._post_process_chat_response(response)
+            result = {
+                KEY_FUNCTION_CALL: {},
+                KEY_COMPLETION: completion,
+                KEY_REASON_CONTENT: reasoning_content,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
+            }
+            return result
+
+        except Exception as e:
+            logging.error(f"Failed to process Custom OpenAI API aapi_chat: {e}")
+            return {}
+
+    async def aapi_function_call(self, messages: List, tools: List, **kwargs) -> Dict[str, Any]:
+        """
+        Custom OpenAI-compatible function calling (tool calling) with the async client,
+        e.g. many concurrent trials against a local vLLM endpoint.
+        """
+        try:
+            model = self.model_name
+            if not model:
+                raise ValueError("Model name is required for custom API provider")
+
+            response = await self.rate_limiter.acall(lambda: self.async_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                tools=tools,
+                tool_choice="auto",
+                temperature=kwargs.get("temperature", 0.3),
+                **{k: v for k, v in kwargs.items() if k not in ['temperature', 'wait_time']}
+            ), estimate_request_tokens(messages, tools))
+            tool_calls = self._post_process_function_call_list_response(response)
+            tool_call_mapped, completion, reasoning_content = function_call_result_common_mapper(tool_calls[0] if tool_calls else {})
+
+            result = {
+                KEY_FUNCTION_CALL: tool_call_mapped,
+                KEY_FUNCTION_CALL_LIST: function_call_list_common_mapper(tool_calls),
+                KEY_COMPLETION: completion,
+                KEY_REASON_CONTENT: reasoning_content,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
+            }
+            return result
+
+        except Exception as e:
+            logging.error(f"Failed to process Custom OpenAI API aapi_function_call: {e}")
+            return {}
+
     def _post_process_chat_response(self, response):
         """
         Processes the response from custom OpenAI-compatible chat completion.
@@ -111,28 +185,34 @@ class CustomOpenAIAPIProvider(BaseModelAPIProvider):
     def _post_process_function_call_response(self, response):
         """
         Processes the response from custom OpenAI-compatible API for function calls.
-        Extracts the tool call details.
+        Extracts the tool call details of the first tool call.
+        """
+        tool_calls = self._post_process_function_call_list_response(response)
+        return tool_calls[0] if tool_calls else {}
+
+    def _post_process_function_call_list_response(self, response):
+        """
+        Extracts the details of all the tool calls of the response, parallel tool calls return several.
         """
         if response is None or not response.choices or not response.choices[0].message:
-            return {}
+            return []
 
         try:
             message = response.choices[0].message
-            if message.tool_calls:
-                first_tool_call = message.tool_calls[0]
-                if first_tool_call.type == "function" and first_tool_call.function:
-                    tool_call = {
-                        "id": first_tool_call.id,
+            tool_calls = []
+            for tool_call in message.tool_calls or []:
+                if tool_call.type == "function" and tool_call.function:
+                    tool_calls.append({
+                        "id": tool_call.id,
                         "function": {
-                            "name": first_tool_call.function.name,
-                            "arguments": first_tool_call.function.arguments
+                            "name": tool_call.function.name,
+                            "arguments": tool_call.function.arguments
                         }
-                    }
-                    return tool_call
-            return {}
+                    })
+            return tool_calls
         except Exception as e:
-            logging.error(f"Failed to _post_process_function_call_response error {e}")
-            return {}
+            logging.error(f"Failed to _post_process_function_call_list_response error {e}")
+            return []
 
     def get_model_info(self):
         """
@@ -14,6 +14,12 @@ sys.path.insert(0, os.path.abspath(os.path.join(CURRENT_DIR, './')))
 
 from src.mcp_tool_bench.model_utils.base_api import *
 from src.mcp_tool_bench.global_variables import settings
+from src.mcp_tool_bench.http_utils import DEFAULT_POOL_SIZE
+
+KIMI_BASE_URL = "https://api.moonshot.ai/v1"
+# (connect timeout, read timeout) in seconds
+KIMI_DEFAULT_TIMEOUT = (10, 60)
+KIMI_DEFAULT_MAX_RETRIES = 3
 
 
 def tools_openai_wrapper(tools):
@@ -31,6 +37,30 @@ class KimiModelAPIProvider(BaseModelAPIProvider):
     """
         https://platform.moonshot.ai/docs/api/chat#public-service-address
     """
+    rate_limit_provider = "kimi"
+
+    def __init__(self, model_name: str, pool_size: int = DEFAULT_POOL_SIZE, max_retries: int = 0, timeout: tuple = KIMI_DEFAULT_TIMEOUT):
+        """
+        Args:
+            model_name: e.g. kimi-k2-0711-preview
+            pool_size: keep-alive connections to moonshot, set it to the number of concurrent trials
+            max_retries: retries of the OpenAI SDK on connection errors, 429 and 5xx, 0 leaves them to the shared rate limiter
+            timeout: (connect timeout, read timeout) in seconds
+        """
+        super().__init__(model_name)
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        # Kimi API is OpenAI compatible, one client per provider keeps the TLS connections alive across calls
+        self.client = create_kimi_client(pool_size=pool_size, max_retries=max_retries, timeout=timeout)
+        # created on first async call, the httpx connection pool belongs to the running event loop
+        self.async_client = None
+
+    def get_async_client(self):
+        if self.async_client is None:
+            self.async_client = create_kimi_client(pool_size=self.pool_size, max_retries=self.max_retries, timeout=self.timeout, is_async=True)
+        return self.async_client
+
     def api_chat(self, messages: List, **kwargs) -> Dict[str, Any]:
         """
             Kimi model: "K2"
@@ -39,12 +69,13 @@ class KimiModelAPIProvider(BaseModelAPIProvider):
             model = self.model_name
             if model == "" or model is None:
                 model = "kimi-k2-0711-preview"
-            response = call_kimi_k2_chat(messages, model)
+            response = self.rate_limiter.call(lambda: call_kimi_k2_chat(messages, model, client=self.client), estimate_request_tokens(messages))
             tools, completion, reasoningContent = post_process_kimi_response(response)
             result = {
                 KEY_FUNCTION_CALL: tools,
                 KEY_COMPLETION: completion, 
-                KEY_REASON_CONTENT: reasoningContent
+                KEY_REASON_CONTENT: reasoningContent,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
             }
             return result
 
@@ -61,14 +92,16 @@ class KimiModelAPIProvider(BaseModelAPIProvider):
             model = self.model_name
             if model == "" or model is None:
                 model = "kimi-k2-0711-preview"
-            response = call_kimi_k2_tools(messages, tools, model)
-            tool_result = post_process_function_call_kimi(response)
-            tool_call_mapped, completion, reasoningContent = function_call_result_common_mapper(tool_result)
+            response = self.rate_limiter.call(lambda: call_kimi_k2_tools(messages, tools, model, client=self.client), estimate_request_tokens(messages, tools))
+            tool_results = post_process_function_call_list_kimi(response)
+            tool_call_mapped, completion, reasoningContent = function_call_result_common_mapper(tool_results[0] if tool_results else {})
 
             result = {
                 KEY_FUNCTION_CALL: tool_call_mapped,
+                KEY_FUNCTION_CALL_LIST: function_call_list_common_mapper(tool_results),
                 KEY_COMPLETION: "", 
-                KEY_REASON_CONTENT: ""
+                KEY_REASON_CONTENT: "",
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
             }
             # print (f"KimiModelAPIProvider debug api_function_call result return {result}")
             return result
@@ -76,15 +109,102 @@ class KimiModelAPIProvider(BaseModelAPIProvider):
         except Exception as e:
             logging.error(e)
             return {}
-        
-def call_kimi_k2_chat(messages, model_name):
-    from openai import OpenAI
 
-    client = OpenAI(
+    async def aapi_chat(self, messages: List, **kwargs) -> Dict[str, Any]:
+        """
+            Kimi chat with the async client
+        """
+        try:
+            model = self.model_name
+            if model == "" or model is None:
+                model = "kimi-k2-0711-preview"
+            response = await self.rate_limiter.acall(lambda: self.get_async_client().chat.completions.create(
+                model = model,
+                messages = messages,
+                temperature = 0.3,
+            ), estimate_request_tokens(messages))
+            tools, completion, reasoningContent = post_process_kimi_response(response)
+            result = {
+                KEY_FUNCTION_CALL: tools,
+                KEY_COMPLETION: completion, 
+                KEY_REASON_CONTENT: reasoningContent,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
+            }
+            return result
+
+        except Exception as e:
+            logging.error(f"Failed to process aapi_chat {e}")
+            return {}
+
+    async def aapi_function_call(self, messages: List, tools: List, **kwargs) -> Dict[str, Any]:
+        """
+            Kimi function call with the async client, same result as api_function_call
+        """
+        try:
+            model = self.model_name
+            if model == "" or model is None:
+                model = "kimi-k2-0711-preview"
+            response = await self.rate_limiter.acall(lambda: self.get_async_client().chat.completions.create(
+                model = model,
+                messages = messages,
+                tools = tools,
+                temperature = 0.3,
+            ), estimate_request_tokens(messages, tools))
+            tool_results = post_process_function_call_list_kimi(response)
+            tool_call_mapped, completion, reasoningContent = function_call_result_common_mapper(tool_results[0] if tool_results else {})
+
+            result = {
+                KEY_FUNCTION_CALL: tool_call_mapped,
+                KEY_FUNCTION_CALL_LIST: function_call_list_common_mapper(tool_results),
+                KEY_COMPLETION: "", 
+                KEY_REASON_CONTENT: "",
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
+            }
+            return result
+
+        except Exception as e:
+            logging.error(e)
+            return {}
+
+def create_kimi_client(pool_size: int = DEFAULT_POOL_SIZE, max_retries: int = KIMI_DEFAULT_MAX_RETRIES, timeout: tuple = KIMI_DEFAULT_TIMEOUT, is_async: bool = False):
+    """
+        OpenAI SDK client for moonshot with a tuned keep-alive connection pool, retries and timeouts
+    """
+    import httpx
+    from openai import OpenAI, AsyncOpenAI
+
+    connect_timeout, read_timeout = timeout
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    client_timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+    if is_async:
+        return AsyncOpenAI(
+            api_key = settings.KIMI_API_KEY,
+            base_url = KIMI_BASE_URL,
+            max_retries = max_retries,
+            timeout = client_timeout,
+            http_client = httpx.AsyncClient(limits=limits, timeout=client_timeout),
+        )
+    return OpenAI(
         api_key = settings.KIMI_API_KEY,
-        base_url = "https://api.moonshot.ai/v1",
+        base_url = KIMI_BASE_URL,
+        max_retries = max_retries,
+        timeout = client_timeout,
+        http_client = httpx.Client(limits=limits, timeout=client_timeout),
     )
-    
+
+_default_kimi_client = None
+
+def get_default_kimi_client():
+    """
+        Shared client for the module functions called without a provider client
+    """
+    global _default_kimi_client
+    if _default_kimi_client is None:
+        _default_kimi_client = create_kimi_client()
+    return _default_kimi_client
+
+def call_kimi_k2_chat(messages, model_name, client=None):
+    client = client if client is not None else get_default_kimi_client()
     completion = client.chat.completions.create(
         model = model_name,
         messages = messages,
@@ -92,29 +212,21 @@ def call_kimi_k2_chat(messages, model_name):
     )
     return completion
 
-def call_kimi_k2_tools(messages, tools, model_name):
-    import logging
+def call_kimi_k2_tools(messages, tools, model_name, client=None):
     import urllib3
-    from openai import OpenAI
     
-    # Completely disable all logging
-    logging.disable(logging.CRITICAL)
+    # Silence the noisy http client loggers only, logging.disable would also hide the rate limiter warnings of concurrent trials
     urllib3.disable_warnings()
     logging.getLogger("urllib3").setLevel(logging.CRITICAL)
     logging.getLogger("openai").setLevel(logging.CRITICAL)
 
-    client = OpenAI(
-        api_key = settings.KIMI_API_KEY,
-        base_url = "https://api.moonshot.ai/v1",
-    )
-    
+    client = client if client is not None else get_default_kimi_client()
     return client.chat.completions.create(
         model = model_name,
         messages = messages,
         tools = tools,
         temperature = 0.3,
     )
-    return completion
 
 def post_process_kimi_response(response):
     if response is None:
@@ -129,24 +241,29 @@ def post_process_kimi_response(response):
     return tools, completion, reasoningContent
 
 def post_process_function_call_kimi(response):
+    tool_calls = post_process_function_call_list_kimi(response)
+    return tool_calls[0] if tool_calls else {}
+
+def post_process_function_call_list_kimi(response):
+    """
+        All the tool calls of the response
+    """
     if response is None:
-        return {}
+        return []
     try:
         if "error" in response:
-            logging.error(f"post_process_function_call_kimi error {response}")
-            return {}
-        first_tool_call = response.choices[0].message.tool_calls[0]
-        tool_call = {
-            "id": first_tool_call.id,
+            logging.error(f"post_process_function_call_list_kimi error {response}")
+            return []
+        return [{
+            "id": tool_call.id,
             "function": {
-                "name": first_tool_call.function.name,
-                "arguments": first_tool_call.function.arguments
+                "name": tool_call.function.name,
+                "arguments": tool_call.function.arguments
             }
-        }
-        return tool_call
+        } for tool_call in response.choices[0].message.tool_calls or []]
     except Exception as e:
-        logging.error(f"post_process_function_call_kimi {e}")
-        return {}
+        logging.error(f"post_process_function_call_list_kimi {e}")
+        return []
 
 if __name__ == '__main__':
     gpt_api_provider = KimiModelAPIProvider(MODEL_SELECTION_KIMI_K2)
@@ -1,40 +1,93 @@
-from typing import Dict, Any
+import threading
+import importlib
+from typing import Dict, Any, Tuple
 
 from ..global_variables import *
-from .qwen_api import QwenModelAPIProvider
-from .kimi_api import KimiModelAPIProvider
-from .claude_api import ClaudeModelAPIProvider
-from .openai_api import OpenAIModelAPIProvider
-from .custom_openai_api import CustomOpenAIAPIProvider
+from .cassette import CassetteModelAPIProvider, get_cassette
 
+# model -> provider created on the first request of the model
 _global_model_provider: Dict[str, Any] = {}
+# model -> provider wrapped in the configured cassette
+_global_cassette_provider: Dict[str, Any] = {}
+_global_model_provider_lock = threading.Lock()
+
+# model -> (provider module, provider class, settings field of the API key), the module (and its SDK, anthropic,
+# openai, ...) is imported and the provider with its clients created only when the model is first requested
+_model_provider_registry: Dict[str, Tuple[str, str, str]] = {}
+
+def register_model_provider(model: str, module_name: str, class_name: str, api_key_setting: str):
+    """
+    Args:
+        model: model name, e.g. qwen-plus
+        module_name: module of the provider class, relative to model_utils, e.g. .qwen_api
+        class_name: provider class, created as class_name(model)
+        api_key_setting: field of settings, the model is available when it is set
+    """
+    _model_provider_registry[model] = (module_name, class_name, api_key_setting)
 
 ## CLAUDE
-if settings.ANTHROPIC_API_KEY:
-    _global_model_provider[MODEL_SELECTION_CLAUDE_37] = ClaudeModelAPIProvider(MODEL_SELECTION_CLAUDE_37)
-    _global_model_provider[MODEL_SELECTION_CLAUDE_OPUS_4] = ClaudeModelAPIProvider(MODEL_SELECTION_CLAUDE_OPUS_4)
+register_model_provider(MODEL_SELECTION_CLAUDE_37, ".claude_api", "ClaudeModelAPIProvider", "ANTHROPIC_API_KEY")
+register_model_provider(MODEL_SELECTION_CLAUDE_OPUS_4, ".claude_api", "ClaudeModelAPIProvider", "ANTHROPIC_API_KEY")
 
 ## OPENAI
-if settings.OPENAI_API_KEY:
-    _global_model_provider[MODEL_SELECTION_GPT4O] = OpenAIModelAPIProvider(MODEL_SELECTION_GPT4O)
+register_model_provider(MODEL_SELECTION_GPT4O, ".openai_api", "OpenAIModelAPIProvider", "OPENAI_API_KEY")
 
 ## QWEN
-if settings.QWEN_API_KEY:
-    _global_model_provider[MODEL_SELECTION_QWEN25_MAX] = QwenModelAPIProvider(MODEL_SELECTION_QWEN25_MAX)
-    _global_model_provider[MODEL_SELECTION_QWEN3_PLUS] = QwenModelAPIProvider(MODEL_SELECTION_QWEN3_PLUS)
-    _global_model_provider[MODEL_SELECTION_QWEN3_TURBO] = QwenModelAPIProvider(MODEL_SELECTION_QWEN3_TURBO)
-    _global_model_provider[MODEL_SELECTION_QWEN3_235B] = QwenModelAPIProvider(MODEL_SELECTION_QWEN3_235B)
-    _global_model_provider[MODEL_SELECTION_QWEN3_CODER] = QwenModelAPIProvider(MODEL_SELECTION_QWEN3_CODER)
+register_model_provider(MODEL_SELECTION_QWEN25_MAX, ".qwen_api", "QwenModelAPIProvider", "QWEN_API_KEY")
+register_model_provider(MODEL_SELECTION_QWEN3_PLUS, ".qwen_api", "QwenModelAPIProvider", "QWEN_API_KEY")
+register_model_provider(MODEL_SELECTION_QWEN3_TURBO, ".qwen_api", "QwenModelAPIProvider", "QWEN_API_KEY")
+register_model_provider(MODEL_SELECTION_QWEN3_235B, ".qwen_api", "QwenModelAPIProvider", "QWEN_API_KEY")
+register_model_provider(MODEL_SELECTION_QWEN3_CODER, ".qwen_api", "QwenModelAPIProvider", "QWEN_API_KEY")
 
 ## KIMI
-if settings.KIMI_API_KEY:
-    _global_model_provider[MODEL_SELECTION_KIMI_K2] = KimiModelAPIProvider(MODEL_SELECTION_KIMI_K2)
+register_model_provider(MODEL_SELECTION_KIMI_K2, ".kimi_api", "KimiModelAPIProvider", "KIMI_API_KEY")
+
+def load_provider_class(module_name: str, class_name: str):
+    return getattr(importlib.import_module(module_name, __package__), class_name)
 
+def get_registered_model_provider(model: str):
+    """
+    Provider of a model of the registry, created on the first call, None if the model is not registered
+    or its API key is not set
+    """
+    if model in _global_model_provider:
+        return _global_model_provider[model]
+    if model not in _model_provider_registry:
+        return None
+    module_name, class_name, api_key_setting = _model_provider_registry[model]
+    if not getattr(settings, api_key_setting, None):
+        return None
+    with _global_model_provider_lock:
+        # trials of several threads may request the model at the same time
+        if model not in _global_model_provider:
+            _global_model_provider[model] = load_provider_class(module_name, class_name)(model)
+        return _global_model_provider[model]
 
 def get_model_provider(model: str):
+    """
+    Get the model provider of the given model, wrapped in the cassette when one is configured
+    (record or replay of the calls, see model_utils.cassette).
+
+    Args:
+        model: The model name to get/create provider for
+
+    Returns:
+        Model provider instance or None if not available
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return get_api_model_provider(model)
+    cassette_provider = _global_cassette_provider.get(model)
+    if cassette_provider is None or cassette_provider.cassette is not cassette:
+        # replay needs no API provider, e.g. re-scoring without API keys
+        cassette_provider = CassetteModelAPIProvider(model, get_api_model_provider(model), cassette)
+        _global_cassette_provider[model] = cassette_provider
+    return cassette_provider
+
+def get_api_model_provider(model: str):
     """
     Get or create a model provider for the given model.
-    If the model exists in _global_model_provider, return it.
+    If the model is registered and its API key is set, return its provider, created on the first call.
     Otherwise, try to create a CustomOpenAI provider if custom settings are available.
 
     Args:
@@ -43,20 +96,21 @@ def get_model_provider(model: str):
     Returns:
         Model provider instance or None if not available
     """
-    # Check if model already exists in global provider
-    if model in _global_model_provider:
-        return _global_model_provider[model]
+    provider = get_registered_model_provider(model)
+    if provider is not None:
+        return provider
 
     # If custom OpenAI settings are available, create a dynamic provider
     if settings.CUSTOM_OPENAI_BASE_URL and settings.CUSTOM_OPENAI_API_KEY:
-        # Create a new CustomOpenAI provider with the requested model name
-        provider = CustomOpenAIAPIProvider(
-            model_name=model,
-            base_url=settings.CUSTOM_OPENAI_BASE_URL,
-            api_key=settings.CUSTOM_OPENAI_API_KEY
-        )
-        # Cache it for future use
-        _global_model_provider[model] = provider
-        return provider
+        with _global_model_provider_lock:
+            if model not in _global_model_provider:
+                # Create a new CustomOpenAI provider with the requested model name
+                _global_model_provider[model] = load_provider_class(".custom_openai_api", "CustomOpenAIAPIProvider")(
+                    model_name=model,
+                    base_url=settings.CUSTOM_OPENAI_BASE_URL,
+                    api_key=settings.CUSTOM_OPENAI_API_KEY
+                )
+            # Cache it for future use
+            return _global_model_provider[model]
 
     return None
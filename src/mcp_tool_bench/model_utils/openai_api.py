@@ -7,7 +7,7 @@ from typing import List, Dict, Any, Optional
 import os
 import sys
 import openai
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.abspath(os.path.join(CURRENT_DIR, '../../..')))
@@ -34,11 +34,20 @@ class OpenAIModelAPIProvider(BaseModelAPIProvider):
     OpenAI API for chat and function calling.
     https://platform.openai.com/docs/api-reference/chat
     """
+    rate_limit_provider = "openai"
+
     def __init__(self, model_name: str = ""):
         super().__init__(model_name)
+        # retries are left to the shared rate limiter, which sees the throttling
         self.client = OpenAI(
             api_key=settings.OPENAI_API_KEY,
-            base_url="https://api.openai.com/v1"
+            base_url="https://api.openai.com/v1",
+            max_retries=0
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url="https://api.openai.com/v1",
+            max_retries=0
         )
 
     def api_chat(self, messages: List, **kwargs) -> Dict[str, Any]:
@@ -50,16 +59,17 @@ class OpenAIModelAPIProvider(BaseModelAPIProvider):
             if not model: 
                 model = "gpt-4o"
 
-            response = self.client.chat.completions.create(
+            response = self.rate_limiter.call(lambda: self.client.chat.completions.create(
                 model=model,
                 messages=messages,
                 temperature=kwargs.get("temperature", 0.3)
-            )
+            ), estimate_request_tokens(messages))
             completion, reasoningContent = post_process_openai_chat_response(response)
             result = {
                 KEY_FUNCTION_CALL: {},
                 KEY_COMPLETION: completion,
-                KEY_REASON_CONTENT: reasoningContent
+                KEY_REASON_CONTENT: reasoningContent,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
             }
             return result
 
@@ -78,21 +88,23 @@ class OpenAIModelAPIProvider(BaseModelAPIProvider):
             model = self.model_name
             if not model:
                 model = "gpt-4o" 
-            response = self.client.chat.completions.create(
+            response = self.rate_limiter.call(lambda: self.client.chat.completions.create(
                 model=model,
                 messages=messages,
                 tools=tools,
                 tool_choice="auto",
                 temperature=kwargs.get("temperature", 0.3),
-                **kwargs
-            )
-            tool_result = post_process_openai_function_call_response(response)
-            tool_call_mapped, completion, reasoningContent = function_call_result_common_mapper(tool_call)
+                **{k: v for k, v in kwargs.items() if k not in ['temperature']}
+            ), estimate_request_tokens(messages, tools))
+            tool_calls = post_process_openai_function_call_list_response(response)
+            tool_call_mapped, completion, reasoningContent = function_call_result_common_mapper(tool_calls[0] if tool_calls else {})
 
             result = {
                 KEY_FUNCTION_CALL: tool_call_mapped,
+                KEY_FUNCTION_CALL_LIST: function_call_list_common_mapper(tool_calls),
                 KEY_COMPLETION: "",
-                KEY_REASON_CONTENT: ""
+                KEY_REASON_CONTENT: "",
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
             }
             return result
 
@@ -100,6 +112,65 @@ class OpenAIModelAPIProvider(BaseModelAPIProvider):
             logging.error(f"Failed to process OpenAI api_function_call: {e}")
             return {}
 
+    async def aapi_chat(self, messages: List, **kwargs) -> Dict[str, Any]:
+        """
+        OpenAI chat completion with the async client.
+        """
+        try:
+            model = self.model_name
+            if not model: 
+                model = "gpt-4o"
+
+            response = await self.rate_limiter.acall(lambda: self.async_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=kwargs.get("temperature", 0.3)
+            ), estimate_request_tokens(messages))
+            completion, reasoningContent = post_process_openai_chat_response(response)
+            result = {
+                KEY_FUNCTION_CALL: {},
+                KEY_COMPLETION: completion,
+                KEY_REASON_CONTENT: reasoningContent,
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
+            }
+            return result
+
+        except Exception as e:
+            logging.error(f"Failed to process OpenAI aapi_chat: {e}")
+            return {}
+
+    async def aapi_function_call(self, messages: List, tools: List, **kwargs) -> Dict[str, Any]:
+        """
+        OpenAI function calling (tool calling) with the async client.
+        """
+        try:
+            model = self.model_name
+            if not model:
+                model = "gpt-4o" 
+            response = await self.rate_limiter.acall(lambda: self.async_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                tools=tools,
+                tool_choice="auto",
+                temperature=kwargs.get("temperature", 0.3),
+                **{k: v for k, v in kwargs.items() if k not in ['temperature']}
+            ), estimate_request_tokens(messages, tools))
+            tool_calls = post_process_openai_function_call_list_response(response)
+            tool_call_mapped, completion, reasoningContent = function_call_result_common_mapper(tool_calls[0] if tool_calls else {})
+
+            result = {
+                KEY_FUNCTION_CALL: tool_call_mapped,
+                KEY_FUNCTION_CALL_LIST: function_call_list_common_mapper(tool_calls),
+                KEY_COMPLETION: "",
+                KEY_REASON_CONTENT: "",
+                KEY_USAGE: normalize_usage(getattr(response, "usage", None))
+            }
+            return result
+
+        except Exception as e:
+            logging.error(f"Failed to process OpenAI aapi_function_call: {e}")
+            return {}
+
 def post_process_openai_chat_response(response):
     """
     Processes the response from OpenAI chat completion.
@@ -114,28 +185,34 @@ def post_process_openai_chat_response(response):
 def post_process_openai_function_call_response(response):
     """
     Processes the response from OpenAI for function calls.
-    Extracts the tool call details.
+    Extracts the tool call details of the first tool call.
+    """
+    tool_calls = post_process_openai_function_call_list_response(response)
+    return tool_calls[0] if tool_calls else {}
+
+def post_process_openai_function_call_list_response(response):
+    """
+    Extracts the details of all the tool calls of the response, parallel tool calls return several.
     """
     if response is None or not response.choices or not response.choices[0].message:
-        return {}
+        return []
 
     try:
         message = response.choices[0].message
-        if message.tool_calls:
-            first_tool_call = message.tool_calls[0]
-            if first_tool_call.type == "function" and first_tool_call.function:
-                tool_call = {
-                    "id": first_tool_call.id,
+        tool_calls = []
+        for tool_call in message.tool_calls or []:
+            if tool_call.type == "function" and tool_call.function:
+                tool_calls.append({
+                    "id": tool_call.id,
                     "function": {
-                        "name": first_tool_call.function.name,
-                        "arguments": first_tool_call.function.arguments
+                        "name": tool_call.function.name,
+                        "arguments": tool_call.function.arguments
                     }
-                }
-                return tool_call
-        return {}
+                })
+        return tool_calls
     except Exception as e:
-        print (f"Failed to post_process_openai_function_call_response error {e}")
-        return {}
+        print (f"Failed to post_process_openai_function_call_list_response error {e}")
+        return []
 
 if __name__ == '__main__':    
     # Test function calling
@@ -3,9 +3,46 @@ import logging
 from typing import List, Dict, Any, Optional
 from .base_api import *
 from ..global_variables import settings
+from ..http_utils import create_pooled_session, DEFAULT_POOL_SIZE
 import requests
+import httpx
+
+QWEN_CHAT_COMPLETIONS_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"
+# (connect timeout, read timeout) in seconds
+QWEN_DEFAULT_TIMEOUT = (10, 60)
+QWEN_DEFAULT_MAX_RETRIES = 3
+QWEN_RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
 
 class QwenModelAPIProvider(BaseModelAPIProvider):
+    rate_limit_provider = "qwen"
+
+    def __init__(self, model_name: str, pool_size: int = DEFAULT_POOL_SIZE, max_retries: int = 0, timeout: tuple = QWEN_DEFAULT_TIMEOUT):
+        """
+        Args:
+            model_name: e.g. qwen-plus
+            pool_size: keep-alive connections to dashscope, set it to the number of concurrent trials
+            max_retries: retries of the session on connection errors and 429/5xx responses, 0 leaves them to the shared rate limiter
+            timeout: (connect timeout, read timeout) in seconds
+        """
+        super().__init__(model_name)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = create_qwen_session(pool_size=pool_size, max_retries=max_retries)
+        # created on first async call, the httpx connection pool belongs to the running event loop
+        self.async_client = None
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        if self.async_client is None:
+            connect_timeout, read_timeout = self.timeout
+            self.async_client = httpx.AsyncClient(
+                headers=qwen_request_headers(),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                # connect retries of the transport, 0 by default like the session, the shared rate limiter owns retries and backoff
+                transport=httpx.AsyncHTTPTransport(retries=self.max_retries)
+            )
+        return self.async_client
 
     def api_chat(self, messages: List, **kwargs) -> Dict[str, Any]:
         """
@@ -16,12 +53,14 @@ class QwenModelAPIProvider(BaseModelAPIProvider):
             if model == "" or model is None:
                 model = "qwen-plus"
 
-            response = call_qwen_messages_model_selection(messages, self.model_name)
+            response = self.rate_limiter.call(lambda: call_qwen_messages_model_selection(messages, self.model_name, session=self.session, timeout=self.timeout),
+                                              estimate_request_tokens(messages), check_response=raise_for_retryable_response)
             tools, completion, reasoningContent = post_process_qwen_response(response)
             result = {
                 KEY_FUNCTION_CALL: tools,
                 KEY_COMPLETION: completion, 
-                KEY_REASON_CONTENT: reasoningContent
+                KEY_REASON_CONTENT: reasoningContent,
+                KEY_USAGE: qwen_response_usage(response)
             }
             return result
 
@@ -51,15 +90,17 @@ class QwenModelAPIProvider(BaseModelAPIProvider):
             model = self.model_name
             if model == "" or model is None:
                 model = "qwen-plus"
-            messages, tools, model
-            response = call_qwen_tool_calls_model_selection(messages, tools, model)
-            tool_call = post_process_function_call_qwen_common(response)
-            tool_call_mapped, completion, reasoningContent = function_call_result_common_mapper(tool_call)
+            response = self.rate_limiter.call(lambda: call_qwen_tool_calls_model_selection(messages, tools, model, session=self.session, timeout=self.timeout),
+                                              estimate_request_tokens(messages, tools), check_response=raise_for_retryable_response)
+            tool_calls = post_process_function_call_list_qwen_common(response)
+            tool_call_mapped, completion, reasoningContent = function_call_result_common_mapper(tool_calls[0] if tool_calls else {})
 
             result = {
                 KEY_FUNCTION_CALL: tool_call_mapped,
+                KEY_FUNCTION_CALL_LIST: function_call_list_common_mapper(tool_calls),
                 KEY_COMPLETION: "", 
-                KEY_REASON_CONTENT: ""
+                KEY_REASON_CONTENT: "",
+                KEY_USAGE: qwen_response_usage(response)
             }
             print (f"AntQwenModelAPIProvider debug api_function_call result return {result}")
 
@@ -69,27 +110,106 @@ class QwenModelAPIProvider(BaseModelAPIProvider):
             logging.error(f"QwenModelAPIProvider {e}")
             return {}
 
-def call_qwen_messages_model_selection(messages: List, model: str):
+    async def aapi_chat(self, messages: List, **kwargs) -> Dict[str, Any]:
+        """
+            Qwen chat with the async http client
+        """
+        try:
+            model = self.model_name
+            if model == "" or model is None:
+                model = "qwen-plus"
+
+            response = await self.rate_limiter.acall(lambda: acall_qwen_messages_model_selection(messages, model, self.get_async_client()),
+                                                     estimate_request_tokens(messages), check_response=raise_for_retryable_response)
+            tools, completion, reasoningContent = post_process_qwen_response(response)
+            result = {
+                KEY_FUNCTION_CALL: tools,
+                KEY_COMPLETION: completion, 
+                KEY_REASON_CONTENT: reasoningContent,
+                KEY_USAGE: qwen_response_usage(response)
+            }
+            return result
+
+        except Exception as e:
+            logging.error(f"Failed to process aapi_chat {e}")
+            return {}
+
+    async def aapi_function_call(self, messages: List, tools: List, **kwargs) -> Dict[str, Any]:
+        """
+            Qwen function call with the async http client, same result as api_function_call
+        """
+        try:
+            model = self.model_name
+            if model == "" or model is None:
+                model = "qwen-plus"
+            response = await self.rate_limiter.acall(lambda: acall_qwen_tool_calls_model_selection(messages, tools, model, self.get_async_client()),
+                                                     estimate_request_tokens(messages, tools), check_response=raise_for_retryable_response)
+            tool_calls = post_process_function_call_list_qwen_common(response)
+            tool_call_mapped, completion, reasoningContent = function_call_result_common_mapper(tool_calls[0] if tool_calls else {})
+
+            result = {
+                KEY_FUNCTION_CALL: tool_call_mapped,
+                KEY_FUNCTION_CALL_LIST: function_call_list_common_mapper(tool_calls),
+                KEY_COMPLETION: "", 
+                KEY_REASON_CONTENT: "",
+                KEY_USAGE: qwen_response_usage(response)
+            }
+            return result
+
+        except Exception as e:
+            logging.error(f"QwenModelAPIProvider aapi_function_call {e}")
+            return {}
+
+def qwen_request_headers() -> Dict[str, str]:
+    api_key = settings.QWEN_API_KEY
+    if api_key is None:
+        raise ValueError("qwen_api.py qwen_request_headers api_key not found, please check .env file key QWEN_API_KEY")
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+def create_qwen_session(pool_size: int = DEFAULT_POOL_SIZE, max_retries: int = QWEN_DEFAULT_MAX_RETRIES) -> requests.Session:
+    """
+        Persistent session to dashscope, the TLS connection is reused across calls and
+        connection errors, 429 and 5xx responses are retried with exponential backoff (honoring Retry-After)
+    """
+    session = create_pooled_session(
+        pool_size=pool_size,
+        max_retries=max_retries,
+        backoff_factor=1.0,
+        status_forcelist=QWEN_RETRY_STATUS_CODES,
+        allowed_methods=["POST"]
+    )
+    session.headers.update(qwen_request_headers())
+    return session
+
+_default_qwen_session = None
+
+def get_default_qwen_session() -> requests.Session:
+    """
+        Shared session for the module functions called without a provider session
+    """
+    global _default_qwen_session
+    if _default_qwen_session is None:
+        _default_qwen_session = create_qwen_session()
+    return _default_qwen_session
+
+def call_qwen_messages_model_selection(messages: List, model: str, session: Optional[requests.Session] = None, timeout: tuple = QWEN_DEFAULT_TIMEOUT):
     """
         Reference doc: https://help.aliyun.com/zh/model-studio/use-qwen-by-calling-api#b30677f6e9437
         Input: 
             messages: List[Dict]
+            session: requests.Session created by create_qwen_session, default to the shared module session
     """
     try:
-        url = "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"
-        api_key = settings.QWEN_API_KEY
-        if api_key is None:
-            raise ValueError("qwen_general_api.py call_qwen_max_user_prompt api_key not found, please check .env file key QWEN_API_KEY")
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
+        session = session if session is not None else get_default_qwen_session()
         data = {
             "model": model,
             "messages": messages,
         }
         data = json.dumps(data).encode("utf-8")
-        response = requests.post(url, headers=headers, data=data, timeout=10)
+        response = session.post(QWEN_CHAT_COMPLETIONS_URL, data=data, timeout=timeout)
         if response.status_code == 200:
             result = response.json()
             print("Qwen Response:", result["choices"][0]["message"]["content"])
@@ -101,34 +221,12 @@ def call_qwen_messages_model_selection(messages: List, model: str):
         return None
 
 
-def call_qwen_user_prompt_model_selection(user_prompt: str, model: str):
+def call_qwen_user_prompt_model_selection(user_prompt: str, model: str, session: Optional[requests.Session] = None, timeout: tuple = QWEN_DEFAULT_TIMEOUT):
     """
         Reference doc: https://help.aliyun.com/zh/model-studio/use-qwen-by-calling-api#b30677f6e9437
     """
-    try:
-        url = "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"
-        api_key = settings.QWEN_API_KEY
-        if api_key is None:
-            raise ValueError("qwen_general_api.py call_qwen_max_user_prompt api_key not found, please check .env file key QWEN_API_KEY")
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "model": model,
-            "messages": [{"role": "user", "content": user_prompt}],
-        }
-        data = json.dumps(data).encode("utf-8")
-        response = requests.post(url, headers=headers, data=data, timeout=10)
-        if response.status_code == 200:
-            result = response.json()
-            print("Qwen Response:", result["choices"][0]["message"]["content"])
-        else:
-            print(f"API Return Failed with Status (Status Code: {response.status_code}): {response.text}")
-        return response
-    except Exception as e:
-        logging.error(e)
-        return None
+    messages = [{"role": "user", "content": user_prompt}]
+    return call_qwen_messages_model_selection(messages, model, session=session, timeout=timeout)
 
 
 def post_process_qwen_response(response):
@@ -146,37 +244,61 @@ def post_process_qwen_response(response):
     try:
         # x = res_json["data"]["values"]["data"]
         completion = res_json["choices"][0]["message"]["content"]
-        usage = res_json["usage"] if "usage" in res_json else {}
     except Exception as e:
         logging.error(e)
     return tools, completion, reasoningContent
 
+def qwen_response_usage(response) -> Dict[str, int]:
+    """
+        Normalized token usage of a dashscope response, requests or httpx, {} if the call failed
+        "usage":{"prompt_tokens":266,"completion_tokens":20,"total_tokens":286,"prompt_tokens_details":{"cached_tokens":0}}
+    """
+    if response is None or response.status_code != 200:
+        return {}
+    try:
+        return normalize_usage(response.json().get("usage"))
+    except Exception as e:
+        logging.error(f"qwen_response_usage failed to read usage {e}")
+        return {}
+
 
 
-def call_qwen_tool_calls_model_selection(messages, tools, model):
+def qwen_tool_calls_request_body(messages: List, tools: List, model: str) -> bytes:
+    """
+        Serialized function calling request. tools rendered by a ToolSet carry their json_bytes, which are
+        spliced in so the tool schema isn't serialized again for every request, the bytes are the same as json.dumps of the full body.
+    """
+    tools_json_bytes = getattr(tools, "json_bytes", None)
+    if tools_json_bytes is None:
+        data = {
+                "stream": False,
+                "model": model,
+                "messages": messages,
+                "tools": tools
+        }
+        return json.dumps(data).encode("utf-8")
+    data = {
+            "stream": False,
+            "model": model,
+            "messages": messages
+    }
+    return json.dumps(data)[:-1].encode("utf-8") + b', "tools": ' + tools_json_bytes + b'}'
+
+def call_qwen_tool_calls_model_selection(messages, tools, model, session: Optional[requests.Session] = None, timeout: tuple = QWEN_DEFAULT_TIMEOUT):
     """
         Args:
             messages: list of dict 
             tools: list of dict
+            session: requests.Session created by create_qwen_session, default to the shared module session
+            timeout: (connect timeout, read timeout) in seconds
         return:
             {"choices":[{"message":{"content":"","role":"assistant","tool_calls":[{"index":0,"id":"call_f8d9f219ee034156985f6a","type":"function","function":{"name":"get_current_weather","arguments":"{\"location\": \"上海\"}"}}]},"finish_reason":"tool_calls","index":0,"logprobs":null}],"object":"chat.completion","usage":{"prompt_tokens":266,"completion_tokens":20,"total_tokens":286,"prompt_tokens_details":{"cached_tokens":0}},"created":1750987730,"system_fingerprint":null,"model":"qwen-plus","id":"chatcmpl-3bd1954c-8594-98e1-957b-9fda39ac73fc"}
         doc: https://help.aliyun.com/zh/model-studio/qwen-function-calling
     """
     try:
-        api_key = settings.QWEN_API_KEY
-        url = "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f"Bearer {api_key}",
-        }
-        data = {
-                "stream": False,
-                "model": model,
-                "messages": messages,
-                "tools": tools
-        }
-        data = json.dumps(data).encode("utf-8")
-        response = requests.post(url, headers=headers, data=data)
+        session = session if session is not None else get_default_qwen_session()
+        data = qwen_tool_calls_request_body(messages, tools, model)
+        response = session.post(QWEN_CHAT_COMPLETIONS_URL, data=data, timeout=timeout)
         if response.status_code == 200:
             result = response.json()
             print("Qwen Response:", result["choices"][0]["message"]["content"])
@@ -187,6 +309,45 @@ def call_qwen_tool_calls_model_selection(messages, tools, model):
         print (e)
         return None
 
+async def acall_qwen_messages_model_selection(messages: List, model: str, client: httpx.AsyncClient):
+    """
+        Async version of call_qwen_messages_model_selection
+        Input: 
+            messages: List[Dict]
+            client: httpx.AsyncClient with the request headers, see QwenModelAPIProvider.get_async_client
+    """
+    try:
+        data = {
+            "model": model,
+            "messages": messages,
+        }
+        data = json.dumps(data).encode("utf-8")
+        response = await client.post(QWEN_CHAT_COMPLETIONS_URL, content=data)
+        if response.status_code != 200:
+            print(f"API Return Failed with Status (Status Code: {response.status_code}): {response.text}")
+        return response
+    except Exception as e:
+        logging.error(e)
+        return None
+
+async def acall_qwen_tool_calls_model_selection(messages, tools, model, client: httpx.AsyncClient):
+    """
+        Async version of call_qwen_tool_calls_model_selection
+        Args:
+            messages: list of dict 
+            tools: list of dict
+            client: httpx.AsyncClient with the request headers, see QwenModelAPIProvider.get_async_client
+    """
+    try:
+        data = qwen_tool_calls_request_body(messages, tools, model)
+        response = await client.post(QWEN_CHAT_COMPLETIONS_URL, content=data)
+        if response.status_code != 200:
+            print(f"API Return Failed with Status (Status Code: {response.status_code}): {response.text}")
+        return response
+    except Exception as e:
+        print (e)
+        return None
+
 def post_process_function_call_qwen_common(response):
     """
         tool_call:
@@ -200,8 +361,15 @@ def post_process_function_call_qwen_common(response):
                 "index": 0
             }
     """
+    tool_calls = post_process_function_call_list_qwen_common(response)
+    return tool_calls[0] if tool_calls else {}
+
+def post_process_function_call_list_qwen_common(response):
+    """
+        All the tool calls of the response, in the format of post_process_function_call_qwen_common
+    """
     if response is None:
-        return {}
+        return []
 
     tools = {}
     completion = ""
@@ -214,15 +382,14 @@ def post_process_function_call_qwen_common(response):
         res_json = json.loads(content)
 
     except json.decoder.JSONDecodeError:
-        print("Not Valid Json Format" + content)
-        return {}
+        print(f"Not Valid Json Format {content}")
+        return []
     try:
         choice = res_json["choices"][0] if len(res_json["choices"]) > 0 else {}
         finish_reason = choice["finish_reason"] if "finish_reason" in choice else "" # tool_calls
         message = choice["message"] if "message" in choice else {}
         tool_calls = message["tool_calls"] if "tool_calls" in message else []
-        tool_call = tool_calls[0] if len(tool_calls) > 0 else {}
-        return tool_call
+        return tool_calls or []
     except Exception as e:
         logging.error(e)
-        return {}
+        return []
@@ -0,0 +1,432 @@
+import json
+import time
+import random
+import asyncio
+import logging
+import datetime
+import threading
+from email.utils import parsedate_to_datetime
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_MAX_RETRIES = 4
+# backoff of the retries without Retry-After: a random delay in [0, min(max_delay, base_delay * 2 ** attempt)] seconds
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+# tokens reserved from the TPM bucket for the completion of a request, settled with the usage of the response
+DEFAULT_COMPLETION_TOKENS_ESTIMATE = 256
+
+RETRYABLE_STATUS_CODES = [408, 409, 429, 500, 502, 503, 504, 529]
+# the provider asks the client to slow down, the adaptive concurrency is decreased
+THROTTLE_STATUS_CODES = [429, 503, 529]
+# transient network errors of the openai and anthropic SDKs, httpx and requests
+RETRYABLE_EXCEPTION_NAMES = ["APITimeoutError", "APIConnectionError", "TimeoutException", "ConnectError", "ConnectTimeout",
+                             "ReadTimeout", "ReadError", "RemoteProtocolError", "ConnectionError", "Timeout", "TimeoutError"]
+
+# Client side limits by provider (rate_limit_provider of the BaseModelAPIProvider subclass):
+#   rpm / tpm: requests and tokens per minute, null is unlimited
+#   max_retries, base_delay, max_delay: retries of the transient errors
+# Providers which are not listed use the default. A --rate_limits json file with the same layout replaces them.
+DEFAULT_RATE_LIMIT_RULES = {
+    "default": {"rpm": None, "tpm": None, "max_retries": DEFAULT_MAX_RETRIES, "base_delay": DEFAULT_BASE_DELAY, "max_delay": DEFAULT_MAX_DELAY},
+    "providers": {}
+}
+
+def load_rate_limit_rules(file_path: Optional[str]) -> Dict:
+    if not file_path:
+        return DEFAULT_RATE_LIMIT_RULES
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class RetryableStatusError(Exception):
+    """
+    Transient failure of a provider whose client returns the HTTP response instead of raising, e.g. the dashscope requests
+    """
+
+    def __init__(self, status_code: Optional[int], retry_after: Optional[float] = None):
+        super().__init__(f"Retryable API response with status {status_code}" if status_code is not None else "No API response")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+def parse_retry_after(headers) -> Optional[float]:
+    """
+    Seconds to wait from the retry-after-ms or Retry-After (seconds or HTTP date) header, None if missing
+    """
+    if not headers:
+        return None
+    try:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms is not None:
+            return max(0.0, float(retry_after_ms) / 1000.0)
+        retry_after = headers.get("retry-after")
+        if retry_after is None:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            retry_at = parsedate_to_datetime(retry_after)
+            return max(0.0, (retry_at - datetime.datetime.now(retry_at.tzinfo)).total_seconds())
+    except Exception:
+        return None
+
+def raise_for_retryable_response(response):
+    """
+    Raise RetryableStatusError for a missing response (network error) or a 408/429/5xx response, else return the response
+    """
+    if response is None:
+        raise RetryableStatusError(None)
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        raise RetryableStatusError(response.status_code, parse_retry_after(response.headers))
+    return response
+
+def classify_error(e: Exception) -> Tuple[bool, bool, Optional[float]]:
+    """
+    Returns:
+        Tuple[bool, bool, Optional[float]]: (retryable, throttled, retry_after seconds)
+    """
+    if isinstance(e, RetryableStatusError):
+        return True, e.status_code in THROTTLE_STATUS_CODES, e.retry_after
+    response = getattr(e, "response", None)
+    status_code = getattr(e, "status_code", None) or getattr(response, "status_code", None)
+    if isinstance(status_code, int):
+        retryable = status_code in RETRYABLE_STATUS_CODES
+        return retryable, status_code in THROTTLE_STATUS_CODES, parse_retry_after(getattr(response, "headers", None)) if retryable else None
+    retryable = any(cls.__name__ in RETRYABLE_EXCEPTION_NAMES for cls in type(e).__mro__)
+    return retryable, False, None
+
+def estimate_request_tokens(messages: List, tools: Any = None) -> int:
+    """
+    Rough token count of a request, 4 characters per token, reserved from the TPM bucket before the call
+    """
+    num_chars = len(json.dumps(messages, ensure_ascii=False, default=str))
+    if tools:
+        tools_json_bytes = getattr(tools, "json_bytes", None)
+        num_chars += len(tools_json_bytes) if tools_json_bytes is not None else len(json.dumps(tools, ensure_ascii=False, default=str))
+    return num_chars // 4 + DEFAULT_COMPLETION_TOKENS_ESTIMATE
+
+def response_total_tokens(response) -> Optional[int]:
+    """
+    Total tokens of an SDK response (OpenAI compatible or Anthropic usage), None if unknown
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    total_tokens = getattr(usage, "total_tokens", None)
+    if total_tokens is not None:
+        return total_tokens
+    input_tokens, output_tokens = getattr(usage, "input_tokens", None), getattr(usage, "output_tokens", None)
+    if input_tokens is None and output_tokens is None:
+        return None
+    return (input_tokens or 0) + (output_tokens or 0)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate_per_minute, holding at most one minute of budget.
+    reserve() takes the amount right away and returns the seconds the caller has to wait before sending, the bucket
+    goes negative meanwhile, so concurrent callers queue up in order without holding the lock while they sleep.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def adjust(self, amount: float):
+        """
+        Take (or give back, when negative) tokens after the fact, e.g. the difference between the actual and the estimated usage
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit of the requests in flight: every success adds 1/limit (one slot per limit successes),
+    a throttled request halves the limit, once per round trip (only requests sent after the last decrease count).
+    Threads wait on a condition, coroutines on a future of their own event loop (trials may run on several loops),
+    a released slot or a raised limit is handed to the waiting coroutines first, in arrival order.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, decrease_factor: float = 0.5):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.decrease_factor = decrease_factor
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self._condition = threading.Condition()
+        # (event loop, future) of the waiting coroutines
+        self._async_waiters = deque()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._condition:
+            if not self._async_waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._async_waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._condition:
+                granted = waiter not in self._async_waiters
+                if not granted:
+                    self._async_waiters.remove(waiter)
+            # a slot granted to the cancelled coroutine goes back, _resolve_waiter releases it when the future was cancelled first
+            if granted and waiter[1].done() and not waiter[1].cancelled():
+                self.release()
+            raise
+
+    def _resolve_waiter(self, future: asyncio.Future):
+        if future.done():
+            self.release()
+        else:
+            future.set_result(True)
+
+    def _wake_waiters(self):
+        # called with the condition held
+        while self._async_waiters and self.in_flight < int(self.limit):
+            loop, future = self._async_waiters.popleft()
+            self.in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._resolve_waiter, future)
+            except RuntimeError:
+                # the event loop of the waiter is closed
+                self.in_flight -= 1
+        self._condition.notify_all()
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._wake_waiters()
+
+    def on_success(self):
+        with self._condition:
+            previous_limit = int(self.limit)
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            if int(self.limit) > previous_limit:
+                self._wake_waiters()
+
+    def on_throttle(self, sent_at: float):
+        with self._condition:
+            if sent_at < self.last_decrease:
+                return
+            self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+            self.last_decrease = time.monotonic()
+            logging.warning(f"AdaptiveConcurrencyLimiter throttled, concurrency limit decreased to {int(self.limit)}")
+
+
+class ProviderRateLimiter:
+    """
+    Client side limits of the calls to one provider: RPM and TPM token buckets, an adaptive concurrency limit and
+    retries of the transient errors (timeouts, connection errors, 408/429/5xx) with exponential backoff and jitter,
+    waiting at least the Retry-After of the response. The error of the last attempt is raised to the provider,
+    which returns its usual empty result.
+
+    Usage:
+        rate_limiter = get_rate_limiter("openai")
+        response = rate_limiter.call(lambda: client.chat.completions.create(...), estimate_request_tokens(messages, tools))
+        response = await rate_limiter.acall(lambda: async_client.chat.completions.create(...), estimate_request_tokens(messages, tools))
+    """
+
+    def __init__(self, name: str, rpm: Optional[float] = None, tpm: Optional[float] = None, max_concurrency: Optional[int] = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                 seed: Optional[int] = None):
+        self.name = name
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrencyLimiter(max_concurrency) if max_concurrency else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        self.counts = {"calls": 0, "retries": 0, "throttled": 0, "failed": 0}
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.counts[key] += 1
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket is not None and estimated_tokens > 0:
+            wait = max(wait, self.token_bucket.reserve(estimated_tokens))
+        return wait
+
+    def _on_response(self, response, estimated_tokens: int):
+        if self.concurrency is not None:
+            self.concurrency.on_success()
+        if self.token_bucket is not None:
+            total_tokens = response_total_tokens(response)
+            if total_tokens is not None:
+                self.token_bucket.adjust(total_tokens - estimated_tokens)
+
+    def _on_error(self, e: Exception, attempt: int, sent_at: float) -> Optional[float]:
+        """
+        Returns:
+            seconds to wait before the next attempt, None if the error is raised
+        """
+        retryable, throttled, retry_after = classify_error(e)
+        if throttled:
+            self._count("throttled")
+            if self.concurrency is not None:
+                self.concurrency.on_throttle(sent_at)
+        if not retryable or attempt >= self.max_retries:
+            self._count("failed")
+            return None
+        self._count("retries")
+        delay = self.backoff_delay(attempt, retry_after)
+        logging.warning(f"ProviderRateLimiter {self.name} attempt {attempt + 1} failed with {type(e).__name__}: {e}, retry in {delay:.2f}s")
+        return delay
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        with self._stats_lock:
+            jitter = self.random.random()
+        if retry_after is not None:
+            # the jitter keeps the callers throttled together from retrying at the same instant
+            return retry_after + jitter * min(self.base_delay, retry_after)
+        return jitter * min(self.max_delay, self.base_delay * (2 ** attempt))
+
+    def call(self, request_function: Callable[[], Any], estimated_tokens: int = 0, check_response: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Args:
+            request_function: sends one attempt of the request and returns the response
+            estimated_tokens: tokens reserved from the TPM bucket, see estimate_request_tokens
+            check_response: raises for a response which has to be retried, e.g. raise_for_retryable_response
+        """
+        self._count("calls")
+        attempt = 0
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait > 0:
+                time.sleep(wait)
+            if self.concurrency is not None:
+                self.concurrency.acquire()
+            sent_at = time.monotonic()
+            try:
+                response = request_function()
+                if check_response is not None:
+                    check_response(response)
+            except Exception as e:
+                delay = self._on_error(e, attempt, sent_at)
+                if delay is None:
+                    raise
+            else:
+                self._on_response(response, estimated_tokens)
+                return response
+            finally:
+                if self.concurrency is not None:
+                    self.concurrency.release()
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, request_function: Callable[[], Any], estimated_tokens: int = 0, check_response: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Async version of call, request_function returns the awaitable of one attempt
+        """
+        self._count("calls")
+        attempt = 0
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if self.concurrency is not None:
+                await self.concurrency.aacquire()
+            sent_at = time.monotonic()
+            try:
+                response = await request_function()
+                if check_response is not None:
+                    check_response(response)
+            except Exception as e:
+                delay = self._on_error(e, attempt, sent_at)
+                if delay is None:
+                    raise
+            else:
+                self._on_response(response, estimated_tokens)
+                return response
+            finally:
+                if self.concurrency is not None:
+                    self.concurrency.release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.counts)
+        if self.concurrency is not None:
+            stats["concurrency_limit"] = int(self.concurrency.limit)
+        return stats
+
+
+_global_rate_limit_rules: Dict = DEFAULT_RATE_LIMIT_RULES
+_global_max_concurrency: Optional[int] = None
+_global_rate_limiters: Dict[str, ProviderRateLimiter] = {}
+_global_rate_limiters_lock = threading.Lock()
+
+def configure_rate_limiter(rules: Optional[Dict] = None, max_concurrency: Optional[int] = None):
+    """
+    Set the limits of the providers, the limiters are created again on the next call
+
+    Args:
+        rules: layout of DEFAULT_RATE_LIMIT_RULES
+        max_concurrency: upper bound of the adaptive concurrency of each provider, None disables it
+    """
+    global _global_rate_limit_rules, _global_max_concurrency
+    with _global_rate_limiters_lock:
+        _global_rate_limit_rules = rules if rules is not None else DEFAULT_RATE_LIMIT_RULES
+        _global_max_concurrency = max_concurrency
+        _global_rate_limiters.clear()
+
+def get_rate_limiter(provider_name: str) -> ProviderRateLimiter:
+    rate_limiter = _global_rate_limiters.get(provider_name)
+    if rate_limiter is not None:
+        return rate_limiter
+    with _global_rate_limiters_lock:
+        if provider_name not in _global_rate_limiters:
+            limits = {**DEFAULT_RATE_LIMIT_RULES["default"], **_global_rate_limit_rules.get("default", {}),
+                      **_global_rate_limit_rules.get("providers", {}).get(provider_name, {})}
+            _global_rate_limiters[provider_name] = ProviderRateLimiter(
+                provider_name,
+                rpm=limits.get("rpm"),
+                tpm=limits.get("tpm"),
+                max_concurrency=limits.get("max_concurrency", _global_max_concurrency),
+                max_retries=limits.get("max_retries", DEFAULT_MAX_RETRIES),
+                base_delay=limits.get("base_delay", DEFAULT_BASE_DELAY),
+                max_delay=limits.get("max_delay", DEFAULT_MAX_DELAY)
+            )
+        return _global_rate_limiters[provider_name]
+
+def get_rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    return {provider_name: rate_limiter.stats() for provider_name, rate_limiter in list(_global_rate_limiters.items())}
@@ -11,6 +11,11 @@ import os
 import numpy as np
 from typing import List, Dict, Any, Tuple
 from src.mcp_tool_bench.evaluation.evaluation_utils import estimate_pass_at_k, base_error_analysis
+from src.mcp_tool_bench.evaluation.pass_at_k import PassAtKCounts, trial_outcome_counts, summarize_pass_at_k, format_pass_at_k_value, PASS_AT_K_GROUP_KEYS, DEFAULT_GROUP_BY
+from src.mcp_tool_bench.evaluation.confidence import PassAtKIntervalEstimator, get_interval_estimator, CI_METHODS, DEFAULT_CI_METHOD, DEFAULT_CI_LEVEL, DEFAULT_BOOTSTRAP_SAMPLES
+from src.mcp_tool_bench.utils.timing import LatencyStats, format_latency_summary, PHASE_LOG_WRITE, KEY_LATENCY
+from src.mcp_tool_bench.utils.token_usage import TokenUsageStats, load_token_prices, format_token_usage_summary, KEY_TOKEN_USAGE
+from src.mcp_tool_bench.utils.run_log import iter_run_log, save_run_log_stream, is_jsonl_log_path, JsonlRunLogWriter, RECORD_TYPE_HEADER, RECORD_TYPE_TASK, RECORD_TYPE_FOOTER
 
 def check_single_tool_call_dag(pred_tool_result: Dict, label_result: Dict) -> Tuple[bool, bool]:
     # implementation
@@ -57,182 +62,228 @@ def check_correctness(pred_tool_result_list: List[Dict], label_result_list: List
     
     return tool_consistency, output_consistency
 
-def calculate_metrics_from_log(log_file_path: str, pass_k_list: List[int] = None) -> Dict[str, Any]:
+def calculate_metrics_from_log(log_file_path: str, pass_k_list: List[int] = None, token_prices: Dict[str, Dict[str, float]] = None,
+                               interval_estimator: PassAtKIntervalEstimator = None) -> Dict[str, Any]:
     """
     Calculate tool_pass@{k} and parameter_pass@{k} metrics from a log file.
     
     Args:
         log_file_path: Path to the log file
         pass_k_list: List of k values for pass@k calculation. If None, will extract from log file.
+        token_prices: USD per 1M tokens by model, output of load_token_prices. If None, no cost is calculated.
+        interval_estimator: Confidence intervals of the pass@k values, output of get_interval_estimator. If None, no intervals.
         
     Returns:
         Dict containing the calculated metrics
     """
     
-    # Load log file
-    with open(log_file_path, 'r', encoding='utf-8') as f:
-        log_data = json.load(f)
+    # Read the log file task by task, json or jsonl run log, only the counts of each task are kept
+    run_info = {}
+    num_tasks_read = 0
+    
+    # Trial counts of each task, the group columns are set once the run_info is known
+    task_counts = []
+    latency_stats = LatencyStats()
+    token_usage_stats = TokenUsageStats()
+    
+    for record_type, record in iter_run_log(log_file_path):
+        if record_type == RECORD_TYPE_HEADER:
+            run_info = record.get("run_info", {})
+            continue
+        if record_type == RECORD_TYPE_FOOTER:
+            run_info = record.get("run_info", run_info)
+            continue
+        num_tasks_read += 1
+        if num_tasks_read > 50:
+            continue
+        task = record.get("task", {})
+        trials = task.get("trials", [])
+        if not trials:
+            continue
+        for trial in trials:
+            latency_stats.add_trial(trial)
+            token_usage_stats.add_trial(trial)
+            
+        # Count trials and correct results directly from log
+        task_counts.append((trial_outcome_counts(trials), task.get("call_type")))
     
     # Extract pass_k_list from log if not provided
     if pass_k_list is None:
-        pass_k_str = log_data.get("run_info", {}).get("pass_k", "1")
+        pass_k_str = run_info.get("pass_k", "1")
         pass_k_list = [int(k) for k in pass_k_str.split(",")]
     
     print(f"Processing log file: {log_file_path}")
     print(f"Pass@k values: {pass_k_list}")
     
-    # Extract run details
-    run_details = log_data.get("run_details", [])
-    if not run_details:
+    if num_tasks_read == 0:
         print("No run_details found in log file")
         return {}
     
-    # Arrays to store results for each task
-    num_trails_array = []
-    num_pass_array = []
-    num_tool_correct_array = []
-    num_parameter_correct_array = []
-    
-    run_details = run_details[:50]
-    # Process each task
-    for task in run_details:
-        trials = task.get("trials", [])
-        if not trials:
-            continue
-            
-        # Count trials and correct results
-        num_trials = len(trials)
-        num_passed = 0
-        num_tool_correct = 0
-        num_parameter_correct = 0
+    category = run_info.get("category", "unknown")
+    model = run_info.get("model", "unknown")
+    pass_at_k_counts = PassAtKCounts()
+    for counts, call_type in task_counts:
+        pass_at_k_counts.add_counts(*counts, category=category, model=model, call_type=call_type)
+    
+    totals = pass_at_k_counts.totals()
+    print(f"Processed {totals['num_tasks']} tasks")
+    print(f"Total trials: {totals['num_trials_total']}")
+    print(f"Total passed: {totals['num_passed_total']}")
+    print(f"Total tool correct: {totals['num_tool_correct_total']}")
+    print(f"Total parameter correct: {totals['num_parameter_correct_total']}")
+    
+    # Calculate pass@k, tool_pass@k and parameter_pass@k for all the k values in one vectorized pass
+    metrics_list = summarize_pass_at_k(pass_at_k_counts, pass_k_list, group_values={"category": category, "model": model},
+                                       interval_estimator=interval_estimator)
+    
+    for k, metric in zip(pass_k_list, metrics_list):
+        print(f"Pass@{k} - Tool_selected: {format_pass_at_k_value(metric, f'tool_pass@{k}')}, Parameter: {format_pass_at_k_value(metric, f'parameter_pass@{k}')}, "
+              f"Tool_call: {format_pass_at_k_value(metric, f'pass@{k}')}")
 
-        # Calculate directly from log
-        num_passed = sum(1 for trial in trials if (trial.get("if_pass", False) and trial.get("tool_correctness", False) and trial.get("parameter_correctness", False)))
-        num_tool_correct = sum(1 for trial in trials if trial.get("tool_correctness", False))
-        num_parameter_correct = sum(1 for trial in trials if (trial.get("parameter_correctness", False) and trial.get("tool_correctness", False)))
-        
-        num_trails_array.append(num_trials)
-        num_pass_array.append(num_passed)
-        num_tool_correct_array.append(num_tool_correct)
-        num_parameter_correct_array.append(num_parameter_correct)
-    
-    print(f"Processed {len(num_trails_array)} tasks")
-    print(f"Total trials: {sum(num_trails_array)}")
-    print(f"Total passed: {sum(num_pass_array)}")
-    print(f"Total tool correct: {sum(num_tool_correct_array)}")
-    print(f"Total parameter correct: {sum(num_parameter_correct_array)}")
-    
-    # Calculate metrics for each k value
-    metrics_list = []
-    run_info = log_data.get("run_info", {})
-    
-    for k in pass_k_list:
-        # Calculate pass@{k} for overall correctness
-        pass_at_k_arr = estimate_pass_at_k(num_trails_array, num_pass_array, k)
-        pass_at_k = float(np.mean(pass_at_k_arr)) if len(pass_at_k_arr) > 0 else 0
-        
-        # Calculate tool_pass@{k}
-        tool_pass_at_k_arr = estimate_pass_at_k(num_trails_array, num_tool_correct_array, k)
-        tool_pass_at_k = float(np.mean(tool_pass_at_k_arr)) if len(tool_pass_at_k_arr) > 0 else 0
-        
-        # Calculate parameter_pass@{k}
-        parameter_pass_at_k_arr = estimate_pass_at_k(num_trails_array, num_parameter_correct_array, k)
-        parameter_pass_at_k = float(np.mean(parameter_pass_at_k_arr)) if len(parameter_pass_at_k_arr) > 0 else 0
-        
-        metric = {
-            "category": run_info.get("category", "unknown"),
-            "model": run_info.get("model", "unknown"),
-            f"pass@{k}": pass_at_k,
-            f"tool_pass@{k}": tool_pass_at_k,
-            f"parameter_pass@{k}": parameter_pass_at_k,
-            "num_tasks": len(num_trails_array),
-            "num_trials_total": sum(num_trails_array),
-            "num_passed_total": sum(num_pass_array),
-            "num_tool_correct_total": sum(num_tool_correct_array),
-            "num_parameter_correct_total": sum(num_parameter_correct_array)
-        }
-        metrics_list.append(metric)
-        
-        print(f"Pass@{k} - Tool_selected: {tool_pass_at_k:.4f}, Parameter: {parameter_pass_at_k:.4f}, Tool_call: {pass_at_k:.4f}")
+    # p50/p95/p99 of the trial phases, the log writes are only known to the run itself
+    latency_summary = latency_stats.summary()
+    run_log_write = run_info.get(KEY_LATENCY, {}).get("phases_ms", {}).get(PHASE_LOG_WRITE)
+    if run_log_write is not None:
+        latency_summary[PHASE_LOG_WRITE] = run_log_write
+    latency = {"category": run_info.get("category", "unknown"), "model": run_info.get("model", "unknown"), "phases_ms": latency_summary}
+    if latency_summary:
+        run_info = {**run_info, KEY_LATENCY: latency}
+        print(f"Latency of the phases:\n{format_latency_summary(latency_summary)}")
+
+    # token usage of the model under test and the throughput over the LLM function call time
+    token_usage_summary = token_usage_stats.summary(prices=(token_prices or {}).get(run_info.get("model")))
+    token_usage = {"category": run_info.get("category", "unknown"), "model": run_info.get("model", "unknown"), "usage": token_usage_summary}
+    if token_usage_summary:
+        run_info = {**run_info, KEY_TOKEN_USAGE: token_usage}
+        print(f"Token usage: {format_token_usage_summary(token_usage_summary)}")
     
     return {
         "run_info": run_info,
         "metrics": metrics_list,
+        "latency": latency,
+        "latency_stats": latency_stats,
+        "token_usage": token_usage,
+        "token_usage_stats": token_usage_stats,
+        "pass_at_k_counts": pass_at_k_counts,
         "calculation_info": {
             "log_file": log_file_path,
             "pass_k_list": pass_k_list,
-            "num_tasks": len(num_trails_array),
-            "total_trials": sum(num_trails_array)
+            "num_tasks": totals["num_tasks"],
+            "total_trials": totals["num_trials_total"]
         }
     }
 
 
-def update_log_file_with_metrics(log_file_path: str, output_file_path: str = None) -> str:
+def update_log_file_with_metrics(log_file_path: str, output_file_path: str = None, result: Dict[str, Any] = None,
+                                 token_prices: Dict[str, Dict[str, float]] = None, interval_estimator: PassAtKIntervalEstimator = None) -> str:
     """
     Update the original log file with the calculated metrics.
     
     Args:
         log_file_path: Path to the original log file
         output_file_path: Path for the updated log file. If None, will overwrite original.
+        result: Output of calculate_metrics_from_log of the log file. If None, will be calculated.
+        token_prices: USD per 1M tokens by model, used when the result is calculated
+        interval_estimator: Confidence intervals of the pass@k values, used when the result is calculated
         
     Returns:
         Path to the updated log file
     """
     
     # Calculate metrics
-    result = calculate_metrics_from_log(log_file_path)
+    if result is None:
+        result = calculate_metrics_from_log(log_file_path, token_prices=token_prices, interval_estimator=interval_estimator)
     
     if not result:
         print("Failed to calculate metrics")
         return ""
     
-    # Load original log file
-    with open(log_file_path, 'r', encoding='utf-8') as f:
-        original_log = json.load(f)
-    
-    # Update metrics in the original log
-    original_log["metrics"] = result["metrics"]
-    
     # Determine output file path
     if output_file_path is None:
         output_file_path = log_file_path
     
-    # Save updated log file
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        json.dump(original_log, f, ensure_ascii=False, indent=2)
+    if is_jsonl_log_path(output_file_path) and os.path.abspath(output_file_path) == os.path.abspath(log_file_path):
+        # JSONL run log updated in place: append a footer with the new metrics, the last footer wins
+        run_log_writer = JsonlRunLogWriter(log_file_path, resume=True)
+        run_log_writer.write_footer(result["run_info"], result["metrics"])
+        run_log_writer.close()
+    else:
+        # Copy the tasks of the original log one by one with the updated metrics, in the format of the output file extension
+        tasks = (record["task"] for record_type, record in iter_run_log(log_file_path) if record_type == RECORD_TYPE_TASK)
+        save_run_log_stream(output_file_path, result["run_info"], result["metrics"], tasks)
     
     print(f"Updated log file saved to: {output_file_path}")
     return output_file_path
 
 
-def process_multiple_logs(log_dir: str, pattern: str = None) -> None:
+def process_multiple_logs(log_dir: str, pattern: str = None, token_prices: Dict[str, Dict[str, float]] = None,
+                          pass_k_list: List[int] = None, group_by: List[str] = None,
+                          interval_estimator: PassAtKIntervalEstimator = None) -> List[Dict[str, Any]]:
     """
     Process multiple log files in a directory.
     
     Args:
         log_dir: Directory containing log files
         pattern: Optional pattern to filter log files (e.g., "browser_0711_single_500")
+        token_prices: USD per 1M tokens by model, output of load_token_prices
+        pass_k_list: k values of the pass@k over all the logs. If None, the k values of each log.
+        group_by: columns of the pass@k over all the logs, category, model and call_type, default is category and model
+        interval_estimator: Confidence intervals of the pass@k values of each log and group
+
+    Returns:
+        pass@k metrics of the tasks of all the logs by group
     """
     
     if not os.path.exists(log_dir):
         print(f"Directory not found: {log_dir}")
-        return
+        return []
     
     log_files = []
     for file in os.listdir(log_dir):
-        if file.endswith('.json'):
+        if file.endswith('.json') or file.endswith('.jsonl'):
             if pattern is None or pattern in file:
                 log_files.append(os.path.join(log_dir, file))
     
     print(f"Found {len(log_files)} log files to process")
     
+    # trial phase latencies and token usage of all the logs, by (model, category)
+    group_latency_stats = {}
+    group_token_usage_stats = {}
+    # trial counts of the tasks of all the logs, pass@k is computed once by group
+    pass_at_k_counts = PassAtKCounts()
+    pass_k_set = set(pass_k_list or [])
     for log_file in log_files:
         print(f"\nProcessing: {log_file}")
         try:
-            update_log_file_with_metrics(log_file)
+            result = calculate_metrics_from_log(log_file, token_prices=token_prices, interval_estimator=interval_estimator)
+            update_log_file_with_metrics(log_file, result=result)
+            if result:
+                group_key = (result["latency"]["model"], result["latency"]["category"])
+                group_latency_stats.setdefault(group_key, LatencyStats()).merge(result["latency_stats"])
+                group_token_usage_stats.setdefault(group_key, TokenUsageStats()).merge(result["token_usage_stats"])
+                pass_at_k_counts.merge(result["pass_at_k_counts"])
+                if pass_k_list is None:
+                    pass_k_set.update(result["calculation_info"]["pass_k_list"])
         except Exception as e:
             print(f"Error processing {log_file}: {e}")
 
+    for (model, category), latency_stats in sorted(group_latency_stats.items()):
+        latency_summary = latency_stats.summary()
+        if latency_summary:
+            print(f"\nLatency of model {model} category {category}:\n{format_latency_summary(latency_summary)}")
+    for (model, category), token_usage_stats in sorted(group_token_usage_stats.items()):
+        token_usage_summary = token_usage_stats.summary(prices=(token_prices or {}).get(model))
+        if token_usage_summary:
+            print(f"\nToken usage of model {model} category {category}: {format_token_usage_summary(token_usage_summary)}")
+
+    group_by = DEFAULT_GROUP_BY if group_by is None else group_by
+    group_metrics = summarize_pass_at_k(pass_at_k_counts, sorted(pass_k_set), group_by=group_by, interval_estimator=interval_estimator) if len(pass_at_k_counts) > 0 else []
+    if group_metrics:
+        print(f"\nPass@k of all the logs by {', '.join(group_by) or 'all tasks'}:")
+        for metric in group_metrics:
+            print(f"  {metric}")
+    return group_metrics
+
 
 def main():
     parser = argparse.ArgumentParser(description="Calculate tool_pass@{k} and parameter_pass@{k} metrics from log files")
@@ -242,26 +293,35 @@ def main():
     parser.add_argument("--pass_k", type=str, default="1,3", help="Comma-separated list of k values for pass@k")
     parser.add_argument("--output", type=str, help="Output file path (for single file processing)")
     parser.add_argument("--calculate_only", action="store_true", help="Only calculate and display metrics, don't update log file")
+    parser.add_argument("--group_by", type=str, default=",".join(DEFAULT_GROUP_BY), help="Comma-separated columns of the pass@k over all the logs of --log_dir: " + ", ".join(PASS_AT_K_GROUP_KEYS))
+    parser.add_argument("--ci_method", type=str, default=DEFAULT_CI_METHOD, choices=CI_METHODS, help="Confidence interval of each pass@k over the tasks, bootstrap (percentile, resampling the tasks), analytic (normal approximation) or none")
+    parser.add_argument("--ci_level", type=float, default=DEFAULT_CI_LEVEL, help="Confidence level of the intervals")
+    parser.add_argument("--bootstrap_samples", type=int, default=DEFAULT_BOOTSTRAP_SAMPLES, help="Resamples of the bootstrap intervals")
+    parser.add_argument("--token_price_file", type=str, default=None, help="JSON file of USD per 1M tokens by model, {model: {prompt, completion, cached_prompt}}, adds the cost to the token usage")
     
     args = parser.parse_args()
     
     pass_k_list = [int(k) for k in args.pass_k.split(",")]
+    token_prices = load_token_prices(args.token_price_file)
+    interval_estimator = get_interval_estimator(args.ci_method, level=args.ci_level, num_resamples=args.bootstrap_samples)
     
     if args.log_file:
         if args.calculate_only:
             # Only calculate and display metrics
-            result = calculate_metrics_from_log(args.log_file, pass_k_list)
+            result = calculate_metrics_from_log(args.log_file, pass_k_list, token_prices=token_prices, interval_estimator=interval_estimator)
             if result:
                 print("\nCalculated Metrics:")
                 for metric in result["metrics"]:
                     print(f"  {metric}")
         else:
             # Update log file with metrics
-            update_log_file_with_metrics(args.log_file, args.output)
+            update_log_file_with_metrics(args.log_file, args.output, token_prices=token_prices, interval_estimator=interval_estimator)
     
     elif args.log_dir:
         # Process multiple log files
-        process_multiple_logs(args.log_dir, args.pattern)
+        group_by = [key for key in args.group_by.split(",") if key]
+        process_multiple_logs(args.log_dir, args.pattern, token_prices=token_prices, pass_k_list=pass_k_list, group_by=group_by,
+                              interval_estimator=interval_estimator)
     
     else:
         print("Please provide either --log_file or --log_dir")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Dataset layouts of the benchmark.
+
+legacy: JSON array, every item embeds the full candidate "tools" list and "mcp_tools_dict"
+    [{"uuid": ..., "category": ..., "call_type": ..., "tools": [...], "mcp_tools_dict": {...}, "query": ..., "function_call_label": [...]}]
+
+normalized: each distinct (tools, mcp_tools_dict) pair is stored once in a shared tool catalog, items reference it by tool_set_id
+    {
+        "format": "mcp_tool_bench.dataset.normalized.v1",
+        "num_items": <number of items>,
+        "tool_catalog": {"<tool_set_id>": {"tools": [...], "mcp_tools_dict": {...}}},
+        "items": [{"uuid": ..., "category": ..., "call_type": ..., "tool_set_id": "<tool_set_id>", "query": ..., "function_call_label": [...]}]
+    }
+
+load_dataset reads both layouts and returns legacy style items, items of the same tool set share one tools list and
+mcp_tools_dict object instead of holding a copy each. iter_dataset yields the same items one at a time while reading
+the file, so large datasets are never held in memory as a whole.
+
+Usage:
+    python -m src.mcp_tool_bench.utils.dataset --input_file data/browser/browser_0724_single_v3.json --output_file data/browser/browser_0724_single_v3_normalized.json
+    python -m src.mcp_tool_bench.utils.dataset --input_file data/browser/browser_0724_single_v3_normalized.json --output_file data/browser/browser_0724_single_v3.json --dataset_format legacy
+"""
+
+import json
+import argparse
+from typing import Any, Dict, Iterator, List
+
+from src.mcp_tool_bench.common_utils import canonical_json_hash
+from src.mcp_tool_bench.utils.json_stream import JsonStreamReader
+
+DATASET_FORMAT_LEGACY = "legacy"
+DATASET_FORMAT_NORMALIZED = "normalized"
+NORMALIZED_DATASET_FORMAT_VERSION = "mcp_tool_bench.dataset.normalized.v1"
+
+KEY_TOOL_SET_ID = "tool_set_id"
+KEY_TOOL_CATALOG = "tool_catalog"
+KEY_ITEMS = "items"
+KEY_NUM_ITEMS = "num_items"
+
+# hex characters of the sha256 kept in tool_set_id
+TOOL_SET_ID_LENGTH = 16
+
+def parse_json_field(value: Any) -> Any:
+    """
+    tools, mcp_tools_dict and function_call_label may be stored as json strings in older datasets
+    """
+    return json.loads(value) if isinstance(value, str) else value
+
+def compute_tool_set_id(tools: List[Dict], mcp_tools_dict: Dict) -> str:
+    return canonical_json_hash({"tools": tools, "mcp_tools_dict": mcp_tools_dict})[:TOOL_SET_ID_LENGTH]
+
+def is_normalized_dataset(dataset: Any) -> bool:
+    return isinstance(dataset, dict) and KEY_TOOL_CATALOG in dataset and KEY_ITEMS in dataset
+
+def normalize_dataset(data_list: List[Dict]) -> Dict:
+    """
+    Convert legacy items into the normalized layout, identical tool sets are stored once
+    """
+    tool_catalog = {}
+    items = []
+    for data in data_list:
+        tools = parse_json_field(data.get("tools", []))
+        mcp_tools_dict = parse_json_field(data.get("mcp_tools_dict", {}))
+        tool_set_id = compute_tool_set_id(tools, mcp_tools_dict)
+        if tool_set_id not in tool_catalog:
+            tool_catalog[tool_set_id] = {"tools": tools, "mcp_tools_dict": mcp_tools_dict}
+        item = {}
+        for key, value in data.items():
+            if key == "tools":
+                item[KEY_TOOL_SET_ID] = tool_set_id
+            elif key != "mcp_tools_dict":
+                item[key] = value
+        if KEY_TOOL_SET_ID not in item:
+            item[KEY_TOOL_SET_ID] = tool_set_id
+        items.append(item)
+    return {
+        "format": NORMALIZED_DATASET_FORMAT_VERSION,
+        KEY_NUM_ITEMS: len(items),
+        KEY_TOOL_CATALOG: tool_catalog,
+        KEY_ITEMS: items
+    }
+
+def resolve_item(item: Dict, tool_catalog: Dict) -> Dict:
+    """
+    Legacy style view of a normalized item, tools and mcp_tools_dict are shared with the catalog, not copied
+    """
+    tool_set = tool_catalog[item[KEY_TOOL_SET_ID]]
+    resolved_item = {}
+    for key, value in item.items():
+        if key == KEY_TOOL_SET_ID:
+            resolved_item["tools"] = tool_set["tools"]
+            resolved_item["mcp_tools_dict"] = tool_set["mcp_tools_dict"]
+        else:
+            resolved_item[key] = value
+    return resolved_item
+
+def denormalize_dataset(dataset: Dict) -> List[Dict]:
+    tool_catalog = dataset[KEY_TOOL_CATALOG]
+    return [resolve_item(item, tool_catalog) for item in dataset[KEY_ITEMS]]
+
+def load_dataset(input_file_path: str) -> List[Dict]:
+    """
+    Load a dataset file of either layout as a list of legacy style items
+    """
+    with open(input_file_path, 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+    if is_normalized_dataset(dataset):
+        return denormalize_dataset(dataset)
+    return dataset
+
+def iter_dataset(input_file_path: str) -> Iterator[Dict]:
+    """
+    Yield the legacy style items of a dataset file of either layout one by one, reading the file incrementally.
+    The tool catalog of a normalized dataset is read once and shared by the items, like load_dataset.
+    """
+    with open(input_file_path, 'r', encoding='utf-8') as f:
+        reader = JsonStreamReader(f)
+        if reader.peek() == "[":
+            yield from reader.iter_array()
+            return
+        tool_catalog = None
+        # items written before the tool catalog can only be resolved once it is read
+        pending_items = []
+        for key in reader.iter_object():
+            if key == KEY_TOOL_CATALOG:
+                tool_catalog = reader.read_value()
+            elif key == KEY_ITEMS:
+                for item in reader.iter_array():
+                    if tool_catalog is None:
+                        pending_items.append(item)
+                    else:
+                        yield resolve_item(item, tool_catalog)
+            else:
+                reader.read_value()
+        if pending_items and tool_catalog is None:
+            raise ValueError(f"Dataset {input_file_path} has items but no {KEY_TOOL_CATALOG}")
+        for item in pending_items:
+            yield resolve_item(item, tool_catalog)
+
+def count_dataset_items(input_file_path: str) -> int:
+    """
+    Number of items of a dataset file. Read from the num_items header of a normalized dataset without parsing the items,
+    other files are counted by streaming through them, one item in memory at a time.
+    """
+    with open(input_file_path, 'r', encoding='utf-8') as f:
+        reader = JsonStreamReader(f)
+        if reader.peek() == "{":
+            for key in reader.iter_object():
+                if key == KEY_NUM_ITEMS:
+                    return reader.read_value()
+                if key == KEY_ITEMS:
+                    break
+                reader.read_value()
+    return sum(1 for _ in iter_dataset(input_file_path))
+
+def save_dataset(data_list: List[Dict], output_file_path: str, dataset_format: str = DATASET_FORMAT_NORMALIZED):
+    """
+    Save legacy style items in the given layout
+    """
+    dataset = normalize_dataset(data_list) if dataset_format == DATASET_FORMAT_NORMALIZED else data_list
+    with open(output_file_path, 'w', encoding='utf-8') as f:
+        json.dump(dataset, f, ensure_ascii=False, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a dataset between the legacy layout (tools embedded in every item) and the normalized layout (shared tool catalog)")
+    parser.add_argument("--input_file", type=str, required=True, help="Dataset file of either layout")
+    parser.add_argument("--output_file", type=str, required=True, help="Converted dataset file")
+    parser.add_argument("--dataset_format", type=str, default=DATASET_FORMAT_NORMALIZED, choices=[DATASET_FORMAT_NORMALIZED, DATASET_FORMAT_LEGACY], help="Layout of the output file, default is {}".format(DATASET_FORMAT_NORMALIZED))
+    args = parser.parse_args()
+
+    data_list = load_dataset(args.input_file)
+    save_dataset(data_list, args.output_file, args.dataset_format)
+    print(f"Converted {len(data_list)} items of {args.input_file} to {args.output_file} ({args.dataset_format})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Incremental reader of large JSON files, one value at a time.
+
+json.load parses the whole file before returning anything, so reading a dataset or run log of hundreds of MB
+holds all of it in memory. JsonStreamReader walks the top level array or object and decodes one element
+at a time with json.JSONDecoder.raw_decode (the C scanner) on a sliding buffer, the peak memory is the size
+of the largest single element.
+
+Usage:
+    for data in iter_json_array("data/browser/browser_0724_single_v3.json"):
+        ...
+    for task in iter_json_array("logs/browser/run.json", key="run_details"):
+        ...
+    for key, value in iter_json_members("logs/browser/run.json", stream_keys={"run_details"}):
+        # value is an iterator over the array for the keys in stream_keys, the decoded value otherwise
+        ...
+"""
+
+import re
+import json
+from typing import Any, Iterator, Optional, Set, TextIO, Tuple
+
+# characters read from the file per refill, doubled while a single value is larger than the buffer
+DEFAULT_STREAM_CHUNK_SIZE = 1 << 20
+
+WHITESPACE_PATTERN = re.compile(r'[ \t\n\r]*')
+NUMBER_CHARS = "0123456789+-.eE"
+
+
+class JsonStreamReader:
+    """
+    Pull reader over a text file holding one JSON document.
+
+    Usage:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            reader = JsonStreamReader(f)
+            if reader.peek() == "[":
+                for value in reader.iter_array():
+                    ...
+            else:
+                for key in reader.iter_object():
+                    value = reader.read_value()  # every key must be followed by read_value or iter_array
+    """
+
+    def __init__(self, f: TextIO, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, read_size: int) -> bool:
+        """
+        Drop the consumed part of the buffer and append read_size characters, False at the end of the file
+        """
+        if self.pos > 0:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def peek(self) -> str:
+        """
+        Next non whitespace character without consuming it, "" at the end of the file
+        """
+        while True:
+            self.pos = WHITESPACE_PATTERN.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"Invalid JSON stream: expected one of {chars!r} but found {ch or 'end of file'!r}")
+        self.pos += 1
+        return ch
+
+    def read_value(self) -> Any:
+        """
+        Decode the next complete JSON value
+        """
+        if not self.peek():
+            raise ValueError("Invalid JSON stream: unexpected end of file")
+        read_size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number cut by the end of the buffer decodes as its prefix, e.g. "12." as 12, accept it only when a delimiter follows
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in NUMBER_CHARS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill(read_size)
+            read_size *= 2
+
+    def iter_array(self) -> Iterator[Any]:
+        """
+        Decode the elements of the next array one by one
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if self.expect(",]") == "]":
+                return
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Yield the keys of the next object, the caller consumes the value of each key before the next one
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError(f"Invalid JSON stream: object key {key!r} is not a string")
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+
+def iter_json_array(file_path: str, key: Optional[str] = None, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Elements of the top level array of file_path, or of the array under key of the top level object
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        reader = JsonStreamReader(f, chunk_size=chunk_size)
+        if key is None:
+            yield from reader.iter_array()
+            return
+        for member_key in reader.iter_object():
+            if member_key == key:
+                yield from reader.iter_array()
+                return
+            reader.read_value()
+
+def iter_json_members(file_path: str, stream_keys: Set[str] = None, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> Iterator[Tuple[str, Any]]:
+    """
+    (key, value) members of the top level object of file_path in file order.
+    The value of a key in stream_keys is an iterator over its array elements, elements not read by the caller
+    before it moves on to the next member are skipped.
+    """
+    stream_keys = stream_keys or set()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        reader = JsonStreamReader(f, chunk_size=chunk_size)
+        for key in reader.iter_object():
+            if key in stream_keys:
+                items = reader.iter_array()
+                yield key, items
+                for _ in items:
+                    pass
+            else:
+                yield key, reader.read_value()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Append-only JSONL run log of the tool_call stage.
+
+The JSON layout {"run_info": ..., "metrics": [...], "run_details": [...]} is rewritten as a whole after every task,
+the JSONL layout appends one record per completed task instead, so the cost of saving a task does not grow with the run:
+
+    {"record_type": "header", "format": "mcp_tool_bench.run_log.v1", "run_info": {...}}
+    {"record_type": "task", "task": {...task_details...}}
+    {"record_type": "task", "task": {...task_details...}}
+    {"record_type": "footer", "run_info": {...}, "metrics": [...]}
+
+Resume scans the records, a partially written last line (the run was killed while appending) is ignored and cut off
+before new records are appended. The last footer wins if a finished run is resumed and written again.
+
+Whole-file writes (the JSON layout, conversions) go to a temp file which is fsynced and renamed over the log,
+so a kill in the middle of a write leaves the previous checkpoint intact. Trials finished before the task they
+belong to is logged are kept in a TrialCheckpoint sidecar (<log>.trials), so resume loses at most the trials in flight.
+
+iter_run_log reads either layout one task at a time and save_run_log_stream writes tasks as they come, so large logs
+(raw tool outputs) can be scored and converted without holding run_details in memory.
+
+Usage:
+    python -m src.mcp_tool_bench.utils.run_log --input_file logs/browser/run.jsonl --output_file logs/browser/run.json
+    python -m src.mcp_tool_bench.utils.run_log --input_file logs/browser/run.json --output_file logs/browser/run.jsonl
+"""
+
+import os
+import json
+import logging
+import argparse
+import tempfile
+import threading
+import contextlib
+from typing import Dict, List, Any, Iterable, Iterator, Tuple
+
+from src.mcp_tool_bench.utils.json_stream import iter_json_members
+
+RUN_LOG_FORMAT_JSON = "json"
+RUN_LOG_FORMAT_JSONL = "jsonl"
+RUN_LOG_FORMAT_VERSION = "mcp_tool_bench.run_log.v1"
+
+RECORD_TYPE_HEADER = "header"
+RECORD_TYPE_TASK = "task"
+RECORD_TYPE_FOOTER = "footer"
+
+TRIAL_CHECKPOINT_SUFFIX = ".trials"
+
+def fsync_dir(dir_path: str):
+    """
+    fsync a directory so a rename inside it is durable, no-op where directories can't be opened (Windows)
+    """
+    try:
+        dir_fd = os.open(dir_path or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+@contextlib.contextmanager
+def atomic_open(file_path: str):
+    """
+    Text file to write the new content of file_path to: a temp file in the same directory, fsynced and renamed over
+    file_path when the block exits without error, removed otherwise.
+    Readers and a later resume see either the old or the new content, never a truncated file.
+    """
+    dir_path = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(file_path) + ".", suffix=".tmp", dir=dir_path)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_dir(dir_path)
+
+def atomic_write_text(text: str, file_path: str):
+    """
+    Write text to file_path atomically, see atomic_open
+    """
+    with atomic_open(file_path) as f:
+        f.write(text)
+
+def atomic_write_json(data: Any, file_path: str, indent: int = 2):
+    atomic_write_text(json.dumps(data, ensure_ascii=False, indent=indent), file_path)
+
+def is_jsonl_log_path(log_file_path: str) -> bool:
+    return log_file_path.endswith("." + RUN_LOG_FORMAT_JSONL)
+
+def dumps_record(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+def find_valid_size(log_file_path: str) -> int:
+    """
+    Size in bytes of the complete records of a JSONL log, i.e. the offset after the last newline.
+    Every record is appended by one write ending with a newline, so only the last line can be partial.
+    """
+    chunk_size = 1 << 16
+    with open(log_file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        position = end
+        while position > 0:
+            read_size = min(chunk_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size)
+            newline_idx = chunk.rfind(b"\n")
+            if newline_idx >= 0:
+                return position + newline_idx + 1
+    return 0
+
+def iter_jsonl_run_log(log_file_path: str) -> Iterator[Tuple[str, Dict]]:
+    """
+    Records of a JSONL run log one by one, a partially written last line is ignored
+
+    Raises:
+        ValueError: if the log has no header record or a complete record is not valid json
+    """
+    has_header = False
+    valid_size = find_valid_size(log_file_path)
+    with open(log_file_path, 'rb') as f:
+        line_num = 0
+        while f.tell() < valid_size:
+            line = f.readline()
+            line_num += 1
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record_type = record.get("record_type")
+            if record_type == RECORD_TYPE_HEADER:
+                has_header = True
+            if record_type in (RECORD_TYPE_HEADER, RECORD_TYPE_TASK, RECORD_TYPE_FOOTER):
+                yield record_type, record
+            else:
+                logging.warning(f"Unknown record_type {record_type} in line {line_num} of {log_file_path}")
+        if f.read():
+            logging.warning(f"Ignored partially written last record of {log_file_path}")
+    if not has_header:
+        raise ValueError(f"Run log {log_file_path} has no header record")
+
+def iter_run_log(log_file_path: str) -> Iterator[Tuple[str, Dict]]:
+    """
+    Read a run log of either format incrementally, one task in memory at a time, as JSONL style records:
+        (RECORD_TYPE_HEADER, {"run_info": ...})
+        (RECORD_TYPE_TASK, {"task": ...})
+        (RECORD_TYPE_FOOTER, {"run_info": ..., "metrics": ...})  # run_info is missing for the JSON layout
+    The records of the JSON layout come in the order of its keys, run_info, metrics and then run_details.
+    """
+    if is_jsonl_log_path(log_file_path):
+        yield from iter_jsonl_run_log(log_file_path)
+        return
+    for key, value in iter_json_members(log_file_path, stream_keys={"run_details"}):
+        if key == "run_info":
+            yield RECORD_TYPE_HEADER, {"run_info": value}
+        elif key == "metrics":
+            yield RECORD_TYPE_FOOTER, {"metrics": value}
+        elif key == "run_details":
+            for task_details in value:
+                yield RECORD_TYPE_TASK, {"task": task_details}
+
+def read_jsonl_run_log(log_file_path: str) -> Dict:
+    """
+    Read a JSONL run log into the JSON layout {"run_info", "metrics", "run_details"}
+
+    Raises:
+        ValueError: if the log has no header record or a complete record is not valid json
+    """
+    log_data = {"run_info": {}, "metrics": [], "run_details": []}
+    for record_type, record in iter_jsonl_run_log(log_file_path):
+        if record_type == RECORD_TYPE_HEADER:
+            log_data["run_info"] = record.get("run_info", {})
+        elif record_type == RECORD_TYPE_TASK:
+            log_data["run_details"].append(record.get("task", {}))
+        elif record_type == RECORD_TYPE_FOOTER:
+            log_data["run_info"] = record.get("run_info", log_data["run_info"])
+            log_data["metrics"] = record.get("metrics", [])
+    return log_data
+
+def write_jsonl_run_log(log_data: Dict, log_file_path: str):
+    """
+    Write a whole run log in the JSON layout as a JSONL run log
+    """
+    records = [dumps_record({"record_type": RECORD_TYPE_HEADER, "format": RUN_LOG_FORMAT_VERSION, "run_info": log_data.get("run_info", {})})]
+    for task_details in log_data.get("run_details", []):
+        records.append(dumps_record({"record_type": RECORD_TYPE_TASK, "task": task_details}))
+    records.append(dumps_record({"record_type": RECORD_TYPE_FOOTER, "run_info": log_data.get("run_info", {}), "metrics": log_data.get("metrics", [])}))
+    atomic_write_text("".join(records), log_file_path)
+
+def indent_json_lines(text: str, indent: str) -> str:
+    return text.replace("\n", "\n" + indent)
+
+def save_run_log_stream(log_file_path: str, run_info: Dict, metrics: List[Dict[str, Any]], tasks: Iterable[Dict]):
+    """
+    Save a run log in the format given by the file extension, writing the tasks one by one as they are read from tasks
+    (e.g. iter_run_log of another file), so the run_details are never held in memory as a whole.
+    The JSON layout is written byte for byte like save_run_log of the same log_data.
+    """
+    with atomic_open(log_file_path) as f:
+        if is_jsonl_log_path(log_file_path):
+            f.write(dumps_record({"record_type": RECORD_TYPE_HEADER, "format": RUN_LOG_FORMAT_VERSION, "run_info": run_info}))
+            for task_details in tasks:
+                f.write(dumps_record({"record_type": RECORD_TYPE_TASK, "task": task_details}))
+            f.write(dumps_record({"record_type": RECORD_TYPE_FOOTER, "run_info": run_info, "metrics": metrics}))
+            return
+        # nested values of json.dumps(indent=2) are indented by 2 spaces per level
+        f.write('{\n  "run_info": ' + indent_json_lines(json.dumps(run_info, ensure_ascii=False, indent=2), "  "))
+        f.write(',\n  "metrics": ' + indent_json_lines(json.dumps(metrics, ensure_ascii=False, indent=2), "  "))
+        f.write(',\n  "run_details": [')
+        num_tasks = 0
+        for task_details in tasks:
+            f.write(("\n    " if num_tasks == 0 else ",\n    ") + indent_json_lines(json.dumps(task_details, ensure_ascii=False, indent=2), "    "))
+            num_tasks += 1
+        f.write("\n  ]\n}" if num_tasks > 0 else "]\n}")
+
+def load_run_log(log_file_path: str) -> Dict:
+    """
+    Load a run log of either format into the JSON layout
+    """
+    if is_jsonl_log_path(log_file_path):
+        return read_jsonl_run_log(log_file_path)
+    with open(log_file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_run_log(log_data: Dict, log_file_path: str):
+    """
+    Save a whole run log in the format given by the file extension
+    """
+    if is_jsonl_log_path(log_file_path):
+        write_jsonl_run_log(log_data, log_file_path)
+        return
+    atomic_write_json(log_data, log_file_path)
+
+
+class JsonlRunLogWriter:
+    """
+    Appends the records of one run to a JSONL run log, each record is one write followed by flush and fsync.
+
+    Usage:
+        writer = JsonlRunLogWriter(log_file_path, run_info)  # new run, truncates the file and writes the header
+        writer = JsonlRunLogWriter(log_file_path, resume=True)  # resume, drops a partial last line and appends
+        writer.append_task(task_details)
+        writer.write_footer(run_info, metrics)
+        writer.close()
+    """
+
+    def __init__(self, log_file_path: str, run_info: Dict = None, resume: bool = False):
+        self.log_file_path = log_file_path
+        if resume and os.path.exists(log_file_path):
+            valid_size = find_valid_size(log_file_path)
+            self.file = open(log_file_path, 'r+b')
+            self.file.truncate(valid_size)
+            self.file.seek(valid_size)
+        else:
+            self.file = open(log_file_path, 'wb')
+            self.write_record({"record_type": RECORD_TYPE_HEADER, "format": RUN_LOG_FORMAT_VERSION, "run_info": run_info or {}})
+            fsync_dir(os.path.dirname(os.path.abspath(log_file_path)))
+
+    def write_record(self, record: Dict):
+        self.file.write(dumps_record(record).encode("utf-8"))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def append_task(self, task_details: Dict):
+        self.write_record({"record_type": RECORD_TYPE_TASK, "task": task_details})
+
+    def write_footer(self, run_info: Dict, metrics: List[Dict[str, Any]]):
+        self.write_record({"record_type": RECORD_TYPE_FOOTER, "run_info": run_info, "metrics": metrics})
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class TrialCheckpoint:
+    """
+    Sidecar JSONL file (<log>.trials) of the trials finished in a run, appended and fsynced per trial,
+    so a resumed run only re-executes the trials that were in flight, not the whole task.
+    Records of tasks already committed to the run log are dropped when the checkpoint is opened,
+    and the file is removed when the run finishes. A checkpoint written by another run (run_id) is discarded.
+
+    Usage:
+        trial_checkpoint = TrialCheckpoint(log_file_path + TRIAL_CHECKPOINT_SUFFIX, run_id=run_info["start_time"], start_idx=start_idx)
+        trial_details_dict = trial_checkpoint.get(idx)  # trial_idx -> trial_detail finished before the restart
+        trial_checkpoint.add(idx, trial_detail)
+        trial_checkpoint.discard(idx)  # task committed to the run log
+        trial_checkpoint.close(remove=True)
+    """
+
+    def __init__(self, checkpoint_path: str, run_id: str, start_idx: int = 0):
+        self.checkpoint_path = checkpoint_path
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        self._trials = {}
+        self._discarded = set()
+        if os.path.exists(checkpoint_path):
+            self._load(start_idx)
+        # compact: rewrite with the trials of uncommitted tasks only, then append
+        records = [dumps_record({"record_type": RECORD_TYPE_HEADER, "run_id": run_id})]
+        for idx, trial_details_dict in self._trials.items():
+            for trial_detail in trial_details_dict.values():
+                records.append(dumps_record({"record_type": "trial", "idx": idx, "trial": trial_detail}))
+        atomic_write_text("".join(records), checkpoint_path)
+        self.file = open(checkpoint_path, 'ab')
+
+    def _load(self, start_idx: int):
+        try:
+            valid_size = find_valid_size(self.checkpoint_path)
+            with open(self.checkpoint_path, 'rb') as f:
+                lines = f.read(valid_size).splitlines()
+            if not lines or json.loads(lines[0]).get("run_id") != self.run_id:
+                logging.warning(f"Discard trial checkpoint {self.checkpoint_path} written by another run")
+                return
+            for line in lines[1:]:
+                record = json.loads(line)
+                if record.get("idx", -1) >= start_idx:
+                    trial_detail = record.get("trial", {})
+                    self._trials.setdefault(record["idx"], {})[trial_detail.get("trial_idx")] = trial_detail
+        except Exception as e:
+            logging.error(f"Failed to load trial checkpoint {self.checkpoint_path}, trials will be re-run: {e}")
+            self._trials = {}
+
+    def __len__(self):
+        return sum(len(trial_details_dict) for trial_details_dict in self._trials.values())
+
+    def get(self, idx: int) -> Dict[int, Dict]:
+        with self._lock:
+            return dict(self._trials.get(idx, {}))
+
+    def add(self, idx: int, trial_detail: Dict):
+        record = dumps_record({"record_type": "trial", "idx": idx, "trial": trial_detail}).encode("utf-8")
+        with self._lock:
+            if idx in self._discarded or self.file.closed:
+                return
+            self._trials.setdefault(idx, {})[trial_detail.get("trial_idx")] = trial_detail
+            self.file.write(record)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def discard(self, idx: int):
+        with self._lock:
+            self._trials.pop(idx, None)
+            self._discarded.add(idx)
+
+    def close(self, remove: bool = False):
+        with self._lock:
+            if not self.file.closed:
+                self.file.close()
+        if remove and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+
+def convert_run_log(input_file_path: str, output_file_path: str):
+    """
+    Convert a run log between the JSON and JSONL layout, the format of each side is given by the file extension
+    """
+    run_info, metrics = {}, []
+    num_tasks = 0
+    def iter_tasks():
+        nonlocal num_tasks
+        for record_type, record in iter_run_log(input_file_path):
+            if record_type == RECORD_TYPE_TASK:
+                num_tasks += 1
+                yield record.get("task", {})
+    # the header and footer fields are needed before the tasks (JSON layout) or only after them (JSONL footer), read them in a first pass
+    for record_type, record in iter_run_log(input_file_path):
+        if record_type == RECORD_TYPE_HEADER:
+            run_info = record.get("run_info", {})
+        elif record_type == RECORD_TYPE_FOOTER:
+            run_info = record.get("run_info", run_info)
+            metrics = record.get("metrics", [])
+    save_run_log_stream(output_file_path, run_info, metrics, iter_tasks())
+    print(f"Converted {input_file_path} ({num_tasks} tasks) to {output_file_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a run log between the JSON layout (.json) and the append-only JSONL layout (.jsonl)")
+    parser.add_argument("--input_file", type=str, required=True, help="Run log to convert, .json or .jsonl")
+    parser.add_argument("--output_file", type=str, default=None, help="Converted run log, default is the input file with the other extension")
+    args = parser.parse_args()
+
+    output_file_path = args.output_file
+    if output_file_path is None:
+        output_ext = RUN_LOG_FORMAT_JSON if is_jsonl_log_path(args.input_file) else RUN_LOG_FORMAT_JSONL
+        output_file_path = os.path.splitext(args.input_file)[0] + "." + output_ext
+    convert_run_log(args.input_file, output_file_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+## Phases of a trial, trial_detail["latency_ms"] holds the total milliseconds of each
+PHASE_LLM_FUNCTION_CALL = "llm_function_call"
+PHASE_TOOL_EXECUTION = "tool_execution"
+PHASE_JSON_PARSE = "json_parse"
+PHASE_JUDGE = "judge"
+TRIAL_PHASES = [PHASE_LLM_FUNCTION_CALL, PHASE_TOOL_EXECUTION, PHASE_JSON_PARSE, PHASE_JUDGE]
+
+## Phase of the run, one sample per task written to the run log
+PHASE_LOG_WRITE = "log_write"
+
+KEY_LATENCY_MS = "latency_ms"
+KEY_LATENCY = "latency"
+
+LATENCY_PERCENTILES = [50, 95, 99]
+
+class PhaseTimer:
+    """
+    Wall time of the phases of one trial, a phase entered several times (one LLM call per iteration) adds up.
+    The timer belongs to one trial, phases of a trial never overlap, so there is no lock.
+
+    Usage:
+        timer = PhaseTimer()
+        with timer.phase(PHASE_LLM_FUNCTION_CALL):
+            tool_call = call_llm_tools_function_call_wrapper(model, kwargs)
+        trial_detail[KEY_LATENCY_MS] = timer.to_dict()
+    """
+
+    def __init__(self):
+        self.phases_ms = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000.0)
+
+    def add(self, name: str, elapsed_ms: float):
+        self.phases_ms[name] = self.phases_ms.get(name, 0.0) + elapsed_ms
+
+    def to_dict(self) -> Dict[str, float]:
+        return {name: round(elapsed_ms, 3) for name, elapsed_ms in self.phases_ms.items()}
+
+@contextmanager
+def optional_phase(timer: Optional[PhaseTimer], name: str):
+    """
+    timer.phase(name), or nothing when the caller doesn't time the trial
+    """
+    if timer is None:
+        yield
+        return
+    with timer.phase(name):
+        yield
+
+
+class LatencyStats:
+    """
+    Samples of the phase latencies of a run, summarized as p50/p95/p99
+
+    Usage:
+        latency_stats = LatencyStats()
+        for trial in trials:
+            latency_stats.add_trial(trial)
+        latency_stats.summary()  # {"llm_function_call": {"count": 36, "mean": 812.1, "p50": 790.3, "p95": ..., "p99": ...}, ...}
+    """
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, name: str, elapsed_ms: float):
+        self.samples.setdefault(name, []).append(elapsed_ms)
+
+    def add_trial(self, trial_detail: Dict):
+        for name, elapsed_ms in (trial_detail.get(KEY_LATENCY_MS) or {}).items():
+            self.add(name, elapsed_ms)
+
+    def merge(self, other: "LatencyStats"):
+        for name, samples in other.samples.items():
+            self.samples.setdefault(name, []).extend(samples)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: summarize_latencies(samples) for name, samples in self.samples.items()}
+
+def summarize_latencies(samples: Iterable[float], percentiles: List[int] = LATENCY_PERCENTILES) -> Dict[str, float]:
+    samples_arr = np.asarray(list(samples), dtype=float)
+    if samples_arr.size == 0:
+        return {"count": 0}
+    summary = {"count": int(samples_arr.size), "mean": round(float(samples_arr.mean()), 3)}
+    for percentile, value in zip(percentiles, np.percentile(samples_arr, percentiles)):
+        summary[f"p{percentile}"] = round(float(value), 3)
+    return summary
+
+def format_latency_summary(summary: Dict[str, Dict[str, float]]) -> str:
+    lines = []
+    for name, phase_summary in summary.items():
+        if phase_summary.get("count", 0) == 0:
+            continue
+        lines.append(f"{name}: count {phase_summary['count']}, mean {phase_summary['mean']:.1f} ms, "
+                     + ", ".join(f"p{p} {phase_summary[f'p{p}']:.1f} ms" for p in LATENCY_PERCENTILES))
+    return "\n".join(lines)
@@ -0,0 +1,126 @@
+import json
+import threading
+from typing import Dict, Optional
+
+from src.mcp_tool_bench.global_variables import USAGE_PROMPT_TOKENS, USAGE_COMPLETION_TOKENS, USAGE_CACHED_TOKENS, USAGE_TOTAL_TOKENS
+from src.mcp_tool_bench.utils.timing import KEY_LATENCY_MS, PHASE_LLM_FUNCTION_CALL
+
+KEY_TOKEN_USAGE = "token_usage"
+USAGE_NUM_CALLS = "num_calls"
+USAGE_KEYS = [USAGE_PROMPT_TOKENS, USAGE_COMPLETION_TOKENS, USAGE_CACHED_TOKENS, USAGE_TOTAL_TOKENS]
+
+class TokenUsage:
+    """
+    Sum of the normalized token usage (result[KEY_USAGE] of the providers) of several model calls,
+    e.g. all the LLM function calls of a trial, or all the trials of a run.
+
+    Usage:
+        token_usage = TokenUsage()
+        token_usage.add(result[KEY_USAGE])
+        trial_detail[KEY_TOKEN_USAGE] = token_usage.to_dict()
+    """
+
+    def __init__(self):
+        self.counts = {key: 0 for key in USAGE_KEYS + [USAGE_NUM_CALLS]}
+        self._lock = threading.Lock()
+
+    def add(self, usage: Optional[Dict], num_calls: int = 1):
+        """
+        Args:
+            usage: normalized usage of one call, or a to_dict of several calls, num_calls is then read from it
+        """
+        if not usage:
+            return
+        with self._lock:
+            for key in USAGE_KEYS:
+                self.counts[key] += usage.get(key, 0) or 0
+            self.counts[USAGE_NUM_CALLS] += usage.get(USAGE_NUM_CALLS, num_calls)
+
+    def to_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+def load_token_prices(file_path: Optional[str]) -> Dict[str, Dict[str, float]]:
+    """
+    Prices in USD per 1M tokens by model, from a json file
+        {"qwen3-coder-plus": {"prompt": 1.0, "completion": 5.0, "cached_prompt": 0.2}}
+    cached_prompt defaults to the prompt price
+    """
+    if not file_path:
+        return {}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def token_cost(counts: Dict[str, int], prices: Optional[Dict[str, float]]) -> Optional[float]:
+    """
+    Cost in USD of the token counts, None without a price of the model
+    """
+    if not prices:
+        return None
+    cached_tokens = counts.get(USAGE_CACHED_TOKENS, 0)
+    uncached_prompt_tokens = counts.get(USAGE_PROMPT_TOKENS, 0) - cached_tokens
+    cost = (uncached_prompt_tokens * prices.get("prompt", 0.0)
+            + cached_tokens * prices.get("cached_prompt", prices.get("prompt", 0.0))
+            + counts.get(USAGE_COMPLETION_TOKENS, 0) * prices.get("completion", 0.0)) / 1e6
+    return round(cost, 6)
+
+
+class TokenUsageStats:
+    """
+    Token usage of the trials of a run, rolled up with throughput over the LLM function call time
+
+    Usage:
+        token_usage_stats = TokenUsageStats()
+        for trial in trials:
+            token_usage_stats.add_trial(trial)
+        token_usage_stats.summary(prices=load_token_prices(path).get(model))
+    """
+
+    def __init__(self):
+        self.token_usage = TokenUsage()
+        self.num_trials = 0
+        self.llm_seconds = 0.0
+
+    def add_trial(self, trial_detail: Dict):
+        trial_usage = trial_detail.get(KEY_TOKEN_USAGE)
+        if not trial_usage:
+            return
+        self.num_trials += 1
+        self.token_usage.add(trial_usage)
+        self.llm_seconds += (trial_detail.get(KEY_LATENCY_MS) or {}).get(PHASE_LLM_FUNCTION_CALL, 0.0) / 1000.0
+
+    def merge(self, other: "TokenUsageStats"):
+        self.num_trials += other.num_trials
+        self.token_usage.add(other.token_usage.to_dict())
+        self.llm_seconds += other.llm_seconds
+
+    def summary(self, prices: Optional[Dict[str, float]] = None) -> Dict:
+        counts = self.token_usage.to_dict()
+        if self.num_trials == 0:
+            return {}
+        summary = dict(counts)
+        summary["num_trials"] = self.num_trials
+        for key in [USAGE_PROMPT_TOKENS, USAGE_COMPLETION_TOKENS, USAGE_TOTAL_TOKENS]:
+            summary[f"mean_{key}_per_trial"] = round(counts[key] / self.num_trials, 1)
+        summary["cached_prompt_ratio"] = round(counts[USAGE_CACHED_TOKENS] / counts[USAGE_PROMPT_TOKENS], 4) if counts[USAGE_PROMPT_TOKENS] > 0 else 0.0
+        # per second of waiting for the model, the prompt rate shows the cost of the tool lists in the prompt
+        if self.llm_seconds > 0:
+            summary["prompt_tokens_per_sec"] = round(counts[USAGE_PROMPT_TOKENS] / self.llm_seconds, 1)
+            summary["completion_tokens_per_sec"] = round(counts[USAGE_COMPLETION_TOKENS] / self.llm_seconds, 1)
+        cost = token_cost(counts, prices)
+        if cost is not None:
+            summary["cost_usd"] = cost
+            summary["mean_cost_usd_per_trial"] = round(cost / self.num_trials, 6)
+        return summary
+
+def format_token_usage_summary(summary: Dict) -> str:
+    if not summary:
+        return "no token usage reported"
+    line = (f"prompt {summary[USAGE_PROMPT_TOKENS]} (cached {summary[USAGE_CACHED_TOKENS]}), completion {summary[USAGE_COMPLETION_TOKENS]} tokens "
+            f"in {summary[USAGE_NUM_CALLS]} calls, {summary['mean_total_tokens_per_trial']} tokens per trial")
+    if "completion_tokens_per_sec" in summary:
+        line += f", {summary['prompt_tokens_per_sec']} prompt and {summary['completion_tokens_per_sec']} completion tokens/sec"
+    if "cost_usd" in summary:
+        line += f", cost ${summary['cost_usd']:.4f}"
+    return line